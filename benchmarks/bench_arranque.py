@@ -0,0 +1,71 @@
+"""
+Benchmark de arranque: tiempo de importación y primer pintado de la página de inicio
+
+Cada medición corre en un intérprete nuevo para incluir el costo real de las
+importaciones. El primer pintado se mide con el AppTest de Streamlit sobre
+`tumapaguiaapp.py` (página "Inicio").
+
+Uso:
+python -m benchmarks.bench_arranque --repeticiones 5
+python -m benchmarks.bench_arranque --raiz /ruta/a/otra/copia
+"""
+
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+RAIZ = Path(__file__).resolve().parent.parent
+
+MEDIR_IMPORTACION = """
+import sys, time
+sys.path.insert(0, {raiz!r})
+inicio = time.perf_counter()
+import {modulo}
+print(time.perf_counter() - inicio)
+"""
+
+MEDIR_PRIMER_PINTADO = """
+import sys, time
+sys.path.insert(0, {raiz!r})
+inicio = time.perf_counter()
+from streamlit.testing.v1 import AppTest
+app = AppTest.from_file({script!r}, default_timeout=120).run()
+assert not app.exception, app.exception
+assert any('Mapa Guía de tu Destino' in m.value for m in app.markdown)
+print(time.perf_counter() - inicio)
+"""
+
+def medir(codigo, raiz, repeticiones):
+    tiempos = []
+    for _ in range(repeticiones):
+        salida = subprocess.run(
+            [sys.executable, '-c', codigo],
+            cwd=raiz, capture_output=True, text=True, check=True
+        )
+        tiempos.append(float(salida.stdout.strip().splitlines()[-1]))
+    return statistics.median(tiempos)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--raiz', default=str(RAIZ), help="Copia del repositorio a medir")
+    parser.add_argument('--repeticiones', type=int, default=5)
+    args = parser.parse_args()
+    
+    raiz = str(Path(args.raiz).resolve())
+    resultados = {}
+    for modulo in ('tumapaguia.vision', 'tumapaguia.quirologia'):
+        codigo = MEDIR_IMPORTACION.format(raiz=raiz, modulo=modulo)
+        resultados[f'importar {modulo}'] = medir(codigo, raiz, args.repeticiones)
+    
+    codigo = MEDIR_PRIMER_PINTADO.format(raiz=raiz, script=str(Path(raiz) / 'tumapaguiaapp.py'))
+    resultados['primer pintado de Inicio'] = medir(codigo, raiz, args.repeticiones)
+    
+    for nombre, segundos in resultados.items():
+        print(f"{nombre:<32} {segundos * 1e3:9.1f} ms")
+    print(json.dumps({k: round(v, 4) for k, v in resultados.items()}))
+
+if __name__ == "__main__":
+    main()
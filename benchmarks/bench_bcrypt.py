@@ -0,0 +1,62 @@
+"""
+Benchmark de bcrypt: latencia por costo y respuesta del hilo principal
+
+Para cada costo mide cuánto tarda un hash en el executor dedicado y cuánto
+trabajo Python logra hacer mientras tanto el hilo que espera (bcrypt suelta el
+GIL, así que las demás sesiones siguen atendiéndose). Sirve para elegir
+MAPA_BCRYPT_COSTO: la recomendación habitual es 250 ms - 1 s por login.
+
+Uso:
+python -m benchmarks.bench_bcrypt --costos 10 11 12 13
+"""
+
+import argparse
+import statistics
+import time
+
+import bcrypt
+
+from tumapaguia.autenticacion import obtener_executor_bcrypt
+
+def contar_mientras(futuro):
+    """Vueltas que da el hilo que espera hasta que el futuro termina, por segundo"""
+    inicio = time.perf_counter()
+    n = 0
+    while not futuro.done():
+        n += 1
+    return n / (time.perf_counter() - inicio)
+
+def ritmo_sin_competencia(segundos=0.3):
+    """Mismo bucle mientras el executor solo duerme: el 100% de referencia"""
+    return contar_mientras(obtener_executor_bcrypt().submit(time.sleep, segundos))
+
+def medir_costo(costo, repeticiones):
+    executor = obtener_executor_bcrypt()
+    password = b"contrasena de prueba"
+    tiempos = []
+    ritmos = []
+    
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        futuro = executor.submit(bcrypt.hashpw, password, bcrypt.gensalt(rounds=costo))
+        # El hilo que espera sigue trabajando mientras el executor calcula
+        ritmos.append(contar_mientras(futuro))
+        tiempos.append(time.perf_counter() - inicio)
+        futuro.result()
+    
+    return statistics.median(tiempos), statistics.median(ritmos)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--costos', type=int, nargs='+', default=[10, 11, 12, 13])
+    parser.add_argument('--repeticiones', type=int, default=3)
+    args = parser.parse_args()
+    
+    base = ritmo_sin_competencia()
+    print(f"{'costo':>5} {'ms/hash':>9} {'logins/s/hilo':>14} {'hilo principal':>15}")
+    for costo in args.costos:
+        segundos, ritmo = medir_costo(costo, args.repeticiones)
+        print(f"{costo:5d} {segundos * 1e3:9.1f} {1 / segundos:14.1f} {ritmo / base:14.0%}")
+
+if __name__ == "__main__":
+    main()
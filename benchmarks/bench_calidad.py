@@ -0,0 +1,71 @@
+"""
+Benchmark de las métricas de calidad de imagen
+
+Compara el cálculo original a resolución completa con `calcular_metricas_calidad`
+(proxy reducido + baldosas nativas): latencia y pico de memoria por megapíxel.
+
+Uso:
+python -m benchmarks.bench_calidad --megapixeles 2 12 24 48
+"""
+
+import argparse
+import time
+import tracemalloc
+
+import cv2
+import numpy as np
+
+from tumapaguia.vision import calcular_metricas_calidad
+
+def metricas_resolucion_completa(img_array):
+    """Cálculo previo: escala de grises, Laplaciano CV_64F y std a tamaño completo"""
+    gray = cv2.cvtColor(img_array, cv2.COLOR_RGB2GRAY)
+    brillo = np.mean(gray)
+    nitidez = cv2.Laplacian(gray, cv2.CV_64F).var()
+    contraste = gray.std()
+    return brillo, contraste, nitidez
+
+def imagen_sintetica(megapixeles, semilla=0):
+    """Textura 4:3 con ruido suavizado, similar a una foto de móvil"""
+    w = int(np.sqrt(megapixeles * 1e6 * 4 / 3))
+    h = int(w * 3 / 4)
+    rng = np.random.default_rng(semilla)
+    base = rng.integers(0, 256, (h // 8, w // 8, 3), dtype=np.uint8)
+    return cv2.resize(base, (w, h), interpolation=cv2.INTER_CUBIC)
+
+def medir(funcion, img_array, repeticiones):
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        resultado = funcion(img_array)
+        tiempos.append(time.perf_counter() - inicio)
+    
+    tracemalloc.start()
+    funcion(img_array)
+    _, pico = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    
+    return float(np.median(tiempos)), pico, resultado
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--megapixeles', type=float, nargs='+', default=[2, 12, 24, 48])
+    parser.add_argument('--repeticiones', type=int, default=5)
+    args = parser.parse_args()
+    
+    print(f"{'MP':>5} {'método':<10} {'ms':>9} {'ms/MP':>7} {'pico MB':>9} {'MB/MP':>7} "
+          f"{'brillo':>7} {'contraste':>9} {'nitidez':>9}")
+    
+    for mp in args.megapixeles:
+        img_array = imagen_sintetica(mp)
+        mp_real = img_array.shape[0] * img_array.shape[1] / 1e6
+        
+        for nombre, funcion in (('completo', metricas_resolucion_completa),
+                                ('proxy', calcular_metricas_calidad)):
+            segundos, pico, (brillo, contraste, nitidez) = medir(funcion, img_array, args.repeticiones)
+            print(f"{mp_real:5.1f} {nombre:<10} {segundos * 1e3:9.1f} {segundos * 1e3 / mp_real:7.2f} "
+                  f"{pico / 2**20:9.1f} {pico / 2**20 / mp_real:7.2f} "
+                  f"{brillo:7.1f} {contraste:9.1f} {nitidez:9.1f}")
+
+if __name__ == "__main__":
+    main()
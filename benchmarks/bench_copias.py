@@ -0,0 +1,101 @@
+"""
+Benchmark de copias de imagen: memoria asignada por etapa en imágenes completas
+
+En un intérprete nuevo, decodifica, valida y analiza las fotos de una consulta
+como lo hace el trabajo y mide con tracemalloc, por etapa, el pico de memoria
+asignada por encima de la que ya había al empezar. Dividido por el tamaño del
+búfer RGB de la foto da cuántas copias completas de la imagen llegan a
+convivir: ahí aparecen los np.array, las conversiones de color de OpenCV y los
+bytes que exporta PIL. La memoria de PIL y las copias internas de MediaPipe no
+pasan por tracemalloc y no se cuentan; un búfer canónico retenido cuenta 1 en
+la decodificación. Con `--raiz` se mide otra copia del repositorio para comparar.
+
+Uso:
+python -m benchmarks.bench_copias
+python -m benchmarks.bench_copias --megapixeles 12 --fotos 4
+python -m benchmarks.bench_copias --raiz /ruta/a/otra/copia
+"""
+
+import argparse
+import json
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+import numpy as np
+
+from benchmarks.sinteticos import codificar_jpeg, foto_sintetica
+
+RAIZ = Path(__file__).resolve().parent.parent
+
+MEDIR_COPIAS = """
+import io, json, sys, tracemalloc
+sys.path.insert(0, {raiz!r})
+from tumapaguia.ingesta import cargar_foto
+from tumapaguia.quirologia import analisis_quirologico_completo
+from tumapaguia.vision import precalentar_detectores, validar_calidad_imagen
+
+def medir(funcion):
+    tracemalloc.reset_peak()
+    antes, _ = tracemalloc.get_traced_memory()
+    resultado = funcion()
+    _, pico = tracemalloc.get_traced_memory()
+    return resultado, pico - antes
+
+def consulta(datos):
+    copias = {{'decodificacion': 0.0, 'validacion': 0.0, 'analisis': 0.0}}
+    for contenido in datos:
+        img, asignados = medir(lambda: cargar_foto(io.BytesIO(contenido)))
+        cuadro = img.size[0] * img.size[1] * 3
+        copias['decodificacion'] += asignados / cuadro
+        _, asignados = medir(lambda: validar_calidad_imagen(img))
+        copias['validacion'] += asignados / cuadro
+        # Sin las detecciones de la validación: el análisis vuelve a detectar, su caso más caro
+        _, asignados = medir(lambda: analisis_quirologico_completo([img]))
+        copias['analisis'] += asignados / cuadro
+        del img
+    return copias
+
+precalentar_detectores()
+datos = [open(ruta, 'rb').read() for ruta in {rutas!r}]
+# Calentamiento fuera de la medición: importaciones y grafos TFLite
+tracemalloc.start()
+consulta(datos[:1])
+print(json.dumps(consulta(datos)))
+"""
+
+def preparar_fotos(carpeta, megapixeles, n):
+    w = int(np.sqrt(megapixeles * 1e6 * 4 / 3))
+    h = int(w * 3 / 4)
+    rutas = []
+    for i in range(n):
+        ruta = Path(carpeta) / f"foto_{megapixeles}mp_{i}.jpg"
+        ruta.write_bytes(codificar_jpeg(foto_sintetica('mano', w, h, semilla=i)))
+        rutas.append(str(ruta))
+    return rutas
+
+def medir_copias(rutas, raiz=RAIZ):
+    """Copias completas por etapa, sumadas sobre las fotos de `rutas`, en un intérprete nuevo"""
+    salida = subprocess.run([sys.executable, '-c', MEDIR_COPIAS.format(raiz=str(raiz), rutas=rutas)],
+                            cwd=Path(rutas[0]).parent, capture_output=True, text=True, check=True)
+    return json.loads(salida.stdout.strip().splitlines()[-1])
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--raiz', default=str(RAIZ), help="Copia del repositorio a medir")
+    parser.add_argument('--megapixeles', type=float, default=12)
+    parser.add_argument('--fotos', type=int, default=4, help="Fotos por consulta")
+    args = parser.parse_args()
+    
+    with tempfile.TemporaryDirectory() as carpeta:
+        rutas = preparar_fotos(carpeta, args.megapixeles, args.fotos)
+        copias = medir_copias(rutas, Path(args.raiz).resolve())
+    
+    print(f"Consulta de {args.fotos} fotos de {args.megapixeles:g} MP, copias completas de cada imagen:")
+    for etapa, total in copias.items():
+        print(f"  {etapa:<16} {total / args.fotos:5.2f} por foto")
+    print(f"  {'tras decodificar':<16} {copias['validacion'] + copias['analisis']:5.2f} por consulta")
+
+if __name__ == "__main__":
+    main()
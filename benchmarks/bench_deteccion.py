@@ -0,0 +1,96 @@
+"""
+Benchmark de detección adaptativa: latencia y acuerdo de clasificaciones por modo
+
+Detecta cada foto con el modelo completo, con el ligero y con el modo
+adaptativo (ligero y, si no convence, completo). Reporta p50/p95 por modo, la
+tasa de escalado por motivo y cuántas fotos conservan la misma `forma_mano` y
+las mismas clasificaciones de `dedos` que con el modelo completo.
+
+Las siluetas sintéticas no activan a MediaPipe: sin --fotos solo se mide el
+costo de no encontrar mano. Para medir acuerdo hace falta una carpeta de fotos
+reales de palmas.
+
+Uso:
+python -m benchmarks.bench_deteccion --fotos fotos_manos/
+python -m benchmarks.bench_deteccion --fotos fotos_manos/ --score-escalado 0.9
+"""
+
+import argparse
+import io
+import time
+from pathlib import Path
+
+import numpy as np
+
+from benchmarks.sinteticos import RESOLUCIONES, codificar_jpeg, foto_sintetica
+from tumapaguia import vision
+from tumapaguia.ingesta import cargar_foto
+from tumapaguia.quirologia import analizar_dedos_lote, analizar_forma_mano_lote, landmarks_a_arreglo, puntos_en_pixeles
+
+MODOS = {
+    'completo': lambda a: vision.detectar_mano(a, vision.CONFIANZA_VALIDACION, vision.COMPLEJIDAD_COMPLETA),
+    'ligero': lambda a: vision.detectar_mano(a, vision.CONFIANZA_VALIDACION, vision.COMPLEJIDAD_LIGERA),
+    'adaptativo': lambda a: vision.detectar_mano_adaptativa(a, vision.CONFIANZA_VALIDACION),
+}
+
+def cargar_fotos(carpeta):
+    """(nombre, imagen ingerida) como las recibe la validación"""
+    if carpeta:
+        rutas = sorted(p for p in Path(carpeta).iterdir() if p.suffix.lower() in ('.jpg', '.jpeg', '.png'))
+        return [(ruta.name, cargar_foto(str(ruta))) for ruta in rutas]
+    
+    return [(f'sintetica_{res}', cargar_foto(io.BytesIO(codificar_jpeg(foto_sintetica('mano', *RESOLUCIONES[res])))))
+            for res in ('2MP', '12MP')]
+
+def clasificar(deteccion, tamano):
+    """(forma de mano, clasificación de cada dedo) como en el análisis"""
+    if deteccion is None:
+        return None
+    w, h = tamano
+    puntos = puntos_en_pixeles(landmarks_a_arreglo(deteccion['landmarks']), w, h)
+    dedos = analizar_dedos_lote(puntos)
+    return (analizar_forma_mano_lote(puntos, w, h)['tipo'],
+            tuple(dedos[d]['clasificacion'] for d in sorted(dedos)))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--fotos', default=None, help="Carpeta con fotos reales de palmas")
+    parser.add_argument('--repeticiones', type=int, default=5)
+    parser.add_argument('--score-escalado', type=float, default=vision.SCORE_ESCALADO)
+    args = parser.parse_args()
+    
+    vision.SCORE_ESCALADO = args.score_escalado
+    vision.precalentar_detectores('adaptativo')
+    fotos = cargar_fotos(args.fotos)
+    
+    tiempos = {modo: [] for modo in MODOS}
+    clasificaciones = {modo: [] for modo in MODOS}
+    for nombre, img in fotos:
+        img_array = img.rgb
+        tamano = img.tamano_original
+        for modo, detectar in MODOS.items():
+            for _ in range(args.repeticiones):
+                inicio = time.perf_counter()
+                deteccion = detectar(img_array)
+                tiempos[modo].append((time.perf_counter() - inicio) * 1e3)
+            clasificaciones[modo].append(clasificar(deteccion, tamano))
+    
+    print(f"{len(fotos)} fotos, score de escalado {args.score_escalado}")
+    referencia = clasificaciones['completo']
+    detectadas = sum(c is not None for c in referencia)
+    for modo in MODOS:
+        acuerdo_forma = sum(c is not None and r is not None and c[0] == r[0]
+                            for c, r in zip(clasificaciones[modo], referencia))
+        acuerdo_dedos = sum(c is not None and r is not None and c[1] == r[1]
+                            for c, r in zip(clasificaciones[modo], referencia))
+        print(f"{modo:<11} p50 {np.percentile(tiempos[modo], 50):7.1f} ms  p95 {np.percentile(tiempos[modo], 95):7.1f} ms  "
+              f"| manos {sum(c is not None for c in clasificaciones[modo])}/{len(fotos)}  "
+              f"forma igual {acuerdo_forma}/{detectadas}  dedos iguales {acuerdo_dedos}/{detectadas}")
+    
+    # Cada foto pasa por el modo adaptativo una vez por repetición
+    estadisticas = vision.obtener_estadisticas_deteccion().resumen()
+    print(f"Escalado: {estadisticas['escaladas']} de {estadisticas['detecciones']} "
+          f"({estadisticas['tasa_escalado']:.0%}), motivos {estadisticas['motivos']}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""
+Benchmark de ingesta: pico de RSS de consultas de varias fotos grandes
+
+Codifica fotos sintéticas como JPEG y, en un intérprete nuevo, corre
+`--consultas` consultas simultáneas por la cola de trabajos como lo hace la
+página. Reporta el RSS antes de las consultas, el pico del proceso (VmHWM de
+Linux: ru_maxrss hereda el pico del proceso padre que generó las fotos), el
+pico que anotó la traza de cada consulta y el máximo de bytes de imagen
+vivos según el PresupuestoMemoria.
+
+Uso:
+python -m benchmarks.bench_ingesta --megapixeles 48 --fotos 4
+python -m benchmarks.bench_ingesta --megapixeles 48 --fotos 4 --consultas 4
+python -m benchmarks.bench_ingesta --raiz /ruta/a/otra/copia
+"""
+
+import argparse
+import json
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+import numpy as np
+
+from benchmarks.sinteticos import codificar_jpeg, foto_sintetica
+
+RAIZ = Path(__file__).resolve().parent.parent
+
+MEDIR_CONSULTA = """
+import io, json, sys, time
+from datetime import date
+sys.path.insert(0, {raiz!r})
+from tumapaguia.ingesta import obtener_presupuesto_memoria
+from tumapaguia.telemetria import Traza
+from tumapaguia.trabajos import ESTADOS_ACTIVOS, ColaTrabajos, procesar_consulta
+from tumapaguia.vision import precalentar_detectores
+
+def leer_status_kb(campo):
+    with open('/proc/self/status') as f:
+        return next(int(l.split()[1]) for l in f if l.startswith(campo))
+
+precalentar_detectores()
+cola = ColaTrabajos(max_hilos={consultas}, max_cola={consultas})
+subidas = [[io.BytesIO(open(ruta, 'rb').read()) for ruta in {rutas!r}] for _ in range({consultas})]
+antes = leer_status_kb('VmRSS')
+inicio = time.perf_counter()
+trazas = [Traza('bench') for _ in subidas]
+ids = [cola.enviar(procesar_consulta, fotos, date(1990, 1, 1), traza=traza, sesion=f's{{i}}')
+       for i, (fotos, traza) in enumerate(zip(subidas, trazas))]
+del subidas
+while any(cola.estado(i)['estado'] in ESTADOS_ACTIVOS for i in ids):
+    time.sleep(0.01)
+estados = [cola.estado(i) for i in ids]
+print(json.dumps({{
+    'segundos': time.perf_counter() - inicio,
+    'rss_antes_mb': antes / 1024,
+    'rss_pico_mb': leer_status_kb('VmHWM') / 1024,
+    'picos_traza_mb': [t.atributos.get('rss_pico_mb') for t in trazas],
+    'imagenes_pico_mb': obtener_presupuesto_memoria().pico / 2**20,
+    'imagenes_al_final_mb': obtener_presupuesto_memoria().usados / 2**20,
+    'validas': [e['resultado']['imagenes_validas'] if e['resultado'] else e['error'] for e in estados]
+}}))
+"""
+
+def preparar_fotos(carpeta, megapixeles, n):
+    w = int(np.sqrt(megapixeles * 1e6 * 4 / 3))
+    h = int(w * 3 / 4)
+    rutas = []
+    for i in range(n):
+        ruta = Path(carpeta) / f"foto_{megapixeles}mp_{i}.jpg"
+        ruta.write_bytes(codificar_jpeg(foto_sintetica('mano', w, h, semilla=i)))
+        rutas.append(str(ruta))
+    return rutas
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--raiz', default=str(RAIZ), help="Copia del repositorio a medir")
+    parser.add_argument('--megapixeles', type=float, default=48)
+    parser.add_argument('--fotos', type=int, default=4)
+    parser.add_argument('--consultas', type=int, default=1, help="Consultas simultáneas con las mismas fotos")
+    args = parser.parse_args()
+    
+    raiz = str(Path(args.raiz).resolve())
+    with tempfile.TemporaryDirectory() as carpeta:
+        rutas = preparar_fotos(carpeta, args.megapixeles, args.fotos)
+        # Desde la carpeta temporal: la base de consultas que escribe el trabajo queda allí
+        salida = subprocess.run(
+            [sys.executable, '-c', MEDIR_CONSULTA.format(raiz=raiz, rutas=rutas, consultas=args.consultas)],
+            cwd=carpeta, capture_output=True, text=True, check=True
+        )
+    
+    resultado = json.loads(salida.stdout.strip().splitlines()[-1])
+    print(f"{args.consultas} consulta(s) de {args.fotos} fotos de {args.megapixeles:g} MP: {resultado['segundos']:.2f} s, "
+          f"RSS antes {resultado['rss_antes_mb']:.0f} MB, pico {resultado['rss_pico_mb']:.0f} MB "
+          f"(+{resultado['rss_pico_mb'] - resultado['rss_antes_mb']:.0f} MB), "
+          f"imágenes vivas máx. {resultado['imagenes_pico_mb']:.0f} MB")
+    print(json.dumps(resultado))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""
+Benchmark de líneas de la palma: latencia por resolución y medidas recuperadas
+
+Dibuja las líneas de vida, cabeza (con un corte) y corazón en coordenadas del
+recorte de la palma, las lleva a la foto con la transformación inversa y mide
+`analizar_lineas` sobre la foto completa de cada resolución. Como el trabajo
+ocurre sobre un recorte de tamaño fijo, la latencia debe quedar casi plana
+aunque la foto crezca de 0.5 a 48 MP.
+
+Uso:
+python -m benchmarks.bench_lineas
+python -m benchmarks.bench_lineas --resoluciones 2MP 48MP --repeticiones 20
+"""
+
+import argparse
+import time
+
+import numpy as np
+
+from benchmarks.sinteticos import LANDMARKS_CANONICOS, RESOLUCIONES, silueta_mano
+from tumapaguia import vision
+from tumapaguia.lineas import LADO_PALMA, esquinas_palma
+from tumapaguia.quirologia import analizar_lineas, puntos_en_pixeles
+
+def _curva(puntos_control, n=60):
+    """Cuadrática por tres puntos (u, v) del recorte"""
+    t = np.linspace(0, 1, n)[:, None]
+    a, b, c = (np.array(p, dtype=np.float64) for p in puntos_control)
+    return (1 - t) ** 2 * a + 2 * (1 - t) * t * b + t ** 2 * c
+
+# Trazos en coordenadas del recorte (u: índice -> meñique, v: nudillos -> muñeca)
+LINEAS_DIBUJADAS = {
+    'vida': [_curva([(0.12, 0.36), (0.32, 0.60), (0.42, 0.86)])],
+    # La cabeza se dibuja en dos tramos para que tenga un corte
+    'cabeza': [_curva([(0.10, 0.42), (0.22, 0.44), (0.40, 0.46)]),
+               _curva([(0.50, 0.47), (0.65, 0.50), (0.80, 0.54)])],
+    'corazon': [_curva([(0.86, 0.22), (0.55, 0.26), (0.20, 0.12)])],
+}
+
+def _largo(trazo):
+    return float(np.hypot(*np.diff(trazo, axis=0).T).sum())
+
+def _curvatura(nombre, tramos):
+    """Misma medida que `medir_linea`: |2a| de la cuadrática p(m)"""
+    u, v = np.concatenate(tramos).T
+    m, p = (v, u) if nombre == 'vida' else (u, v)
+    return float(abs(2 * np.polyfit(m, p, 2)[0]))
+
+def foto_con_lineas(w, h, semilla=0):
+    """(foto RGB, landmarks en píxeles) con las LINEAS_DIBUJADAS sobre la palma"""
+    vision.cargar_vision()
+    cv2 = vision.cv2
+    puntos = puntos_en_pixeles(LANDMARKS_CANONICOS, w, h)
+    recorte = np.array([[0, 0], [1, 0], [1, 1], [0, 1]], dtype=np.float32)
+    hacia_foto = cv2.getPerspectiveTransform(recorte, esquinas_palma(puntos) / np.float32([w, h]))
+    trazos = [cv2.perspectiveTransform(t.reshape(-1, 1, 2).astype(np.float32), hacia_foto).reshape(-1, 2)
+              for tramos in LINEAS_DIBUJADAS.values() for t in tramos]
+    return silueta_mano(w, h, semilla=semilla, pliegues=trazos), puntos
+
+def medir(resolucion, repeticiones):
+    w, h = RESOLUCIONES[resolucion]
+    foto, puntos = foto_con_lineas(w, h)
+    lineas = analizar_lineas(foto, puntos)
+    
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        analizar_lineas(foto, puntos)
+        tiempos.append((time.perf_counter() - inicio) * 1e3)
+    return lineas, np.percentile(tiempos, 50), np.percentile(tiempos, 95)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--resoluciones', nargs='+', default=list(RESOLUCIONES), choices=list(RESOLUCIONES))
+    parser.add_argument('--repeticiones', type=int, default=10)
+    args = parser.parse_args()
+    
+    if not vision.cargar_vision():
+        raise SystemExit("OpenCV no está disponible")
+    
+    dibujado = ", ".join(
+        f"{nombre} largo {sum(_largo(t) for t in tramos):.2f} curv {_curvatura(nombre, tramos):.2f} cortes {len(tramos) - 1}"
+        for nombre, tramos in LINEAS_DIBUJADAS.items()
+    )
+    print(f"Recorte de {LADO_PALMA}x{LADO_PALMA}. Dibujado: {dibujado}")
+    
+    for resolucion in args.resoluciones:
+        lineas, p50, p95 = medir(resolucion, args.repeticiones)
+        medidas = ", ".join(
+            f"{nombre} largo {linea['largo']:.2f} curv {linea['curvatura']:.2f} cortes {linea['cortes']}"
+            if linea.get('detectada') else f"{nombre} no detectada"
+            for nombre, linea in lineas.items()
+        )
+        print(f"{resolucion:>6}: p50 {p50:7.2f} ms  p95 {p95:7.2f} ms  | {medidas}")
+
+if __name__ == "__main__":
+    main()
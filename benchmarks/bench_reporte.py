@@ -0,0 +1,88 @@
+"""
+Benchmark del informe: reportes por segundo de `generar_analisis_completo`
+
+Genera análisis variados a partir de landmarks sintéticos. Con `--referencia`
+mide también otra versión de reporte.py y comprueba que ambas producen
+exactamente el mismo texto.
+
+Uso:
+python -m benchmarks.bench_reporte
+git show <commit>:tumapaguia/reporte.py > /tmp/reporte_base.py
+python -m benchmarks.bench_reporte --referencia /tmp/reporte_base.py
+"""
+
+import argparse
+import importlib.util
+import time
+from datetime import date, timedelta
+
+from benchmarks.sinteticos import RESOLUCIONES, landmarks_sinteticos
+from tumapaguia.ciclos import analizar_ciclos_temporales
+from tumapaguia.quirologia import (analizar_dedos_lote, analizar_forma_mano_lote, analizar_lineas,
+                                   analizar_montes_lote, calcular_flexibilidad_lote, puntos_en_pixeles)
+from tumapaguia.reporte import generar_analisis_completo
+
+PREGUNTAS = ["", "¿Cómo será mi carrera profesional en los próximos años?", "¿Qué me espera este año?"]
+
+def casos_sinteticos(n, semilla=0):
+    """(análisis, ciclos, pregunta) variados para n manos"""
+    w, h = RESOLUCIONES['12MP']
+    lote = puntos_en_pixeles(landmarks_sinteticos(n=n, semilla=semilla, ruido=0.03), w, h)
+    formas = analizar_forma_mano_lote(lote, w, h)
+    dedos = analizar_dedos_lote(lote)
+    montes = analizar_montes_lote(lote)
+    flexibilidad = calcular_flexibilidad_lote(lote)
+    
+    casos = []
+    for i in range(n):
+        analisis = {
+            'forma_mano': formas[i],
+            'dedos': dedos[i],
+            'montes': montes[i],
+            'lineas': analizar_lineas(None, lote[i]),
+            'flexibilidad': flexibilidad[i],
+            'confianza': 0.85
+        }
+        pregunta = PREGUNTAS[i % len(PREGUNTAS)]
+        ciclos = analizar_ciclos_temporales(date(1950, 1, 1) + timedelta(days=i * 37), pregunta)
+        casos.append((analisis, ciclos, pregunta))
+    return casos
+
+def reportes_por_segundo(funcion, casos, segundos_minimos=1.0):
+    hechos = 0
+    inicio = time.perf_counter()
+    while True:
+        for analisis, ciclos, pregunta in casos:
+            funcion(analisis, ciclos, pregunta)
+        hechos += len(casos)
+        transcurrido = time.perf_counter() - inicio
+        if transcurrido >= segundos_minimos:
+            return hechos / transcurrido
+
+def cargar_referencia(ruta):
+    spec = importlib.util.spec_from_file_location('reporte_referencia', ruta)
+    modulo = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(modulo)
+    return modulo.generar_analisis_completo
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--casos', type=int, default=500)
+    parser.add_argument('--segundos', type=float, default=2.0)
+    parser.add_argument('--referencia', help="Otra versión de tumapaguia/reporte.py para comparar")
+    args = parser.parse_args()
+    
+    casos = casos_sinteticos(args.casos)
+    versiones = [('actual', generar_analisis_completo)]
+    
+    if args.referencia:
+        referencia = cargar_referencia(args.referencia)
+        distintos = sum(referencia(*caso) != generar_analisis_completo(*caso) for caso in casos)
+        print(f"Informes distintos a la referencia: {distintos} de {len(casos)}")
+        versiones.append(('referencia', referencia))
+    
+    for nombre, funcion in versiones:
+        print(f"{nombre:<12} {reportes_por_segundo(funcion, casos, args.segundos):12,.0f} reportes/s")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""
+Benchmark del servidor de inferencia: memoria total y latencia según réplicas
+
+Lanza N réplicas simuladas (intérpretes que validan y analizan fotos como la
+página de consulta), primero cada una con su propio MediaPipe y después todas
+contra un solo `python -m tumapaguia servidor`. Reporta la suma del RSS de
+las réplicas (más el del servidor) con todas vivas y los segundos por réplica.
+
+Uso:
+python -m benchmarks.bench_servidor --replicas 4
+python -m benchmarks.bench_servidor --replicas 2 4 8 --fotos 2
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from benchmarks.sinteticos import codificar_jpeg, foto_sintetica
+
+RAIZ = Path(__file__).resolve().parent.parent
+
+REPLICA = """
+import io, json, sys, time
+sys.path.insert(0, {raiz!r})
+from tumapaguia.quirologia import analisis_quirologico_completo
+from tumapaguia.vision import precalentar_detectores, validar_fotos
+
+def leer_status_kb(campo):
+    with open('/proc/self/status') as f:
+        return next(int(l.split()[1]) for l in f if l.startswith(campo))
+
+precalentar_detectores()
+fotos = [io.BytesIO(open(ruta, 'rb').read()) for ruta in {rutas!r}]
+inicio = time.perf_counter()
+resultados = validar_fotos(fotos)
+validas = [(img, v['deteccion']) for img, v, _ in resultados if v['valida']]
+if validas:
+    analisis_quirologico_completo([i for i, _ in validas], [d for _, d in validas])
+print(json.dumps({{'segundos': time.perf_counter() - inicio, 'rss_mb': leer_status_kb('VmRSS') / 1024}}), flush=True)
+# Sigue viva hasta que el benchmark mida a todas juntas
+sys.stdin.read()
+"""
+
+def rss_mb(pid):
+    with open(f'/proc/{pid}/status') as f:
+        return next(int(l.split()[1]) for l in f if l.startswith('VmRSS')) / 1024
+
+def preparar_fotos(carpeta, replicas, n):
+    """Fotos distintas por réplica y por ronda: ninguna aprovecha la caché del servidor"""
+    rutas = []
+    for r in range(replicas):
+        propias = []
+        for i in range(n):
+            ruta = Path(carpeta) / f"replica{r}_{i}.jpg"
+            ruta.write_bytes(codificar_jpeg(foto_sintetica('mano', 1600, 1200, semilla=replicas * 1000 + r * n + i)))
+            propias.append(str(ruta))
+        rutas.append(propias)
+    return rutas
+
+def correr_replicas(rutas, entorno):
+    procesos = [subprocess.Popen([sys.executable, '-c', REPLICA.format(raiz=str(RAIZ), rutas=propias)],
+                                 cwd=RAIZ, env=entorno, stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True)
+                for propias in rutas]
+    try:
+        resultados = [json.loads(p.stdout.readline()) for p in procesos]
+    finally:
+        for p in procesos:
+            p.stdin.close()
+            p.wait()
+    return resultados
+
+def esperar_socket(ruta, proceso, segundos=120):
+    limite = time.monotonic() + segundos
+    while not os.path.exists(ruta):
+        if proceso.poll() is not None or time.monotonic() > limite:
+            raise SystemExit("El servidor de inferencia no arrancó")
+        time.sleep(0.1)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--replicas', type=int, nargs='+', default=[1, 2, 4])
+    parser.add_argument('--fotos', type=int, default=2, help="Fotos por réplica")
+    args = parser.parse_args()
+    
+    with tempfile.TemporaryDirectory() as carpeta:
+        socket_servidor = str(Path(carpeta) / 'inferencia.sock')
+        entorno_local = {k: v for k, v in os.environ.items() if k != 'MAPA_SERVIDOR_INFERENCIA'}
+        entorno_remoto = dict(entorno_local, MAPA_SERVIDOR_INFERENCIA=socket_servidor)
+        
+        servidor = subprocess.Popen([sys.executable, '-m', 'tumapaguia', 'servidor', '--socket', socket_servidor],
+                                    cwd=RAIZ, env=entorno_local, stderr=subprocess.DEVNULL)
+        try:
+            esperar_socket(socket_servidor, servidor)
+            for replicas in args.replicas:
+                rutas = preparar_fotos(carpeta, replicas, args.fotos)
+                for nombre, entorno in (('local', entorno_local), ('servidor', entorno_remoto)):
+                    resultados = correr_replicas(rutas, entorno)
+                    total = sum(r['rss_mb'] for r in resultados)
+                    extra = ""
+                    if nombre == 'servidor':
+                        total += rss_mb(servidor.pid)
+                        extra = f" (servidor {rss_mb(servidor.pid):.0f} MB)"
+                    segundos = max(r['segundos'] for r in resultados)
+                    print(f"{replicas} réplica(s) {nombre:<9}: RSS total {total:6.0f} MB{extra}, "
+                          f"réplica más lenta {segundos:.2f} s")
+        finally:
+            servidor.terminate()
+            servidor.wait()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""
+Benchmark de la cola de trabajos: latencia de envío bajo carga y turnos entre sesiones
+
+Simula una ráfaga: cada sesión envía varias consultas gratis seguidas mientras
+el pool ya está ocupado. Reporta cuánto tarda `enviar` (lo que espera el script
+de Streamlit), la espera en cola de cada consulta y el orden en que se
+atendieron las sesiones.
+
+Uso:
+python -m benchmarks.bench_trabajos
+python -m benchmarks.bench_trabajos --sesiones 8 --consultas 3 --hilos 2
+"""
+
+import argparse
+import io
+import time
+from datetime import date
+
+import numpy as np
+
+from benchmarks.sinteticos import RESOLUCIONES, codificar_jpeg, foto_sintetica
+from tumapaguia.trabajos import ESTADOS_ACTIVOS, ColaLlena, ColaTrabajos, procesar_consulta
+from tumapaguia.vision import precalentar_detectores
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sesiones', type=int, default=6)
+    parser.add_argument('--consultas', type=int, default=2, help="Consultas seguidas por sesión")
+    parser.add_argument('--hilos', type=int, default=2)
+    parser.add_argument('--resolucion', default='2MP', choices=list(RESOLUCIONES))
+    args = parser.parse_args()
+    
+    precalentar_detectores()
+    cola = ColaTrabajos(max_hilos=args.hilos, max_cola=args.sesiones * args.consultas,
+                        max_por_sesion=args.consultas)
+    # Fotos distintas: la caché por contenido no debe ahorrar el análisis
+    w, h = RESOLUCIONES[args.resolucion]
+    fotos = [codificar_jpeg(foto_sintetica('mano', w, h, semilla=k)) for k in range(args.sesiones * args.consultas)]
+    
+    # Cada sesión envía todas sus consultas antes de que llegue la siguiente
+    enviados = []
+    envio_ms = []
+    for s in range(args.sesiones):
+        for _ in range(args.consultas):
+            inicio = time.monotonic()
+            try:
+                id_trabajo = cola.enviar(procesar_consulta, [io.BytesIO(fotos[len(enviados)])], date(1990, 1, 1),
+                                         exigir_todas_validas=True, sesion=f"s{s}")
+            except ColaLlena as e:
+                print(f"Rechazada: {e}")
+                continue
+            envio_ms.append((time.monotonic() - inicio) * 1e3)
+            enviados.append((f"s{s}", id_trabajo, inicio))
+    
+    inicio = time.perf_counter()
+    while any(cola.estado(i)['estado'] in ESTADOS_ACTIVOS for _, i, _ in enviados):
+        time.sleep(0.05)
+    total = time.perf_counter() - inicio
+    
+    estados = [(sesion, cola.estado(i), enviado) for sesion, i, enviado in enviados]
+    esperas = [e['espera_ms'] for _, e, _ in estados]
+    orden = [sesion for sesion, e, enviado in sorted(estados, key=lambda x: x[2] + x[1]['espera_ms'] / 1e3)]
+    print(f"{len(enviados)} consultas de {args.sesiones} sesiones con {args.hilos} hilos: {total:.2f} s")
+    print(f"enviar: p50 {np.percentile(envio_ms, 50):.3f} ms  p95 {np.percentile(envio_ms, 95):.3f} ms  "
+          f"máx {max(envio_ms):.3f} ms")
+    print(f"espera en cola: p50 {np.percentile(esperas, 50):.0f} ms  máx {max(esperas):.0f} ms")
+    print(f"orden de atención: {' '.join(orden)}")
+    fallidos = [e['error'] for _, e, _ in estados if e['error']]
+    if fallidos:
+        print(f"Fallidas: {fallidos}")
+
+if __name__ == "__main__":
+    main()
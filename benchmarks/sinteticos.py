@@ -0,0 +1,102 @@
+"""
+Entradas sintéticas y deterministas para los benchmarks
+
+Todo se genera sin conexión a partir de una semilla: landmarks de una mano
+derecha canónica con ruido, la silueta dibujada a partir de esos mismos
+landmarks y fotos defectuosas (vacía, oscura, borrosa, bajo contraste).
+"""
+
+import cv2
+import numpy as np
+
+# Mano derecha canónica, palma hacia la cámara (x, y normalizados; z relativo a la muñeca)
+LANDMARKS_CANONICOS = np.array([
+    [0.50, 0.90, 0.00],
+    [0.38, 0.82, -0.02], [0.30, 0.72, -0.04], [0.25, 0.63, -0.05], [0.21, 0.55, -0.06],
+    [0.40, 0.55, -0.03], [0.38, 0.42, -0.05], [0.37, 0.34, -0.06], [0.36, 0.27, -0.07],
+    [0.49, 0.53, -0.03], [0.49, 0.38, -0.05], [0.49, 0.29, -0.06], [0.49, 0.21, -0.07],
+    [0.58, 0.55, -0.03], [0.60, 0.41, -0.05], [0.61, 0.33, -0.06], [0.62, 0.26, -0.06],
+    [0.66, 0.60, -0.02], [0.69, 0.50, -0.04], [0.71, 0.44, -0.05], [0.73, 0.38, -0.05],
+], dtype=np.float32)
+
+DEDOS = [[1, 2, 3, 4], [5, 6, 7, 8], [9, 10, 11, 12], [13, 14, 15, 16], [17, 18, 19, 20]]
+PALMA = [0, 1, 5, 9, 13, 17]
+
+COLOR_PIEL = (224, 172, 138)
+COLOR_FONDO = (60, 70, 90)
+COLOR_PLIEGUE = (190, 140, 110)
+
+RESOLUCIONES = {
+    '0.5MP': (800, 600),
+    '2MP': (1632, 1224),
+    '12MP': (4032, 3024),
+    '48MP': (8000, 6000),
+}
+
+TIPOS = ('mano', 'vacia', 'oscura', 'borrosa', 'bajo_contraste')
+
+def landmarks_sinteticos(n=1, semilla=0, ruido=0.01):
+    """(n, 21, 3) landmarks normalizados float32 alrededor de la mano canónica"""
+    rng = np.random.default_rng(semilla)
+    lote = LANDMARKS_CANONICOS + rng.normal(0, ruido, (n, 21, 3)).astype(np.float32)
+    return lote.astype(np.float32)
+
+def _textura(h, w, rng, amplitud=12):
+    """Ruido suave para que las fotos sintéticas tengan nitidez realista"""
+    ruido = rng.normal(0, amplitud, (h // 2 + 1, w // 2 + 1)).astype(np.float32)
+    return cv2.resize(ruido, (w, h), interpolation=cv2.INTER_LINEAR)[..., None]
+
+def silueta_mano(w, h, landmarks=None, semilla=0, pliegues=None):
+    """Foto RGB uint8 de una mano dibujada a partir de sus landmarks normalizados
+    
+    `pliegues` reemplaza los tres pliegues rectos por defecto con polilíneas
+    (k, 2) en coordenadas normalizadas.
+    """
+    if landmarks is None:
+        landmarks = LANDMARKS_CANONICOS
+    rng = np.random.default_rng(semilla)
+    
+    img = np.empty((h, w, 3), dtype=np.uint8)
+    img[:] = COLOR_FONDO
+    puntos = np.round(landmarks[:, :2] * [w, h]).astype(np.int32)
+    grosor = max(2, int(0.06 * min(w, h)))
+    
+    cv2.fillConvexPoly(img, cv2.convexHull(puntos[PALMA]), COLOR_PIEL, lineType=cv2.LINE_AA)
+    for dedo in DEDOS:
+        trazo = puntos[dedo]
+        cv2.polylines(img, [trazo], False, COLOR_PIEL, grosor, lineType=cv2.LINE_AA)
+        cv2.circle(img, tuple(int(v) for v in trazo[-1]), grosor // 2, COLOR_PIEL, -1, lineType=cv2.LINE_AA)
+    # Pliegues de la palma como trazos algo más oscuros
+    if pliegues is None:
+        for a, b in ((5, 17), (1, 13), (2, 0)):
+            cv2.line(img, tuple(int(v) for v in puntos[a] + [0, grosor]), tuple(int(v) for v in puntos[b] + [0, grosor // 2]),
+                     COLOR_PLIEGUE, max(1, grosor // 10), lineType=cv2.LINE_AA)
+    else:
+        trazos = [np.round(np.asarray(p) * [w, h]).astype(np.int32) for p in pliegues]
+        cv2.polylines(img, trazos, False, COLOR_PLIEGUE, max(1, grosor // 10), lineType=cv2.LINE_AA)
+    
+    return np.clip(img + _textura(h, w, rng), 0, 255).astype(np.uint8)
+
+def foto_sintetica(tipo, w, h, semilla=0):
+    """Foto RGB uint8 del tipo indicado (ver TIPOS)"""
+    if tipo == 'vacia':
+        rng = np.random.default_rng(semilla)
+        img = np.empty((h, w, 3), dtype=np.float32)
+        img[:] = COLOR_FONDO
+        return np.clip(img + _textura(h, w, rng), 0, 255).astype(np.uint8)
+    
+    mano = silueta_mano(w, h, semilla=semilla)
+    if tipo == 'mano':
+        return mano
+    if tipo == 'oscura':
+        return (mano * 0.15).astype(np.uint8)
+    if tipo == 'borrosa':
+        return cv2.GaussianBlur(mano, (0, 0), max(w, h) / 300)
+    if tipo == 'bajo_contraste':
+        return (mano * 0.12 + 110).astype(np.uint8)
+    raise ValueError(f"Tipo desconocido: {tipo}")
+
+def codificar_jpeg(img_array, calidad=90):
+    """Bytes JPEG de la foto, como los subiría un usuario"""
+    ok, datos = cv2.imencode('.jpg', cv2.cvtColor(img_array, cv2.COLOR_RGB2BGR), [cv2.IMWRITE_JPEG_QUALITY, calidad])
+    return datos.tobytes()
@@ -0,0 +1,206 @@
+"""
+Suite de benchmarks por etapa del pipeline, con control de regresiones
+
+Mide por separado la decodificación PIL completa y la reducida de `cargar_foto`,
+`validar_calidad_imagen`, la detección
+MediaPipe, `analizar_lineas` sobre la foto, `analizar_forma_mano` / `analizar_dedos` / `analizar_montes` /
+`calcular_flexibilidad`, `analizar_ciclos_temporales` y
+`generar_analisis_completo` sobre entradas sintéticas deterministas. Guarda
+p50/p95 de latencia y el pico de memoria (tracemalloc) de cada etapa en JSON.
+
+Con --comparar, falla (código 1) si alguna etapa empeora más que el porcentaje
+configurado en benchmarks/umbrales.json respecto a un resultado anterior.
+
+Las siluetas sintéticas no siempre activan a MediaPipe; con --fotos se agregan
+fotos reales de una carpeta a las etapas de validación y detección.
+
+Uso:
+python -m benchmarks.suite --salida bench_resultados.json
+python -m benchmarks.suite --comparar bench_base.json
+"""
+
+import argparse
+import io
+import json
+import platform
+import sys
+import time
+import tracemalloc
+from datetime import date
+from pathlib import Path
+
+import numpy as np
+from PIL import Image
+
+from benchmarks.sinteticos import (LANDMARKS_CANONICOS, RESOLUCIONES, TIPOS, codificar_jpeg, foto_sintetica,
+                                   landmarks_sinteticos)
+from tumapaguia.ciclos import analizar_ciclos_temporales
+from tumapaguia.quirologia import (
+    analizar_dedos_lote,
+    analizar_forma_mano_lote,
+    analizar_lineas,
+    analizar_montes_lote,
+    calcular_flexibilidad_lote,
+    puntos_en_pixeles,
+)
+from tumapaguia.ingesta import cargar_foto
+from tumapaguia.reporte import generar_analisis_completo
+from tumapaguia.vision import CONFIANZA_VALIDACION, detectar_mano, precalentar_detectores, validar_calidad_imagen
+
+RUTA_UMBRALES = Path(__file__).resolve().parent / 'umbrales.json'
+
+def medir_etapa(funcion, repeticiones, calentamiento=1):
+    """Latencias p50/p95 en ms y pico de memoria en KB de `funcion()`"""
+    for _ in range(calentamiento):
+        funcion()
+    
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        funcion()
+        tiempos.append((time.perf_counter() - inicio) * 1e3)
+    
+    tracemalloc.start()
+    funcion()
+    _, pico = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    
+    return {
+        'p50_ms': round(float(np.percentile(tiempos, 50)), 4),
+        'p95_ms': round(float(np.percentile(tiempos, 95)), 4),
+        'pico_kb': round(pico / 1024, 1),
+        'repeticiones': repeticiones
+    }
+
+def _decodificar(datos):
+    with Image.open(io.BytesIO(datos)) as img:
+        img.load()
+        return img
+
+def etapas_de_imagen(resoluciones, fotos_reales):
+    """(nombre, función) de las etapas que dependen de la foto"""
+    for resolucion in resoluciones:
+        w, h = RESOLUCIONES[resolucion]
+        for tipo in TIPOS:
+            img_array = foto_sintetica(tipo, w, h)
+            if tipo == 'mano':
+                datos = codificar_jpeg(img_array)
+                yield f'decodificacion/{resolucion}', lambda datos=datos: _decodificar(datos)
+                yield f'ingesta/{resolucion}', lambda datos=datos: cargar_foto(io.BytesIO(datos))
+                yield f'deteccion_mediapipe/{resolucion}', lambda a=img_array: detectar_mano(a, CONFIANZA_VALIDACION)
+                puntos = puntos_en_pixeles(LANDMARKS_CANONICOS, w, h)
+                yield f'analizar_lineas/{resolucion}', lambda a=img_array, p=puntos: analizar_lineas(a, p)
+            yield f'validar_calidad_imagen/{resolucion}/{tipo}', lambda a=img_array: validar_calidad_imagen(a)
+    
+    for ruta in fotos_reales:
+        with Image.open(ruta) as img:
+            img_array = np.array(img.convert('RGB'))
+        yield f'deteccion_mediapipe/foto/{ruta.name}', lambda a=img_array: detectar_mano(a, CONFIANZA_VALIDACION)
+        yield f'validar_calidad_imagen/foto/{ruta.name}', lambda a=img_array: validar_calidad_imagen(a)
+
+def etapas_de_analisis():
+    """(nombre, función) de las etapas que trabajan sobre landmarks y texto"""
+    w, h = RESOLUCIONES['12MP']
+    puntos = puntos_en_pixeles(landmarks_sinteticos()[0], w, h)
+    lote = puntos_en_pixeles(landmarks_sinteticos(n=256, semilla=1), w, h)
+    
+    yield 'analizar_forma_mano', lambda: analizar_forma_mano_lote(puntos, w, h)
+    yield 'analizar_dedos', lambda: analizar_dedos_lote(puntos)
+    yield 'analizar_montes', lambda: analizar_montes_lote(puntos)
+    yield 'calcular_flexibilidad', lambda: calcular_flexibilidad_lote(puntos)
+    yield 'analizar_mano_lote_256', lambda: (
+        analizar_forma_mano_lote(lote, w, h), analizar_dedos_lote(lote),
+        analizar_montes_lote(lote), calcular_flexibilidad_lote(lote)
+    )
+    
+    nacimiento = date(1990, 5, 17)
+    pregunta = "¿Cómo será mi carrera profesional en los próximos años?"
+    yield 'analizar_ciclos_temporales', lambda: analizar_ciclos_temporales(nacimiento, pregunta)
+    
+    analisis = {
+        'forma_mano': analizar_forma_mano_lote(puntos, w, h),
+        'dedos': analizar_dedos_lote(puntos),
+        'montes': analizar_montes_lote(puntos),
+        'lineas': analizar_lineas(None, puntos),
+        'flexibilidad': calcular_flexibilidad_lote(puntos),
+        'confianza': 0.85
+    }
+    ciclos = analizar_ciclos_temporales(nacimiento, pregunta)
+    yield 'generar_analisis_completo', lambda: generar_analisis_completo(analisis, ciclos, pregunta)
+
+def ejecutar(resoluciones, repeticiones, fotos_reales=()):
+    precalentar_detectores()
+    etapas = {}
+    for nombre, funcion in list(etapas_de_imagen(resoluciones, fotos_reales)) + list(etapas_de_analisis()):
+        # Las etapas baratas se repiten más para estabilizar los percentiles
+        n = repeticiones if '/' in nombre else repeticiones * 20
+        etapas[nombre] = medir_etapa(funcion, n)
+        print(f"{nombre:<48} p50 {etapas[nombre]['p50_ms']:10.3f} ms  "
+              f"p95 {etapas[nombre]['p95_ms']:10.3f} ms  pico {etapas[nombre]['pico_kb']:10.1f} KB",
+              file=sys.stderr)
+    
+    return {
+        'meta': {
+            'python': platform.python_version(),
+            'plataforma': platform.platform(),
+            'fecha': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'resoluciones': list(resoluciones),
+        },
+        'etapas': etapas
+    }
+
+def comparar(actual, base, umbrales):
+    """Lista de regresiones: etapas cuyo p50, p95 o pico superan el umbral (%)
+    
+    Las diferencias absolutas menores que `minimo_ms` / `minimo_kb` se
+    consideran ruido de medición y no cuentan.
+    """
+    minimos = {'p50_ms': umbrales.get('minimo_ms', 0), 'p95_ms': umbrales.get('minimo_ms', 0),
+               'pico_kb': umbrales.get('minimo_kb', 0)}
+    regresiones = []
+    for nombre, medida in actual['etapas'].items():
+        anterior = base['etapas'].get(nombre)
+        if anterior is None:
+            continue
+        umbral = umbrales.get('etapas', {}).get(nombre.split('/')[0], umbrales['defecto'])
+        for metrica in ('p50_ms', 'p95_ms', 'pico_kb'):
+            if anterior[metrica] <= 0 or medida[metrica] - anterior[metrica] < minimos[metrica]:
+                continue
+            cambio = (medida[metrica] - anterior[metrica]) / anterior[metrica] * 100
+            if cambio > umbral:
+                regresiones.append(f"{nombre} {metrica}: {anterior[metrica]} -> {medida[metrica]} (+{cambio:.0f}% > {umbral}%)")
+    return regresiones
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--resoluciones', nargs='+', default=['0.5MP', '2MP', '12MP'], choices=list(RESOLUCIONES))
+    parser.add_argument('--repeticiones', type=int, default=7)
+    parser.add_argument('--fotos', default=None, help="Carpeta con fotos reales de manos (opcional)")
+    parser.add_argument('--salida', default='bench_resultados.json')
+    parser.add_argument('--comparar', default=None, help="Resultado anterior contra el cual controlar regresiones")
+    parser.add_argument('--umbrales', default=str(RUTA_UMBRALES))
+    args = parser.parse_args()
+    
+    fotos_reales = []
+    if args.fotos:
+        fotos_reales = sorted(p for p in Path(args.fotos).iterdir() if p.suffix.lower() in ('.jpg', '.jpeg', '.png'))
+    
+    resultado = ejecutar(args.resoluciones, args.repeticiones, fotos_reales)
+    with open(args.salida, 'w', encoding='utf-8') as f:
+        json.dump(resultado, f, indent=2, ensure_ascii=False)
+    
+    if args.comparar:
+        with open(args.comparar, encoding='utf-8') as f:
+            base = json.load(f)
+        with open(args.umbrales, encoding='utf-8') as f:
+            umbrales = json.load(f)
+        
+        regresiones = comparar(resultado, base, umbrales)
+        for regresion in regresiones:
+            print(f"REGRESIÓN {regresion}", file=sys.stderr)
+        if regresiones:
+            return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,17 @@
+"""
+Copias de imagen en una consulta: tras decodificar, la validación y el
+análisis trabajan sobre el búfer canónico o sobre copias reducidas
+(ver benchmarks.bench_copias)
+"""
+
+from benchmarks.bench_copias import medir_copias, preparar_fotos
+
+FOTOS = 2
+
+def test_consulta_no_copia_la_imagen_completa(tmp_path):
+    copias = medir_copias(preparar_fotos(tmp_path, 12, FOTOS))
+    
+    # Una copia completa más en cualquier etapa suma 1 por foto
+    assert (copias['validacion'] + copias['analisis']) / FOTOS < 1
+    # La decodificación: el búfer canónico y, mientras se arma, lo que exporta PIL
+    assert copias['decodificacion'] / FOTOS <= 2.05
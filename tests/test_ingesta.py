@@ -0,0 +1,59 @@
+"""
+Presupuesto de memoria de la ingesta: una foto que cabe en el tope de la
+sesión se decodifica sin esperar a sus propias reservas, y una consulta
+terminada devuelve todo lo que reservó
+"""
+
+import io
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+import cv2
+
+from benchmarks.sinteticos import codificar_jpeg, foto_sintetica
+from tumapaguia.ingesta import BYTES_POR_PIXEL_DECODIFICADO, cargar_foto, obtener_presupuesto_memoria
+
+RAIZ = Path(__file__).resolve().parent.parent
+
+CONSULTA = """
+import io, json, sys
+sys.path.insert(0, {raiz!r})
+from tumapaguia.ingesta import obtener_presupuesto_memoria
+from tumapaguia.quirologia import analisis_quirologico_completo
+from tumapaguia.vision import validar_fotos
+
+resultados = validar_fotos([io.BytesIO(open(ruta, 'rb').read()) for ruta in {rutas!r}], sesion='consulta')
+imagenes = [img for img, _, _ in resultados if img is not None]
+analisis_quirologico_completo(imagenes)
+del resultados, imagenes
+print(json.dumps(obtener_presupuesto_memoria().usados))
+"""
+
+def test_consulta_devuelve_su_memoria(tmp_path):
+    # En un intérprete nuevo: la primera validación es la que carga MediaPipe
+    rutas = []
+    for i in range(2):
+        ruta = tmp_path / f"foto_{i}.jpg"
+        ruta.write_bytes(codificar_jpeg(foto_sintetica('mano', 4000, 3000, semilla=i)))
+        rutas.append(str(ruta))
+    
+    salida = subprocess.run([sys.executable, '-c', CONSULTA.format(raiz=str(RAIZ), rutas=rutas)],
+                            capture_output=True, text=True, check=True)
+    
+    assert json.loads(salida.stdout.strip().splitlines()[-1]) == 0
+
+def test_foto_al_tope_de_la_sesion(monkeypatch):
+    # PNG: sin reducción DCT, se decodifica completa antes de reducirla
+    ancho, alto = 3000, 2250
+    _, datos = cv2.imencode('.png', foto_sintetica('mano', ancho, alto), [cv2.IMWRITE_PNG_COMPRESSION, 1])
+    presupuesto = obtener_presupuesto_memoria()
+    monkeypatch.setattr(presupuesto, 'max_bytes_sesion', ancho * alto * BYTES_POR_PIXEL_DECODIFICADO)
+    
+    img = cargar_foto(io.BytesIO(datos.tobytes()), sesion='tope')
+    
+    assert img.tamano_original == (ancho, alto)
+    assert presupuesto._por_sesion['tope'] == img.rgb.nbytes
+    del img
+    assert 'tope' not in presupuesto._por_sesion
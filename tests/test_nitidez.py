@@ -0,0 +1,73 @@
+"""
+Nitidez de fotos grandes: la validación decodifica la foto reducida, pero su
+veredicto y su valor deben coincidir con el cálculo original a resolución
+completa (varianza del Laplaciano de toda la imagen en grises)
+"""
+
+import io
+
+import cv2
+import numpy as np
+import pytest
+from PIL import Image
+
+from benchmarks.sinteticos import codificar_jpeg, foto_sintetica
+from tumapaguia.ingesta import leer_gris_nativo, obtener_presupuesto_memoria
+from tumapaguia.vision import validar_fotos
+
+ANCHO, ALTO = 8000, 6000
+
+@pytest.fixture(scope='module')
+def mano():
+    return foto_sintetica('mano', ANCHO, ALTO)
+
+def nitidez_completa(datos):
+    """El cálculo previo a la decodificación reducida"""
+    gray = cv2.cvtColor(np.asarray(Image.open(io.BytesIO(datos)).convert('RGB')), cv2.COLOR_RGB2GRAY)
+    return cv2.Laplacian(gray, cv2.CV_64F).var()
+
+class Subida(io.BytesIO):
+    """Archivo subido como lo entrega Streamlit"""
+
+@pytest.mark.parametrize('sigma', [0, 2, 3, 4])
+def test_veredicto_como_a_resolucion_completa(mano, sigma):
+    img = mano if sigma == 0 else cv2.GaussianBlur(mano, (0, 0), sigma)
+    datos = codificar_jpeg(img)
+    esperada = nitidez_completa(datos)
+    
+    (_, validacion, _), = validar_fotos([Subida(datos)], modo='completo')
+    
+    assert validacion['validaciones']['nitidez'] == (esperada > 100)
+    assert validacion['nitidez'] == pytest.approx(esperada, rel=0.15)
+
+def test_png_como_a_resolucion_completa():
+    # Sin reducción DCT: la lectura nativa convierte a gris solo las baldosas
+    img = cv2.GaussianBlur(foto_sintetica('mano', 4000, 3000), (0, 0), 2)
+    _, datos = cv2.imencode('.png', cv2.cvtColor(img, cv2.COLOR_RGB2BGR), [cv2.IMWRITE_PNG_COMPRESSION, 1])
+    esperada = nitidez_completa(datos.tobytes())
+    
+    (_, validacion, _), = validar_fotos([Subida(datos.tobytes())], modo='completo')
+    
+    assert validacion['validaciones']['nitidez'] == (esperada > 100)
+    assert validacion['nitidez'] == pytest.approx(esperada, rel=0.15)
+
+def test_lectura_nativa_devuelve_su_memoria(mano):
+    datos = codificar_jpeg(cv2.GaussianBlur(mano, (0, 0), 3))
+    presupuesto = obtener_presupuesto_memoria()
+    antes = presupuesto.usados
+    
+    resultados = validar_fotos([Subida(datos)], modo='completo')
+    del resultados
+    
+    assert presupuesto.usados == antes
+
+def test_lectura_nativa_reserva_solo_la_luminancia(mano):
+    presupuesto = obtener_presupuesto_memoria()
+    antes = presupuesto.usados
+    
+    gris = leer_gris_nativo(io.BytesIO(codificar_jpeg(mano)))
+    assert gris.shape == (ALTO, ANCHO)
+    assert presupuesto.usados - antes == ANCHO * ALTO
+    
+    del gris
+    assert presupuesto.usados == antes
@@ -0,0 +1,56 @@
+"""
+Servidor de inferencia: con más hilos que MAPA_POOL_DETECTORES, cada hilo
+tiene su detector y las peticiones corren a la vez
+"""
+
+import os
+import subprocess
+import sys
+import threading
+from pathlib import Path
+
+from benchmarks.bench_servidor import esperar_socket
+from benchmarks.sinteticos import foto_sintetica
+from tumapaguia.inferencia import ClienteInferencia
+
+RAIZ = Path(__file__).resolve().parent.parent
+HILOS = 4
+PETICIONES = 12
+
+def test_hilos_por_encima_del_pool_por_defecto(tmp_path):
+    ruta = str(tmp_path / 'inferencia.sock')
+    entorno = {k: v for k, v in os.environ.items() if k != 'MAPA_SERVIDOR_INFERENCIA'}
+    entorno['MAPA_POOL_DETECTORES'] = '2'
+    servidor = subprocess.Popen([sys.executable, '-m', 'tumapaguia', 'servidor', '--socket', ruta,
+                                 '--hilos', str(HILOS)], cwd=RAIZ, env=entorno, stderr=subprocess.DEVNULL)
+    try:
+        esperar_socket(ruta, servidor)
+        cliente = ClienteInferencia(ruta)
+        fotos = [foto_sintetica('mano', 1600, 1200, semilla=i) for i in range(PETICIONES)]
+        # Todas a la vez y sin huella: ninguna se comparte ni sale de la caché
+        salida = threading.Barrier(PETICIONES)
+        errores = []
+        
+        def pedir(foto):
+            salida.wait()
+            try:
+                cliente.pedir({'op': 'detectar', 'min_confianza': 0.5, 'modo': 'completo', 'huella': None}, foto)
+            except Exception as e:
+                errores.append(e)
+        
+        hilos = [threading.Thread(target=pedir, args=(foto,)) for foto in fotos]
+        for hilo in hilos:
+            hilo.start()
+        for hilo in hilos:
+            hilo.join()
+        estado = cliente.pedir({'op': 'estado'})['resultado']
+    finally:
+        servidor.terminate()
+        servidor.wait()
+    
+    assert not errores
+    assert estado['hilos'] == HILOS
+    assert estado['atendidas'] == PETICIONES
+    pool, = [p for p in estado['detectores'] if p['min_confianza'] == 0.5 and p['modelo'] == 'completo']
+    assert pool['tamano'] == HILOS
+    assert pool['max_prestados'] > 2
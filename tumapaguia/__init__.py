@@ -0,0 +1,6 @@
+"""
+Mapa Guía de tu Destino - herramientas fuera de la interfaz web
+
+Uso:
+python -m tumapaguia batch <carpeta> --out resultados.jsonl
+"""
@@ -0,0 +1,22 @@
+"""Punto de entrada: python -m tumapaguia <comando>"""
+
+import argparse
+import sys
+
+from tumapaguia import autenticacion, lote, servidor
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m tumapaguia",
+        description="Mapa Guía de tu Destino - herramientas de línea de comandos"
+    )
+    comandos = parser.add_subparsers(dest="comando", required=True)
+    lote.registrar_comando(comandos)
+    servidor.registrar_comando(comandos)
+    autenticacion.registrar_comando(comandos)
+    
+    args = parser.parse_args(argv)
+    return args.funcion(args)
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,267 @@
+"""
+Registro e inicio de sesión: bcrypt en hilos propios, tokens de sesión firmados
+y revocables, y límite de intentos por email
+"""
+
+import base64
+import getpass
+import hashlib
+import hmac
+import json
+import os
+import secrets
+import sqlite3
+import sys
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import bcrypt
+
+from tumapaguia.persistencia import RUTA_DB, abrir_conexion, crear_esquema
+from tumapaguia.recursos import recurso_compartido
+
+COSTO_BCRYPT = int(os.getenv('MAPA_BCRYPT_COSTO', '12'))
+# bcrypt libera el GIL: con pocos hilos el resto de sesiones sigue respondiendo
+MAX_HILOS_BCRYPT = int(os.getenv('MAPA_HILOS_BCRYPT', '2'))
+HORAS_SESION = int(os.getenv('MAPA_SESION_HORAS', '24'))
+MAX_INTENTOS_LOGIN = int(os.getenv('MAPA_MAX_INTENTOS_LOGIN', '5'))
+VENTANA_INTENTOS_SEGUNDOS = 15 * 60
+MIN_LARGO_CONTRASENA = 8
+# bcrypt solo usa los primeros 72 bytes
+MAX_BYTES_CONTRASENA = 72
+# Cuentas con acceso a la telemetría; solo se crean con `python -m tumapaguia usuario`
+EMAILS_ADMIN = {e.strip().lower() for e in os.getenv('MAPA_ADMIN_EMAILS', '').split(',') if e.strip()}
+
+class IntentosExcedidos(Exception):
+    """Demasiados intentos fallidos para un email; `espera` en segundos"""
+    
+    def __init__(self, espera):
+        super().__init__(f"Demasiados intentos. Espera {espera} segundos")
+        self.espera = espera
+
+# ============================================================================
+# BCRYPT
+# ============================================================================
+
+@recurso_compartido
+def obtener_executor_bcrypt():
+    return ThreadPoolExecutor(max_workers=MAX_HILOS_BCRYPT, thread_name_prefix='bcrypt')
+
+def hashear_contrasena(password, costo=COSTO_BCRYPT):
+    """Hash bcrypt calculado en el executor dedicado"""
+    sal = bcrypt.gensalt(rounds=costo)
+    futuro = obtener_executor_bcrypt().submit(bcrypt.hashpw, password.encode('utf-8'), sal)
+    return futuro.result().decode('ascii')
+
+def verificar_contrasena(password, password_hash):
+    futuro = obtener_executor_bcrypt().submit(
+        bcrypt.checkpw, password.encode('utf-8'), password_hash.encode('ascii')
+    )
+    return futuro.result()
+
+@recurso_compartido
+def hash_ficticio():
+    """Hash con el costo actual para emails inexistentes: igual tiempo de respuesta"""
+    return hashear_contrasena(secrets.token_hex(16))
+
+# ============================================================================
+# LÍMITE DE INTENTOS
+# ============================================================================
+
+class LimitadorIntentos:
+    """Ventana deslizante de intentos fallidos por email"""
+    
+    def __init__(self, max_intentos=MAX_INTENTOS_LOGIN, ventana=VENTANA_INTENTOS_SEGUNDOS):
+        self.max_intentos = max_intentos
+        self.ventana = ventana
+        self._fallos = {}
+        self._lock = threading.Lock()
+    
+    def comprobar(self, email):
+        """Lanza IntentosExcedidos si el email agotó sus intentos"""
+        ahora = time.monotonic()
+        with self._lock:
+            fallos = self._fallos.get(email)
+            if not fallos:
+                return
+            while fallos and fallos[0] <= ahora - self.ventana:
+                fallos.popleft()
+            if len(fallos) >= self.max_intentos:
+                raise IntentosExcedidos(int(fallos[0] + self.ventana - ahora) + 1)
+    
+    def registrar_fallo(self, email):
+        ahora = time.monotonic()
+        with self._lock:
+            self._fallos.setdefault(email, deque(maxlen=self.max_intentos)).append(ahora)
+            # Sin entradas viejas acumuladas aunque lleguen emails al azar
+            if len(self._fallos) > 10000:
+                self._fallos = {
+                    e: f for e, f in self._fallos.items() if f and f[-1] > ahora - self.ventana
+                }
+    
+    def reiniciar(self, email):
+        with self._lock:
+            self._fallos.pop(email, None)
+
+@recurso_compartido
+def obtener_limitador():
+    return LimitadorIntentos()
+
+# ============================================================================
+# USUARIOS
+# ============================================================================
+
+def normalizar_email(email):
+    return email.strip().lower()
+
+def validar_contrasena(password):
+    """Mensaje de error, o None si la contraseña es aceptable"""
+    if len(password) < MIN_LARGO_CONTRASENA:
+        return f"La contraseña debe tener al menos {MIN_LARGO_CONTRASENA} caracteres"
+    if len(password.encode('utf-8')) > MAX_BYTES_CONTRASENA:
+        return f"La contraseña no puede superar {MAX_BYTES_CONTRASENA} bytes"
+    return None
+
+def es_email_admin(email):
+    return normalizar_email(email) in EMAILS_ADMIN
+
+def registrar_usuario(conn, email, password, nombre=None, permitir_admin=False):
+    """Crea el usuario y devuelve su dict; ValueError si los datos no son válidos
+    
+    El email no se verifica: sin `permitir_admin` los emails de
+    MAPA_ADMIN_EMAILS no se pueden registrar, o cualquiera tomaría el rol.
+    """
+    email = normalizar_email(email)
+    if '@' not in email:
+        raise ValueError("Email no válido")
+    if not permitir_admin and es_email_admin(email):
+        raise ValueError("Ese email no admite registro desde la aplicación")
+    error = validar_contrasena(password)
+    if error:
+        raise ValueError(error)
+    
+    password_hash = hashear_contrasena(password)
+    try:
+        with conn:
+            cursor = conn.execute(
+                "INSERT INTO usuarios (email, password_hash, nombre) VALUES (?, ?, ?)",
+                (email, password_hash, nombre or None)
+            )
+    except sqlite3.IntegrityError:
+        raise ValueError("Ya existe una cuenta con ese email")
+    
+    return {'id': cursor.lastrowid, 'email': email, 'nombre': nombre or None, 'version_token': 0}
+
+def autenticar(conn, email, password):
+    """Dict del usuario si las credenciales son correctas, None si no
+    
+    Lanza IntentosExcedidos antes de gastar CPU en bcrypt cuando el email
+    ya agotó sus intentos.
+    """
+    email = normalizar_email(email)
+    limitador = obtener_limitador()
+    limitador.comprobar(email)
+    
+    fila = conn.execute(
+        "SELECT id, password_hash, nombre, version_token FROM usuarios WHERE email = ?", (email,)
+    ).fetchone()
+    
+    valida = len(password.encode('utf-8')) <= MAX_BYTES_CONTRASENA
+    if fila is None:
+        # Mismo costo que con un email existente: el tiempo no revela cuentas
+        verificar_contrasena("", hash_ficticio())
+        valida = False
+    elif valida:
+        valida = verificar_contrasena(password, fila[1])
+    
+    if not valida:
+        limitador.registrar_fallo(email)
+        return None
+    
+    limitador.reiniciar(email)
+    return {'id': fila[0], 'email': email, 'nombre': fila[2], 'version_token': fila[3]}
+
+# ============================================================================
+# TOKENS DE SESIÓN
+# ============================================================================
+
+@recurso_compartido
+def secreto_sesion():
+    """Clave HMAC; sin MAPA_SECRETO_SESION los tokens mueren al reiniciar"""
+    secreto = os.getenv('MAPA_SECRETO_SESION')
+    return secreto.encode('utf-8') if secreto else secrets.token_bytes(32)
+
+def _firmar(datos):
+    return hmac.new(secreto_sesion(), datos, hashlib.sha256).hexdigest()
+
+def emitir_token(usuario, horas=HORAS_SESION):
+    """Token firmado con id, email, nombre, versión de token y vencimiento del usuario
+    
+    El token vive solo en el estado de la sesión de Streamlit: en la URL
+    quedaría en el historial, en los enlaces compartidos y en los logs.
+    """
+    carga = json.dumps({
+        'id': usuario['id'],
+        'email': usuario['email'],
+        'nombre': usuario.get('nombre'),
+        'version': usuario['version_token'],
+        'expira': int(time.time()) + horas * 3600
+    }, separators=(',', ':'))
+    datos = base64.urlsafe_b64encode(carga.encode('utf-8')).rstrip(b'=')
+    return f"{datos.decode('ascii')}.{_firmar(datos)}"
+
+def verificar_token(conn, token):
+    """Dict del usuario del token, o None si la firma no coincide, venció o fue revocado"""
+    try:
+        datos, firma = token.encode('ascii').split(b'.')
+    except (ValueError, UnicodeEncodeError, AttributeError):
+        return None
+    
+    if not hmac.compare_digest(_firmar(datos), firma.decode('ascii')):
+        return None
+    
+    carga = json.loads(base64.urlsafe_b64decode(datos + b'=' * (-len(datos) % 4)))
+    if carga['expira'] < time.time():
+        return None
+    
+    # Cerrar sesión sube la versión del usuario y anula todos sus tokens anteriores
+    fila = conn.execute("SELECT version_token FROM usuarios WHERE id = ?", (carga['id'],)).fetchone()
+    if fila is None or carga.get('version') != fila[0]:
+        return None
+    return {'id': carga['id'], 'email': carga['email'], 'nombre': carga.get('nombre'), 'version_token': fila[0]}
+
+def revocar_tokens(conn, usuario_id):
+    """Invalida todos los tokens emitidos hasta ahora para el usuario"""
+    with conn:
+        conn.execute("UPDATE usuarios SET version_token = version_token + 1 WHERE id = ?", (usuario_id,))
+
+# ============================================================================
+# LÍNEA DE COMANDOS
+# ============================================================================
+
+def _comando_usuario(args):
+    password = getpass.getpass("Contraseña: ")
+    if password != getpass.getpass("Repite la contraseña: "):
+        print("Las contraseñas no coinciden", file=sys.stderr)
+        return 1
+    conn = abrir_conexion(args.db)
+    crear_esquema(conn)
+    try:
+        usuario = registrar_usuario(conn, args.email, password, args.nombre, permitir_admin=True)
+    except ValueError as e:
+        print(e, file=sys.stderr)
+        return 1
+    finally:
+        conn.close()
+    rol = "administrador" if es_email_admin(usuario['email']) else "usuario"
+    print(f"Cuenta {usuario['email']} creada ({rol})")
+    return 0
+
+def registrar_comando(comandos):
+    parser = comandos.add_parser('usuario', help="Crea una cuenta, también las de MAPA_ADMIN_EMAILS")
+    parser.add_argument('email')
+    parser.add_argument('--nombre', default=None)
+    parser.add_argument('--db', default=RUTA_DB, help="Base de datos (por defecto: la de la aplicación)")
+    parser.set_defaults(funcion=_comando_usuario)
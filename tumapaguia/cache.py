@@ -0,0 +1,103 @@
+"""
+Caché de resultados direccionada por el contenido de las fotos subidas
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+
+from tumapaguia.persistencia import RUTA_DB
+from tumapaguia.recursos import recurso_compartido
+
+RUTA_CACHE_DISCO = os.path.join(os.path.dirname(RUTA_DB), 'mapa_guia_cache.db')
+MAX_ENTRADAS_CACHE = int(os.getenv('MAPA_CACHE_ENTRADAS', '512'))
+CACHE_EN_DISCO = os.getenv('MAPA_CACHE_DISCO', '0') == '1'
+# Subir al cambiar umbrales o algoritmos: invalida resultados guardados
+VERSION_CACHE = 4
+
+SIN_ENTRADA = object()
+
+class CacheResultados:
+    """Caché direccionada por contenido: LRU en memoria y SQLite opcional en disco"""
+    
+    def __init__(self, max_entradas=MAX_ENTRADAS_CACHE, ruta_disco=None):
+        self.max_entradas = max_entradas
+        self._memoria = OrderedDict()
+        self._lock = threading.Lock()
+        self.aciertos_memoria = 0
+        self.aciertos_disco = 0
+        self.fallos = 0
+        
+        self._disco = None
+        if ruta_disco:
+            self._disco = sqlite3.connect(ruta_disco, check_same_thread=False)
+            self._disco.execute('''CREATE TABLE IF NOT EXISTS resultados
+                                  (clave TEXT PRIMARY KEY,
+                                   valor TEXT NOT NULL,
+                                   fecha TIMESTAMP DEFAULT CURRENT_TIMESTAMP)''')
+            self._disco.commit()
+    
+    @staticmethod
+    def _clave(huella, tipo):
+        return f"{huella}:{tipo}:v{VERSION_CACHE}"
+    
+    def obtener(self, huella, tipo, defecto=None):
+        clave = self._clave(huella, tipo)
+        with self._lock:
+            if clave in self._memoria:
+                self._memoria.move_to_end(clave)
+                self.aciertos_memoria += 1
+                return self._memoria[clave]
+            
+            if self._disco is not None:
+                fila = self._disco.execute(
+                    "SELECT valor FROM resultados WHERE clave = ?", (clave,)
+                ).fetchone()
+                if fila:
+                    valor = json.loads(fila[0])
+                    self._guardar_en_memoria(clave, valor)
+                    self.aciertos_disco += 1
+                    return valor
+            
+            self.fallos += 1
+            return defecto
+    
+    def guardar(self, huella, tipo, valor):
+        clave = self._clave(huella, tipo)
+        with self._lock:
+            self._guardar_en_memoria(clave, valor)
+            if self._disco is not None:
+                self._disco.execute(
+                    "INSERT OR REPLACE INTO resultados (clave, valor) VALUES (?, ?)",
+                    (clave, json.dumps(valor))
+                )
+                self._disco.commit()
+    
+    def _guardar_en_memoria(self, clave, valor):
+        self._memoria[clave] = valor
+        self._memoria.move_to_end(clave)
+        while len(self._memoria) > self.max_entradas:
+            self._memoria.popitem(last=False)
+    
+    def estadisticas(self):
+        with self._lock:
+            consultas = self.aciertos_memoria + self.aciertos_disco + self.fallos
+            return {
+                'entradas_memoria': len(self._memoria),
+                'aciertos_memoria': self.aciertos_memoria,
+                'aciertos_disco': self.aciertos_disco,
+                'fallos': self.fallos,
+                'tasa_aciertos': (consultas - self.fallos) / consultas if consultas else 0
+            }
+
+@recurso_compartido
+def obtener_cache_resultados():
+    """Caché compartida por todas las sesiones del proceso"""
+    return CacheResultados(ruta_disco=RUTA_CACHE_DISCO if CACHE_EN_DISCO else None)
+
+def huella_contenido(archivo):
+    """SHA-256 de los bytes subidos"""
+    return hashlib.sha256(archivo.getvalue()).hexdigest()
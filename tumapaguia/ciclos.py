@@ -0,0 +1,143 @@
+"""
+Ciclos vitales y temporales a partir de la fecha de nacimiento
+"""
+
+from datetime import datetime
+
+import numpy as np
+
+CICLOS_VITALES = {
+    1: {'nombre': 'Nuevos Inicios', 'emoji': '🌟', 
+        'energia': 'Liderazgo, independencia, iniciativa',
+        'recomendaciones': 'Inicia proyectos nuevos, toma la iniciativa, sé valiente'},
+    2: {'nombre': 'Cooperación', 'emoji': '🤝',
+        'energia': 'Asociaciones, diplomacia, paciencia',
+        'recomendaciones': 'Trabaja en equipo, cultiva relaciones, sé paciente'},
+    3: {'nombre': 'Expresión Creativa', 'emoji': '🎨',
+        'energia': 'Creatividad, comunicación, alegría',
+        'recomendaciones': 'Exprésate libremente, socializa, crea sin límites'},
+    4: {'nombre': 'Construcción', 'emoji': '🏗️',
+        'energia': 'Disciplina, trabajo duro, estructura',
+        'recomendaciones': 'Construye bases sólidas, sé disciplinado'},
+    5: {'nombre': 'Cambio y Libertad', 'emoji': '🦋',
+        'energia': 'Aventura, cambio, expansión',
+        'recomendaciones': 'Acepta cambios, experimenta cosas nuevas'},
+    6: {'nombre': 'Responsabilidad', 'emoji': '🏡',
+        'energia': 'Hogar, familia, servicio',
+        'recomendaciones': 'Cuida a tu familia, mejora tu hogar'},
+    7: {'nombre': 'Introspección', 'emoji': '🧘',
+        'energia': 'Espiritualidad, análisis profundo',
+        'recomendaciones': 'Medita, estudia, conócete profundamente'},
+    8: {'nombre': 'Poder y Logros', 'emoji': '👑',
+        'energia': 'Éxito material, reconocimiento',
+        'recomendaciones': 'Busca el éxito, gestiona finanzas, lidera'},
+    9: {'nombre': 'Culminación', 'emoji': '🌅',
+        'energia': 'Cierre de ciclos, sabiduría',
+        'recomendaciones': 'Cierra ciclos, perdona, comparte sabiduría'}
+}
+
+# Atributos de cada ciclo indexados por su número (la posición 0 no se usa)
+_ATRIBUTOS_CICLO = ('nombre', 'emoji', 'energia', 'recomendaciones')
+_TABLA_CICLOS = {
+    campo: np.array([None] + [CICLOS_VITALES[n][campo] for n in range(1, 10)], dtype=object)
+    for campo in _ATRIBUTOS_CICLO
+}
+
+def reducir_digitos(suma):
+    """Raíz digital de enteros positivos; acepta escalares y arreglos
+    
+    Equivale a sumar los dígitos hasta quedar en uno solo.
+    """
+    return 1 + (suma - 1) % 9
+
+def calcular_ciclo_vital(fecha_nacimiento):
+    """Calcula ciclo vital"""
+    hoy = datetime.now()
+    return reducir_digitos(fecha_nacimiento.day + fecha_nacimiento.month + hoy.year)
+
+def calcular_ciclos(fechas_nacimiento, años):
+    """Ciclos de muchas fechas a la vez, como DataFrame
+    
+    `fechas_nacimiento` es cualquier secuencia que entienda `pd.to_datetime`
+    (fechas, textos ISO, datetime64 o una Series, cuyo índice se conserva) y
+    `años` un año o un arreglo del mismo largo. Las fechas vacías dan ciclo
+    <NA> y atributos None.
+    """
+    import pandas as pd
+    
+    indice = fechas_nacimiento.index if isinstance(fechas_nacimiento, pd.Series) else None
+    fechas = pd.DatetimeIndex(pd.to_datetime(fechas_nacimiento))
+    años = np.broadcast_to(np.asarray(años, dtype=np.int64), (len(fechas),))
+    
+    vacias = fechas.isna()
+    dias = np.nan_to_num(np.asarray(fechas.day, dtype=np.float64)).astype(np.int64)
+    meses = np.nan_to_num(np.asarray(fechas.month, dtype=np.float64)).astype(np.int64)
+    ciclos = np.where(vacias, 0, reducir_digitos(dias + meses + años))
+    
+    columnas = {
+        'fecha_nacimiento': fechas,
+        'año': años,
+        'ciclo': pd.array(np.where(vacias, None, ciclos), dtype='Int64')
+    }
+    for campo, tabla in _TABLA_CICLOS.items():
+        columnas[campo] = tabla[ciclos]
+    
+    return pd.DataFrame(columnas, index=indice)
+
+def pronosticar_ciclos(fechas_nacimiento, años):
+    """Ciclos de cada fecha para cada año (producto cruzado), en una sola pasada"""
+    import pandas as pd
+    
+    if isinstance(fechas_nacimiento, pd.Series):
+        fechas_nacimiento = fechas_nacimiento.to_numpy()
+    fechas = np.asarray(fechas_nacimiento)
+    años = np.asarray(años, dtype=np.int64)
+    
+    return calcular_ciclos(np.repeat(fechas, len(años)), np.tile(años, len(fechas)))
+
+def analizar_ciclos_temporales(fecha_nacimiento, pregunta=""):
+    """Analiza ciclos para períodos específicos"""
+    hoy = datetime.now()
+    ciclo_actual = calcular_ciclo_vital(fecha_nacimiento)
+    
+    pregunta_lower = pregunta.lower()
+    periodos = []
+    
+    # Detectar períodos mencionados
+    if any(p in pregunta_lower for p in ['próximo', 'siguiente', '2025', '2026']):
+        periodos.append({'año': hoy.year + 1, 'tipo': 'próximo'})
+    
+    if any(p in pregunta_lower for p in ['este año', str(hoy.year)]):
+        periodos.append({'año': hoy.year, 'tipo': 'actual'})
+    
+    if 'próximos años' in pregunta_lower:
+        for i in range(1, 4):
+            periodos.append({'año': hoy.year + i, 'tipo': f'año_{i}'})
+    
+    # Default: año actual y próximo
+    if not periodos:
+        periodos = [
+            {'año': hoy.year, 'tipo': 'actual'},
+            {'año': hoy.year + 1, 'tipo': 'próximo'}
+        ]
+    
+    analisis_periodos = []
+    
+    for periodo in periodos:
+        suma = reducir_digitos(fecha_nacimiento.day + fecha_nacimiento.month + periodo['año'])
+        
+        ciclo_info = CICLOS_VITALES.get(suma, CICLOS_VITALES[1])
+        
+        analisis_periodos.append({
+            'año': periodo['año'],
+            'ciclo': suma,
+            'nombre': ciclo_info['nombre'],
+            'emoji': ciclo_info['emoji'],
+            'energia': ciclo_info['energia'],
+            'recomendaciones': ciclo_info['recomendaciones']
+        })
+    
+    return {
+        'ciclo_actual': ciclo_actual,
+        'periodos': analisis_periodos
+    }
@@ -0,0 +1,159 @@
+"""
+Cliente del servidor de inferencia local (python -m tumapaguia servidor)
+
+Con MAPA_SERVIDOR_INFERENCIA apuntando al socket Unix del servidor, la
+validación de calidad y la detección de manos corren allí: las réplicas de la
+interfaz en la misma máquina comparten un solo MediaPipe caliente y no lo
+importan. Si el servidor no responde se usa la inferencia local y se vuelve a
+intentar pasados REINTENTO_SERVIDOR_SEGUNDOS; cada vez que se recurre a ella
+se cuenta en `obtener_cliente_inferencia().respaldos_locales`.
+
+Trama, en ambos sentidos: 4 bytes big-endian con el largo de la cabecera
+JSON, la cabecera y, si declara 'bytes', el búfer uint8 crudo de forma 'forma'.
+Una trama que declara más de MAX_BYTES_TRAMA se rechaza antes de reservarla.
+"""
+
+import json
+import logging
+import math
+import os
+import socket
+import struct
+import time
+
+import numpy as np
+
+from tumapaguia.ingesta import MAX_MEGAPIXELES_FOTO
+from tumapaguia.recursos import recurso_compartido
+
+RUTA_SERVIDOR_INFERENCIA = os.getenv('MAPA_SERVIDOR_INFERENCIA', '')
+TIEMPO_MAXIMO_INFERENCIA = float(os.getenv('MAPA_TIEMPO_INFERENCIA_S', '30'))
+REINTENTO_SERVIDOR_SEGUNDOS = 30
+# La foto más grande admitida, en RGB; la cabecera es un JSON corto
+MAX_BYTES_TRAMA = int(MAX_MEGAPIXELES_FOTO * 1e6) * 3
+MAX_BYTES_CABECERA = 64 * 1024
+
+_LARGO_CABECERA = struct.Struct('>I')
+
+logger = logging.getLogger(__name__)
+
+class ErrorInferencia(RuntimeError):
+    """El servidor recibió la petición pero no pudo resolverla"""
+
+class TramaInvalida(ValueError):
+    """La trama declara un tamaño o una forma que no se aceptan"""
+
+def _a_json(valor):
+    # Escalares de numpy (np.bool_, np.float32) que quedan en los resultados
+    if isinstance(valor, np.generic):
+        return valor.item()
+    raise TypeError(f"{type(valor).__name__} no es serializable")
+
+def enviar_trama(sock, cabecera, pixeles=None):
+    if pixeles is not None:
+        pixeles = np.ascontiguousarray(pixeles, dtype=np.uint8)
+        cabecera = dict(cabecera, forma=list(pixeles.shape), bytes=pixeles.nbytes)
+    datos = json.dumps(cabecera, default=_a_json).encode('utf-8')
+    sock.sendall(_LARGO_CABECERA.pack(len(datos)) + datos)
+    if pixeles is not None:
+        # Sin copiar: el socket lee directamente el búfer del arreglo
+        sock.sendall(memoryview(pixeles).cast('B'))
+
+def _leer_exacto(sock, n):
+    """n bytes del socket, o None si el otro extremo cerró antes del primero"""
+    bufer = bytearray(n)
+    vista = memoryview(bufer)
+    leidos = 0
+    while leidos < n:
+        recibidos = sock.recv_into(vista[leidos:])
+        if recibidos == 0:
+            if leidos == 0:
+                return None
+            raise ConnectionError("Conexión cerrada a mitad de una trama")
+        leidos += recibidos
+    return bufer
+
+def recibir_trama(sock):
+    """(cabecera, píxeles o None), o None si la conexión se cerró entre tramas"""
+    largo = _leer_exacto(sock, _LARGO_CABECERA.size)
+    if largo is None:
+        return None
+    largo = _LARGO_CABECERA.unpack(largo)[0]
+    if largo > MAX_BYTES_CABECERA:
+        raise TramaInvalida(f"Cabecera de {largo} bytes. Máximo: {MAX_BYTES_CABECERA}")
+    cabecera = json.loads(_leer_exacto(sock, largo))
+    if not cabecera.get('bytes'):
+        return cabecera, None
+    n_bytes = cabecera['bytes']
+    if n_bytes > MAX_BYTES_TRAMA:
+        raise TramaInvalida(f"Trama de {n_bytes / 2**20:.0f} MB. Máximo: {MAX_BYTES_TRAMA / 2**20:.0f} MB")
+    if math.prod(cabecera['forma']) != n_bytes:
+        raise TramaInvalida(f"La forma {cabecera['forma']} no corresponde a {n_bytes} bytes")
+    # El bytearray recibido es el búfer del arreglo: no hay otra copia
+    pixeles = np.frombuffer(_leer_exacto(sock, n_bytes), dtype=np.uint8).reshape(cabecera['forma'])
+    return cabecera, pixeles
+
+class ClienteInferencia:
+    """Una conexión por petición: conectar a un socket Unix cuesta microsegundos"""
+    
+    def __init__(self, ruta, tiempo_maximo=TIEMPO_MAXIMO_INFERENCIA):
+        self.ruta = ruta
+        self.tiempo_maximo = tiempo_maximo
+        self._caido_hasta = 0.0
+        # Peticiones resueltas con la inferencia local por no poder usar el servidor
+        self.respaldos_locales = 0
+    
+    def disponible(self):
+        return time.monotonic() >= self._caido_hasta
+    
+    def marcar_caido(self):
+        self._caido_hasta = time.monotonic() + REINTENTO_SERVIDOR_SEGUNDOS
+    
+    def pedir(self, cabecera, pixeles=None):
+        """Respuesta del servidor; OSError si no se pudo hablar con él"""
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.settimeout(self.tiempo_maximo)
+            sock.connect(self.ruta)
+            enviar_trama(sock, cabecera, pixeles)
+            trama = recibir_trama(sock)
+        if trama is None:
+            raise ConnectionError("El servidor cerró la conexión sin responder")
+        respuesta, _ = trama
+        if not respuesta['ok']:
+            raise ErrorInferencia(respuesta['error'])
+        return respuesta
+
+@recurso_compartido
+def obtener_cliente_inferencia():
+    return ClienteInferencia(RUTA_SERVIDOR_INFERENCIA)
+
+def inferencia_remota():
+    """Si hay un servidor configurado, responda o no en este momento"""
+    return bool(RUTA_SERVIDOR_INFERENCIA)
+
+def pedir_inferencia(cabecera, pixeles=None):
+    """Respuesta del servidor, o None para resolver localmente
+    
+    None si no hay servidor configurado o si no responde; ErrorInferencia si
+    respondió con un error sobre la petición.
+    """
+    if not inferencia_remota():
+        return None
+    cliente = obtener_cliente_inferencia()
+    if not cliente.disponible():
+        cliente.respaldos_locales += 1
+        return None
+    if pixeles is not None and pixeles.nbytes > MAX_BYTES_TRAMA:
+        cliente.respaldos_locales += 1
+        logger.warning("Imagen de %.0f MB, mayor que una trama: se usa la inferencia local", pixeles.nbytes / 2**20)
+        return None
+    try:
+        return cliente.pedir(cabecera, pixeles)
+    except socket.timeout:
+        motivo = f"no respondió en {cliente.tiempo_maximo:.0f} s"
+    except OSError as e:
+        motivo = f"sin respuesta ({e})"
+    cliente.respaldos_locales += 1
+    logger.warning("Servidor de inferencia %s %s: se usa la inferencia local", cliente.ruta, motivo)
+    cliente.marcar_caido()
+    return None
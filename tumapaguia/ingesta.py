@@ -0,0 +1,278 @@
+"""
+Ingesta de fotos subidas: tamaño desde la cabecera, decodificación JPEG
+reducida, orientación y modo de color normalizados, presupuesto de píxeles y
+un único búfer RGB por foto (ImagenCanonica)
+
+Ni la validación ni el análisis necesitan los 12-48 MP de una foto de móvil:
+con `Image.draft` el decodificador JPEG escala los bloques DCT (1/2, 1/4, 1/8)
+y nunca se materializa la imagen completa.
+"""
+
+import functools
+import math
+import os
+import threading
+import weakref
+
+import numpy as np
+from PIL import Image, ImageOps
+
+from tumapaguia.recursos import recurso_compartido
+
+# Lado mayor con el que se validan y analizan las fotos
+LADO_MAXIMO_ANALISIS = int(os.getenv('MAPA_LADO_ANALISIS', '2000'))
+MAX_MEGAPIXELES_FOTO = float(os.getenv('MAPA_MAX_MEGAPIXELES_FOTO', '64'))
+MAX_MEGAPIXELES_CONSULTA = float(os.getenv('MAPA_MAX_MEGAPIXELES_CONSULTA', '200'))
+# Bytes de imágenes decodificadas vivas en todo el proceso y por sesión
+MAX_MEMORIA_IMAGENES = int(os.getenv('MAPA_MEMORIA_IMAGENES_MB', '1024')) * 1024 * 1024
+MAX_MEMORIA_IMAGENES_SESION = int(os.getenv('MAPA_MEMORIA_IMAGENES_SESION_MB', '256')) * 1024 * 1024
+ESPERA_MEMORIA_SEGUNDOS = float(os.getenv('MAPA_ESPERA_MEMORIA_S', '30'))
+# Cubre cualquier modo decodificado (RGBA, I, F) antes de pasar a RGB
+BYTES_POR_PIXEL_DECODIFICADO = 4
+
+# Orientaciones EXIF que intercambian ancho y alto
+_ORIENTACIONES_GIRADAS = {5, 6, 7, 8}
+_ETIQUETA_ORIENTACION = 0x0112
+
+class FotoRechazada(ValueError):
+    """La foto no se decodifica: excede el presupuesto de píxeles"""
+
+def _rebobinar(foto):
+    if hasattr(foto, 'seek'):
+        foto.seek(0)
+
+def dimensiones_orientadas(img):
+    """(ancho, alto) tal como se ve la foto, leídos de la cabecera sin decodificar"""
+    if img.getexif().get(_ETIQUETA_ORIENTACION) in _ORIENTACIONES_GIRADAS:
+        return img.height, img.width
+    return img.width, img.height
+
+def leer_dimensiones(foto):
+    _rebobinar(foto)
+    with Image.open(foto) as img:
+        return dimensiones_orientadas(img)
+
+def comprobar_presupuesto_foto(ancho, alto):
+    megapixeles = ancho * alto / 1e6
+    if megapixeles > MAX_MEGAPIXELES_FOTO:
+        raise FotoRechazada(f"Foto de {megapixeles:.0f} MP. Máximo: {MAX_MEGAPIXELES_FOTO:.0f} MP")
+
+class PresupuestoConsulta:
+    """Megapíxeles acumulados por las fotos de una misma consulta"""
+    
+    def __init__(self, max_megapixeles=MAX_MEGAPIXELES_CONSULTA):
+        self.max_megapixeles = max_megapixeles
+        self.usados = 0.0
+    
+    def reservar(self, ancho, alto):
+        """Descuenta la foto o lanza FotoRechazada si no cabe"""
+        comprobar_presupuesto_foto(ancho, alto)
+        megapixeles = ancho * alto / 1e6
+        if self.usados + megapixeles > self.max_megapixeles:
+            raise FotoRechazada(f"Las fotos superan {self.max_megapixeles:.0f} MP en total")
+        self.usados += megapixeles
+
+class PresupuestoMemoria:
+    """Bytes de imágenes decodificadas vivas, con tope global y por sesión
+    
+    Cada imagen reserva antes de decodificarse y devuelve su parte sola al
+    dejar de existir (weakref.finalize): el tope cubre todo lo que retengan
+    validación, análisis y trabajos. Sin lugar, la decodificación espera a que
+    otras consultas liberen hasta ESPERA_MEMORIA_SEGUNDOS.
+    """
+    
+    def __init__(self, max_bytes=MAX_MEMORIA_IMAGENES, max_bytes_sesion=MAX_MEMORIA_IMAGENES_SESION):
+        self.max_bytes = max_bytes
+        self.max_bytes_sesion = max_bytes_sesion
+        self.usados = 0
+        self.pico = 0
+        self._por_sesion = {}
+        self._condicion = threading.Condition()
+    
+    def _cabe(self, n_bytes, sesion):
+        if self.usados + n_bytes > self.max_bytes:
+            return False
+        return sesion is None or self._por_sesion.get(sesion, 0) + n_bytes <= self.max_bytes_sesion
+    
+    def reservar(self, n_bytes, sesion=None, espera=ESPERA_MEMORIA_SEGUNDOS):
+        """Descuenta los bytes o lanza FotoRechazada si no hay lugar tras `espera` segundos"""
+        if n_bytes > self.max_bytes or (sesion is not None and n_bytes > self.max_bytes_sesion):
+            raise FotoRechazada(f"La foto necesita {n_bytes / 2**20:.0f} MB al decodificarse: excede el máximo")
+        with self._condicion:
+            if not self._condicion.wait_for(lambda: self._cabe(n_bytes, sesion), espera):
+                raise FotoRechazada("Hay demasiadas fotos en proceso. Intenta de nuevo en unos segundos")
+            self.usados += n_bytes
+            self.pico = max(self.pico, self.usados)
+            if sesion is not None:
+                self._por_sesion[sesion] = self._por_sesion.get(sesion, 0) + n_bytes
+    
+    def liberar(self, n_bytes, sesion=None):
+        with self._condicion:
+            self.usados -= n_bytes
+            if sesion is not None:
+                restantes = self._por_sesion[sesion] - n_bytes
+                if restantes:
+                    self._por_sesion[sesion] = restantes
+                else:
+                    del self._por_sesion[sesion]
+            self._condicion.notify_all()
+    
+    def asociar(self, objeto, n_bytes, sesion=None):
+        """Libera `n_bytes` ya reservados cuando `objeto` deje de existir"""
+        weakref.finalize(objeto, self.liberar, n_bytes, sesion)
+
+@recurso_compartido
+def obtener_presupuesto_memoria():
+    return PresupuestoMemoria()
+
+def normalizar_modo(img):
+    """RGB de 8 bits: la transparencia se compone sobre blanco y 16 bits se escalan"""
+    if img.mode == 'RGB':
+        return img
+    
+    if img.mode in ('I', 'I;16', 'I;16B', 'I;16L', 'F'):
+        valores = np.asarray(img)
+        # Los PNG de 16 bits llegan como enteros de hasta 65535
+        if valores.max(initial=0) > 255:
+            valores = valores / 257
+        img = Image.fromarray(np.clip(valores, 0, 255).astype(np.uint8), 'L')
+    
+    if img.mode in ('RGBA', 'LA', 'PA') or (img.mode == 'P' and 'transparency' in img.info):
+        img = img.convert('RGBA')
+        fondo = Image.new('RGB', img.size, (255, 255, 255))
+        fondo.paste(img, mask=img.getchannel('A'))
+        return fondo
+    
+    return img.convert('RGB')
+
+class ImagenCanonica:
+    """Píxeles de una foto: un solo búfer RGB uint8 contiguo que comparten todas las etapas
+    
+    La validación, el detector (MediaPipe espera RGB) y el recorte de la palma
+    leen `rgb` o vistas de él; lo que cada etapa deriva (gris reducido,
+    baldosas, recorte) es más chico que la imagen. `tamano_original` es el
+    (ancho, alto) orientado de la foto subida. Si la foto llegó reducida,
+    `gris_nativo()` lee su luminancia a la resolución subida para la nitidez;
+    retiene la foto subida, así que se suelta tras validar.
+    """
+    
+    def __init__(self, rgb, tamano_original=None, gris_nativo=None):
+        self.rgb = rgb
+        self.tamano_original = tamano_original or self.size
+        self.gris_nativo = gris_nativo
+    
+    @property
+    def size(self):
+        """(ancho, alto) de los píxeles, como Image.size"""
+        return self.rgb.shape[1], self.rgb.shape[0]
+    
+    def __array__(self, dtype=None, copy=None):
+        # np.asarray(imagen) devuelve el búfer mismo
+        return np.array(self.rgb, dtype=dtype, copy=bool(copy))
+
+def imagen_canonica(imagen):
+    """ImagenCanonica de una imagen PIL o un arreglo; sin copiar si ya es uint8 contiguo"""
+    if isinstance(imagen, ImagenCanonica):
+        return imagen
+    if isinstance(imagen, Image.Image):
+        return ImagenCanonica(np.asarray(normalizar_modo(imagen)))
+    return ImagenCanonica(np.ascontiguousarray(imagen, dtype=np.uint8))
+
+def cargar_foto(foto, lado_maximo=LADO_MAXIMO_ANALISIS, dimensiones=None, sesion=None):
+    """ImagenCanonica orientada, con el lado mayor limitado a `lado_maximo`
+    
+    `tamano_original` conserva el (ancho, alto) orientado de la foto subida:
+    la regla de resolución y las medidas en píxeles se calculan sobre él y no
+    dependen de la reducción. `dimensiones` evita releer la cabecera cuando
+    ya se comprobó el presupuesto. Los píxeles ocupan su parte del
+    PresupuestoMemoria (global y de `sesion`) mientras existan.
+    """
+    _rebobinar(foto)
+    img = Image.open(foto)
+    ancho, alto = dimensiones or dimensiones_orientadas(img)
+    comprobar_presupuesto_foto(ancho, alto)
+    
+    escala = lado_maximo / max(ancho, alto)
+    if img.format == 'JPEG' and escala < 1:
+        # Elige la mayor reducción DCT que no baja del tamaño pedido
+        img.draft('RGB', (math.ceil(img.width * escala), math.ceil(img.height * escala)))
+    
+    # Tras `draft`, img.size es el tamaño al que se decodificará
+    presupuesto = obtener_presupuesto_memoria()
+    reservados = img.width * img.height * BYTES_POR_PIXEL_DECODIFICADO
+    presupuesto.reservar(reservados, sesion)
+    try:
+        img.load()
+        ImageOps.exif_transpose(img, in_place=True)
+        img = normalizar_modo(img)
+        if max(img.size) > lado_maximo:
+            img.thumbnail((lado_maximo, lado_maximo), Image.Resampling.BILINEAR)
+        
+        # La decodificación completa ya no existe: se devuelve antes de pedir
+        # más, o una foto cerca del tope esperaría a su propia reserva
+        finales = img.width * img.height * 3
+        presupuesto.liberar(reservados - finales, sesion)
+        reservados = finales
+        # np.asarray toma los bytes que exporta PIL sin otra copia; mientras
+        # los arma conviven sus trozos, el resultado y la imagen de PIL
+        presupuesto.reservar(2 * finales, sesion)
+        reservados += 2 * finales
+        rgb = np.asarray(img)
+    except BaseException:
+        presupuesto.liberar(reservados, sesion)
+        raise
+    del img
+    
+    # Queda reservado solo el búfer canónico
+    presupuesto.liberar(reservados - finales, sesion)
+    presupuesto.asociar(rgb, finales, sesion)
+    
+    gris_nativo = None
+    if max(rgb.shape[:2]) < max(ancho, alto):
+        gris_nativo = functools.partial(leer_gris_nativo, foto, sesion)
+    return ImagenCanonica(rgb, (ancho, alto), gris_nativo)
+
+class GrisNativo:
+    """Escala de grises de una foto decodificada a la resolución subida
+    
+    Se indexa como un arreglo 2D (`[filas, columnas]` con slices): solo los
+    recortes que se leen pasan a gris uint8, sin otra copia de la foto.
+    """
+    
+    def __init__(self, img):
+        self._img = img
+        self.shape = (img.height, img.width)
+    
+    def __getitem__(self, indices):
+        filas, columnas = indices
+        recorte = self._img.crop((columnas.start, filas.start, columnas.stop, filas.stop))
+        if recorte.mode != 'L':
+            recorte = normalizar_modo(recorte).convert('L')
+        return np.asarray(recorte)
+
+def leer_gris_nativo(foto, sesion=None):
+    """GrisNativo de la foto, para medir la nitidez
+    
+    Reducir la imagen infla la varianza del Laplaciano, así que la nitidez de
+    una foto reducida no se mide sobre la decodificación de `cargar_foto`. JPEG
+    decodifica solo el canal Y (1 byte por píxel); los demás formatos, en su
+    modo. No se orienta: el Laplaciano no cambia con giros de 90°. Ocupa su
+    parte del PresupuestoMemoria mientras exista.
+    """
+    _rebobinar(foto)
+    img = Image.open(foto)
+    if img.format == 'JPEG':
+        img.draft('L', img.size)
+    
+    reservados = img.width * img.height * (1 if img.mode == 'L' else BYTES_POR_PIXEL_DECODIFICADO)
+    presupuesto = obtener_presupuesto_memoria()
+    presupuesto.reservar(reservados, sesion)
+    try:
+        img.load()
+    except BaseException:
+        presupuesto.liberar(reservados, sesion)
+        raise
+    
+    gris = GrisNativo(img)
+    presupuesto.asociar(gris, reservados, sesion)
+    return gris
@@ -0,0 +1,367 @@
+"""
+Líneas de la palma: recorte normalizado en perspectiva, realce de pliegues y
+métricas de largo, curvatura y cortes por línea
+
+Todo el trabajo sobre píxeles ocurre en un recorte de LADO_PALMA x LADO_PALMA
+alineado con la mano (índice a la izquierda, dedos arriba, muñeca abajo), así
+que la latencia no depende de la resolución de la foto. Las medidas son
+relativas al recorte: un largo de 1.0 cruza la palma de lado a lado.
+"""
+
+import numpy as np
+
+from tumapaguia import vision
+
+LADO_PALMA = 256
+# Escalas (px del recorte) del filtro de pliegues y respuesta mínima en niveles de gris
+ESCALAS_PLIEGUE = (1.5, 2.5, 3.5)
+RESPUESTA_MINIMA = 4.0
+# Con muchos pliegues finos solo cuenta el percentil superior de la palma
+PERCENTIL_PLIEGUE = 85
+# Un tramo más corto que esto (fracción del recorte) se trata como ruido
+TRAMO_MINIMO = 0.03
+# Un tramo continúa la línea si, tras un hueco de hasta HUECO_MAXIMO, arranca a
+# menos de TOLERANCIA_TRAMO de la recta que sigue su extremo (EXTREMO_LOCAL)
+HUECO_MAXIMO = 0.25
+TOLERANCIA_TRAMO = 0.05
+EXTREMO_LOCAL = 0.1
+SOLAPE_TRAMO = 0.02
+# Bins del trazo y huecos (en bins) a partir de los cuales hay un corte
+BINS_TRAZO = 64
+HUECO_CORTE = 4
+
+LARGO_MINIMO = 0.15
+UMBRAL_CURVATURA = 1.0
+
+# Esquinas del recorte a partir de los landmarks de MediaPipe: el borde
+# superior sigue los nudillos del índice (5) al meñique (17), el inferior
+# rodea la muñeca (0) y se abre hacia el pulgar para incluir su monte
+_MARGEN_NUDILLOS = 0.08
+_MUNECA_PULGAR = 0.55
+_MUNECA_MENIQUE = 0.30
+# Contorno de la palma (muñeca, base del pulgar y nudillos); sin el nudillo del
+# pulgar, que dejaría dentro el hueco entre pulgar e índice
+_CONTORNO_PALMA = [0, 1, 5, 9, 13, 17]
+_EROSION_CONTORNO = 7
+
+# (nombre, orientación, u mín, u máx, v mín, v máx) en coordenadas del recorte
+REGIONES_LINEAS = {
+    'vida': ('vertical', 0.0, 0.6, 0.15, 1.0),
+    'cabeza': ('horizontal', 0.0, 1.0, 0.33, 0.65),
+    'corazon': ('horizontal', 0.0, 1.0, 0.04, 0.33),
+}
+# |cos| del ángulo entre el pliegue y la horizontal aceptado por orientación
+_HORIZONTALIDAD = {'horizontal': (0.87, 1.0), 'vertical': (0.0, 0.87)}
+
+LINEAS_INFO = {
+    'vida': {
+        'nombre': 'Línea de la Vida',
+        'significado': 'Vitalidad, salud, energía vital',
+        'larga': 'Gran reserva de energía y resistencia física',
+        'media': 'Energía vital estable y bien administrada',
+        'corta': 'Energía intensa que rinde más con pausas y descanso',
+        'curva': 'Su arco amplio habla de entusiasmo y vigor',
+        'recta': 'Su trazo recto sugiere prudencia con las propias fuerzas'
+    },
+    'cabeza': {
+        'nombre': 'Línea de la Cabeza',
+        'significado': 'Intelecto, forma de pensar',
+        'larga': 'Pensamiento minucioso que considera muchas alternativas',
+        'media': 'Equilibrio entre reflexión y decisión',
+        'corta': 'Mente práctica que decide con rapidez',
+        'curva': 'Su curva indica imaginación y pensamiento creativo',
+        'recta': 'Su trazo recto indica lógica y pensamiento analítico'
+    },
+    'corazon': {
+        'nombre': 'Línea del Corazón',
+        'significado': 'Emociones, amor, relaciones',
+        'larga': 'Afectividad generosa y expresiva',
+        'media': 'Vida emocional equilibrada',
+        'corta': 'Afecto reservado que se entrega con cautela',
+        'curva': 'Su curva muestra calidez y expresividad',
+        'recta': 'Su trazo recto muestra una afectividad serena y racional'
+    }
+}
+
+INTERPRETACION_CORTES = {
+    0: None,
+    1: 'Un corte marca un cambio importante de etapa',
+    2: 'Varios cortes marcan etapas de transformación'
+}
+SIN_LINEA = 'No se distingue con claridad en la foto'
+
+# ============================================================================
+# RECORTE DE LA PALMA
+# ============================================================================
+
+def esquinas_palma(puntos):
+    """Esquinas (4, 2) float32 del recorte en la imagen: sup. izq., sup. der., inf. der., inf. izq.
+    
+    `puntos` son los 21 landmarks en píxeles de la imagen. La esquina superior
+    izquierda es siempre la del índice, así que manos izquierdas y derechas
+    quedan con la misma orientación.
+    """
+    puntos = np.asarray(puntos, dtype=np.float64)[:, :2]
+    a_lo_ancho = puntos[17] - puntos[5]
+    return np.array([
+        puntos[5] - _MARGEN_NUDILLOS * a_lo_ancho,
+        puntos[17] + _MARGEN_NUDILLOS * a_lo_ancho,
+        puntos[0] + _MUNECA_MENIQUE * a_lo_ancho,
+        puntos[0] - _MUNECA_PULGAR * a_lo_ancho
+    ], dtype=np.float32)
+
+_ESQUINAS_RECORTE = np.array([[0, 0], [LADO_PALMA, 0], [LADO_PALMA, LADO_PALMA], [0, LADO_PALMA]],
+                             dtype=np.float32)
+
+def recortar_palma(img_array, puntos):
+    """(gris, máscara de palma) del recorte de LADO_PALMA, o None si la palma es degenerada
+    
+    Antes de la transformación solo se reduce la zona de la palma, y con un
+    salto de píxeles previo que la deja en menos de 4x el lado del recorte: el
+    costo queda acotado aunque la foto sea enorme.
+    """
+    cv2 = vision.cv2
+    esquinas = esquinas_palma(puntos)
+    alto, ancho = img_array.shape[:2]
+    x0, y0 = np.floor(esquinas.min(axis=0)).astype(int)
+    x1, y1 = np.ceil(esquinas.max(axis=0)).astype(int)
+    x0, y0 = max(x0, 0), max(y0, 0)
+    x1, y1 = min(x1, ancho), min(y1, alto)
+    lado = max(x1 - x0, y1 - y0)
+    if x1 - x0 < 8 or y1 - y0 < 8:
+        return None
+    
+    salto = max(1, lado // (2 * LADO_PALMA))
+    zona = img_array[y0:y1:salto, x0:x1:salto]
+    if zona.ndim == 3:
+        zona = cv2.cvtColor(np.ascontiguousarray(zona), cv2.COLOR_RGB2GRAY)
+    escala = min(1.0, 2 * LADO_PALMA / max(zona.shape))
+    if escala < 1.0:
+        zona = cv2.resize(zona, None, fx=escala, fy=escala, interpolation=cv2.INTER_AREA)
+    
+    factor = escala / salto
+    origen = ((esquinas - [x0, y0]) * factor).astype(np.float32)
+    if abs(cv2.contourArea(origen)) < 64:
+        return None
+    
+    transformacion = cv2.getPerspectiveTransform(origen, _ESQUINAS_RECORTE)
+    gris = cv2.warpPerspective(zona, transformacion, (LADO_PALMA, LADO_PALMA),
+                               flags=cv2.INTER_LINEAR, borderMode=cv2.BORDER_REPLICATE)
+    
+    # Solo cuenta el interior de la palma: el borde de la mano también es un valle
+    contorno = (np.asarray(puntos, dtype=np.float64)[_CONTORNO_PALMA, :2] - [x0, y0]) * factor
+    contorno = cv2.perspectiveTransform(contorno.reshape(-1, 1, 2).astype(np.float32), transformacion)
+    mascara = np.zeros((LADO_PALMA, LADO_PALMA), dtype=np.uint8)
+    cv2.fillConvexPoly(mascara, cv2.convexHull(np.round(contorno).astype(np.int32)), 1)
+    nucleo = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (2 * _EROSION_CONTORNO + 1,) * 2)
+    mascara = cv2.erode(mascara, nucleo)
+    
+    return gris, mascara.astype(bool)
+
+# ============================================================================
+# REALCE DE PLIEGUES
+# ============================================================================
+
+def realzar_pliegues(gris):
+    """(respuesta, horizontalidad) del filtro de valles multiescala
+    
+    Los pliegues son valles oscuros: el mayor autovalor del hessiano es
+    positivo y el otro cercano a cero. La respuesta se normaliza por σ² para
+    quedar en niveles de gris y se conserva la escala más fuerte por píxel;
+    la horizontalidad es |cos| del ángulo del pliegue con la horizontal.
+    """
+    cv2 = vision.cv2
+    gris = gris.astype(np.float32)
+    respuesta = np.zeros_like(gris)
+    horizontalidad = np.zeros_like(gris)
+    
+    for sigma in ESCALAS_PLIEGUE:
+        suave = cv2.GaussianBlur(gris, (0, 0), sigma)
+        # Sobel de 3x3 escala las segundas derivadas por 4
+        dxx = cv2.Sobel(suave, cv2.CV_32F, 2, 0, ksize=3) / 4
+        dyy = cv2.Sobel(suave, cv2.CV_32F, 0, 2, ksize=3) / 4
+        dxy = cv2.Sobel(suave, cv2.CV_32F, 1, 1, ksize=3) / 4
+        
+        media = (dxx + dyy) / 2
+        radio = np.sqrt(((dxx - dyy) / 2) ** 2 + dxy ** 2)
+        mayor = media + radio
+        menor = media - radio
+        # Anisotropía: una mancha (ambos autovalores grandes) no es un pliegue
+        lineal = np.exp(-2 * (menor / np.maximum(mayor, 1e-6)) ** 2)
+        # En el fondo de un valle la pendiente es nula; junto a un borde (p. ej.
+        # el contorno de la mano) supera a la curvatura hasta unas 2σ del borde
+        gx = cv2.Sobel(suave, cv2.CV_32F, 1, 0, ksize=3) / 8
+        gy = cv2.Sobel(suave, cv2.CV_32F, 0, 1, ksize=3) / 8
+        r = sigma ** 2 * mayor * lineal - 2 * sigma * np.sqrt(gx ** 2 + gy ** 2)
+        
+        mejor = r > respuesta
+        respuesta[mejor] = r[mejor]
+        # El autovector del mayor autovalor cruza el valle; el pliegue va a 90°
+        angulo = 0.5 * np.arctan2(2 * dxy, dxx - dyy)
+        horizontalidad[mejor] = np.abs(np.sin(angulo))[mejor]
+    
+    return respuesta, horizontalidad
+
+def _tabla_zhang_suen(paso):
+    """Para cada código de 8 vecinos, si el píxel se borra en el subpaso de Zhang-Suen"""
+    tabla = np.zeros(256, dtype=bool)
+    for codigo in range(256):
+        # Vecinos en sentido horario empezando por el de arriba (bit 0)
+        v = [(codigo >> i) & 1 for i in range(8)]
+        transiciones = sum(v[i] == 0 and v[(i + 1) % 8] == 1 for i in range(8))
+        n, e, s, o = v[0], v[2], v[4], v[6]
+        if paso == 0:
+            condicion = n * e * s == 0 and e * s * o == 0
+        else:
+            condicion = n * e * o == 0 and n * s * o == 0
+        tabla[codigo] = 2 <= sum(v) <= 6 and transiciones == 1 and condicion
+    return tabla
+
+_TABLAS_ZHANG_SUEN = (_tabla_zhang_suen(0), _tabla_zhang_suen(1))
+# Peso de cada vecino en el código (correlación de filter2D)
+_PESOS_VECINOS = np.array([[128, 1, 2], [64, 0, 4], [32, 16, 8]], dtype=np.float32)
+
+def esqueleto(binaria):
+    """Adelgazamiento de Zhang-Suen: trazos de un píxel de ancho
+    
+    Cada subpaso codifica los 8 vecinos de todos los píxeles con un solo
+    filtro y decide qué borrar con una tabla de 256 entradas.
+    """
+    cv2 = vision.cv2
+    img = binaria.astype(np.uint8)
+    while True:
+        cambio = False
+        for tabla in _TABLAS_ZHANG_SUEN:
+            codigos = cv2.filter2D(img, cv2.CV_32F, _PESOS_VECINOS, borderType=cv2.BORDER_CONSTANT)
+            borrar = tabla[codigos.astype(np.uint8)] & (img == 1)
+            if borrar.any():
+                img[borrar] = 0
+                cambio = True
+        if not cambio:
+            return img.astype(bool)
+
+# ============================================================================
+# MEDIDAS POR LÍNEA
+# ============================================================================
+
+_V, _U = np.mgrid[0:LADO_PALMA, 0:LADO_PALMA] / LADO_PALMA
+
+def _tramos(candidatos):
+    """Componentes conexas como listas de (fila, columna)"""
+    cv2 = vision.cv2
+    n, etiquetas = cv2.connectedComponents(candidatos.astype(np.uint8), connectivity=8)
+    filas, columnas = np.nonzero(etiquetas)
+    etiqueta = etiquetas[filas, columnas]
+    orden = np.argsort(etiqueta, kind='stable')
+    cortes = np.flatnonzero(np.diff(etiqueta[orden])) + 1
+    return [(filas[i], columnas[i]) for i in np.split(orden, cortes)] if n > 1 else []
+
+def _extremo(m, p, al_final):
+    """(m, p) del extremo y recta local (pendiente, ordenada) de los últimos EXTREMO_LOCAL"""
+    cerca = m >= m.max() - EXTREMO_LOCAL if al_final else m <= m.min() + EXTREMO_LOCAL
+    m_cerca, p_cerca = m[cerca], p[cerca]
+    recta = np.polyfit(m_cerca, p_cerca, 1) if np.ptp(m_cerca) > 0 else (0.0, p_cerca.mean())
+    borde = m.max() if al_final else m.min()
+    return borde, np.polyval(recta, borde), recta
+
+def _continua(m, p, m_tramo, p_tramo):
+    """Si el tramo prolonga la línea por alguno de sus extremos, dejando un hueco acotado"""
+    for al_final in (True, False):
+        borde, p_borde, recta = _extremo(m, p, al_final)
+        inicio, p_inicio, _ = _extremo(m_tramo, p_tramo, not al_final)
+        hueco = inicio - borde if al_final else borde - inicio
+        if -SOLAPE_TRAMO <= hueco <= HUECO_MAXIMO and abs(np.polyval(recta, inicio) - p_inicio) <= TOLERANCIA_TRAMO:
+            return True
+    return False
+
+def medir_linea(trazos, horizontalidad, nombre):
+    """Largo, curvatura y cortes de una línea, o None si no se encuentra
+    
+    Dentro de la región de la línea se toma el tramo más extenso en su
+    dirección principal y se le suman los tramos que lo continúan; los huecos
+    entre ellos son los cortes.
+    """
+    orientacion, u0, u1, v0, v1 = REGIONES_LINEAS[nombre]
+    minimo, maximo = _HORIZONTALIDAD[orientacion]
+    candidatos = (trazos & (_U >= u0) & (_U < u1) & (_V >= v0) & (_V < v1)
+                  & (horizontalidad >= minimo) & (horizontalidad <= maximo))
+    
+    tramos = []
+    for filas, columnas in _tramos(candidatos):
+        # m: eje principal de la línea; p: eje perpendicular
+        if orientacion == 'horizontal':
+            m, p = columnas / LADO_PALMA, filas / LADO_PALMA
+        else:
+            m, p = filas / LADO_PALMA, columnas / LADO_PALMA
+        if m.max() - m.min() >= TRAMO_MINIMO:
+            tramos.append((m, p))
+    if not tramos:
+        return None
+    
+    # Se parte del tramo más extenso y se prolonga por sus extremos mientras
+    # haya un tramo que continúe la dirección local de la línea
+    tramos.sort(key=lambda t: t[0].max() - t[0].min(), reverse=True)
+    m, p = tramos.pop(0)
+    prolongada = True
+    while prolongada and tramos:
+        prolongada = False
+        for i, (m_tramo, p_tramo) in enumerate(tramos):
+            if _continua(m, p, m_tramo, p_tramo):
+                m = np.concatenate([m, m_tramo])
+                p = np.concatenate([p, p_tramo])
+                del tramos[i]
+                prolongada = True
+                break
+    
+    bins = np.minimum((m * BINS_TRAZO).astype(int), BINS_TRAZO - 1)
+    ocupados = np.unique(bins)
+    centro_m = (ocupados + 0.5) / BINS_TRAZO
+    centro_p = np.array([np.median(p[bins == b]) for b in ocupados])
+    
+    saltos = np.diff(ocupados)
+    segmentos = np.hypot(np.diff(centro_m), np.diff(centro_p))
+    largo = float(segmentos[saltos <= HUECO_CORTE].sum()) + 1 / BINS_TRAZO
+    cortes = int((saltos > HUECO_CORTE).sum())
+    curvatura = float(abs(2 * np.polyfit(centro_m, centro_p, 2)[0])) if len(ocupados) >= 5 else 0.0
+    
+    return {'largo': round(largo, 2), 'curvatura': round(curvatura, 2), 'cortes': cortes}
+
+def interpretar_linea(nombre, medida):
+    """Entrada de 'lineas' del análisis con textos enumerables para el informe"""
+    info = LINEAS_INFO[nombre]
+    linea = {'nombre': info['nombre'], 'significado': info['significado']}
+    
+    if medida is None or medida['largo'] < LARGO_MINIMO:
+        linea.update(detectada=False, interpretacion=SIN_LINEA)
+        return linea
+    
+    clasificacion = 'larga' if medida['largo'] >= 0.7 else 'media' if medida['largo'] >= 0.45 else 'corta'
+    forma = 'curva' if medida['curvatura'] >= UMBRAL_CURVATURA else 'recta'
+    frases = [info[clasificacion], info[forma], INTERPRETACION_CORTES[min(medida['cortes'], 2)]]
+    
+    linea.update(medida, detectada=True, clasificacion=clasificacion, forma=forma,
+                 interpretacion='. '.join(f for f in frases if f))
+    return linea
+
+def analizar_lineas_palma(img_array, puntos):
+    """Líneas de vida, cabeza y corazón medidas sobre el recorte de la palma
+    
+    `puntos` son los 21 landmarks en píxeles de `img_array`. Devuelve None si
+    OpenCV no está disponible o la palma no se puede recortar.
+    """
+    if img_array is None or not vision.cargar_vision():
+        return None
+    
+    recorte = recortar_palma(img_array, puntos)
+    if recorte is None:
+        return None
+    gris, mascara = recorte
+    
+    respuesta, horizontalidad = realzar_pliegues(gris)
+    umbral = RESPUESTA_MINIMA
+    if mascara.any():
+        umbral = max(umbral, float(np.percentile(respuesta[mascara], PERCENTIL_PLIEGUE)))
+    trazos = esqueleto((respuesta > umbral) & mascara)
+    
+    return {nombre: interpretar_linea(nombre, medir_linea(trazos, horizontalidad, nombre))
+            for nombre in LINEAS_INFO}
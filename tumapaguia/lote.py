@@ -0,0 +1,200 @@
+"""
+Análisis por lotes de una carpeta de fotos de manos, sin navegador
+
+Cada imagen pasa por `validar_calidad_imagen`, `analisis_quirologico_completo`
+y, si se indica la fecha de nacimiento, `analizar_ciclos_temporales`. El trabajo
+se reparte en un pool de procesos con un número acotado de imágenes en vuelo.
+Los resultados se escriben en JSONL a medida que terminan, y ese mismo archivo
+sirve de punto de control para reanudar.
+
+Uso:
+python -m tumapaguia batch fotos/ --out resultados.jsonl
+python -m tumapaguia batch fotos/ --out resultados.parquet --procesos 4
+"""
+
+import json
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from datetime import date
+from pathlib import Path
+
+EXTENSIONES = {'.jpg', '.jpeg', '.png'}
+
+# Estado de cada proceso trabajador
+_fecha_nacimiento = None
+_modo_validacion = 'completo'
+
+def _inicializar_trabajador(fecha_nacimiento, modo_validacion='completo'):
+    """Carga el motor una vez por proceso y precalienta sus detectores"""
+    global _fecha_nacimiento, _modo_validacion
+    from tumapaguia.vision import precalentar_detectores
+    
+    _fecha_nacimiento = fecha_nacimiento
+    _modo_validacion = modo_validacion
+    # Cada proceso atiende una imagen a la vez: basta un detector por nivel de
+    # confianza. Se pasa explícito: con fork el proceso hereda vision ya importado
+    precalentar_detectores(tamano=1)
+
+def _procesar_imagen(ruta, archivo):
+    """Valida y analiza una imagen; devuelve un registro serializable"""
+    from tumapaguia.ciclos import analizar_ciclos_temporales
+    from tumapaguia.ingesta import cargar_foto
+    from tumapaguia.quirologia import analisis_quirologico_completo
+    from tumapaguia.vision import validar_calidad_imagen
+    
+    inicio = time.perf_counter()
+    registro = {'archivo': archivo}
+    try:
+        img = cargar_foto(ruta)
+        validacion = validar_calidad_imagen(img, modo=_modo_validacion)
+        
+        registro['valida'] = validacion['valida']
+        registro['puntuacion'] = validacion['puntuacion']
+        for campo in ('validaciones', 'errores', 'advertencias', 'brillo', 'nitidez', 'contraste'):
+            if campo in validacion:
+                registro[campo] = validacion[campo]
+        if validacion.get('omitidas'):
+            registro['verificaciones_omitidas'] = validacion['omitidas']
+        deteccion = validacion.get('deteccion')
+        if deteccion:
+            registro['modelo_deteccion'] = deteccion.get('modelo')
+            if 'motivo_escalado' in deteccion:
+                registro['motivo_escalado'] = deteccion['motivo_escalado']
+        
+        if validacion['valida']:
+            registro['analisis'] = analisis_quirologico_completo(
+                [img], [validacion['deteccion']]
+            )
+        
+        if _fecha_nacimiento is not None:
+            registro['ciclos'] = analizar_ciclos_temporales(_fecha_nacimiento)
+    except Exception as e:
+        registro['error'] = str(e)
+    
+    registro['segundos'] = round(time.perf_counter() - inicio, 4)
+    return registro
+
+def listar_imagenes(carpeta):
+    """Imágenes de la carpeta (recursivo) como (ruta, nombre relativo), en orden estable"""
+    carpeta = Path(carpeta)
+    for ruta in sorted(carpeta.rglob('*')):
+        if ruta.is_file() and ruta.suffix.lower() in EXTENSIONES:
+            yield str(ruta), ruta.relative_to(carpeta).as_posix()
+
+def leer_punto_control(ruta):
+    """Archivos ya procesados según el JSONL de punto de control
+    
+    Una última línea incompleta (proceso interrumpido) se descarta del archivo.
+    """
+    procesados = set()
+    if not os.path.exists(ruta):
+        return procesados
+    
+    with open(ruta, 'rb+') as f:
+        contenido = f.read()
+        fin_valido = contenido.rfind(b'\n') + 1
+        if fin_valido < len(contenido):
+            f.truncate(fin_valido)
+    
+    for linea in contenido[:fin_valido].splitlines():
+        try:
+            procesados.add(json.loads(linea)['archivo'])
+        except (ValueError, KeyError):
+            continue
+    return procesados
+
+def exportar_parquet(ruta_jsonl, ruta_parquet):
+    """Convierte el JSONL a Parquet aplanando los campos anidados"""
+    import pandas as pd
+    
+    with open(ruta_jsonl, encoding='utf-8') as f:
+        registros = [json.loads(linea) for linea in f if linea.strip()]
+    
+    tabla = pd.json_normalize(registros)
+    # Las listas (errores, advertencias, períodos) se guardan como texto JSON
+    for columna in tabla.columns:
+        if tabla[columna].map(lambda v: isinstance(v, list)).any():
+            tabla[columna] = tabla[columna].map(lambda v: json.dumps(v, ensure_ascii=False) if isinstance(v, list) else v)
+    tabla.to_parquet(ruta_parquet, index=False)
+
+def ejecutar_lote(carpeta, salida, procesos=None, en_vuelo=None, fecha_nacimiento=None, reiniciar=False,
+                  modo_validacion='completo'):
+    """Procesa la carpeta completa y devuelve un resumen con los contadores"""
+    procesos = procesos or os.cpu_count() or 1
+    en_vuelo = en_vuelo or procesos * 2
+    
+    es_parquet = Path(salida).suffix.lower() == '.parquet'
+    punto_control = salida + '.parcial.jsonl' if es_parquet else salida
+    
+    if reiniciar and os.path.exists(punto_control):
+        os.remove(punto_control)
+    procesados = leer_punto_control(punto_control)
+    
+    resumen = {'procesadas': 0, 'validas': 0, 'errores': 0, 'omitidas': 0}
+    inicio = time.perf_counter()
+    
+    with open(punto_control, 'a', encoding='utf-8') as destino, ProcessPoolExecutor(
+        max_workers=procesos,
+        initializer=_inicializar_trabajador,
+        initargs=(fecha_nacimiento, modo_validacion)
+    ) as executor:
+        pendientes = set()
+        
+        def recoger(bloquear):
+            terminados, restantes = wait(pendientes, timeout=None if bloquear else 0, return_when=FIRST_COMPLETED)
+            for futuro in terminados:
+                registro = futuro.result()
+                destino.write(json.dumps(registro, ensure_ascii=False, default=float) + '\n')
+                resumen['procesadas'] += 1
+                resumen['validas'] += bool(registro.get('valida'))
+                resumen['errores'] += 'error' in registro
+            destino.flush()
+            return restantes
+        
+        for ruta, archivo in listar_imagenes(carpeta):
+            if archivo in procesados:
+                resumen['omitidas'] += 1
+                continue
+            
+            # Acota la memoria: nunca más de `en_vuelo` imágenes pendientes
+            while len(pendientes) >= en_vuelo:
+                pendientes = recoger(bloquear=True)
+            pendientes.add(executor.submit(_procesar_imagen, ruta, archivo))
+        
+        while pendientes:
+            pendientes = recoger(bloquear=True)
+    
+    if es_parquet:
+        exportar_parquet(punto_control, salida)
+    
+    resumen['segundos'] = round(time.perf_counter() - inicio, 2)
+    resumen['imagenes_por_segundo'] = round(resumen['procesadas'] / resumen['segundos'], 2) if resumen['segundos'] else 0
+    return resumen
+
+def _comando_batch(args):
+    fecha = date.fromisoformat(args.fecha_nacimiento) if args.fecha_nacimiento else None
+    resumen = ejecutar_lote(
+        args.carpeta,
+        args.out,
+        procesos=args.procesos,
+        en_vuelo=args.en_vuelo,
+        fecha_nacimiento=fecha,
+        reiniciar=args.reiniciar,
+        modo_validacion='rapido' if args.rapido else 'completo'
+    )
+    print(json.dumps(resumen, ensure_ascii=False), file=sys.stderr)
+    return 0
+
+def registrar_comando(comandos):
+    parser = comandos.add_parser('batch', help="Analiza por lotes una carpeta de imágenes")
+    parser.add_argument('carpeta', help="Carpeta con fotos .jpg/.png (se recorre recursivamente)")
+    parser.add_argument('--out', required=True, help="Salida .jsonl o .parquet")
+    parser.add_argument('--procesos', type=int, default=None, help="Procesos trabajadores (por defecto: núcleos)")
+    parser.add_argument('--en-vuelo', type=int, default=None, help="Imágenes pendientes como máximo (por defecto: 2 x procesos)")
+    parser.add_argument('--fecha-nacimiento', default=None, help="AAAA-MM-DD para incluir ciclos temporales")
+    parser.add_argument('--reiniciar', action='store_true', help="Ignora el punto de control y empieza de cero")
+    parser.add_argument('--rapido', action='store_true',
+                        help="Descarta pronto las fotos que ya no pueden aprobar (sin diagnóstico completo)")
+    parser.set_defaults(funcion=_comando_batch)
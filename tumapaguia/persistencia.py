@@ -0,0 +1,226 @@
+"""
+Base de datos SQLite de usuarios y consultas
+
+Las consultas se escriben en segundo plano: la interfaz solo encola la fila y
+un hilo escritor las confirma por lotes sobre una conexión propia en modo WAL.
+"""
+
+import atexit
+import logging
+import os
+import queue
+import sqlite3
+import threading
+import time
+from datetime import datetime, timezone
+
+from tumapaguia.recursos import recurso_compartido
+
+RUTA_DB = 'mapa_guia_destino.db'
+ESPERA_BLOQUEO_MS = int(os.getenv('MAPA_DB_ESPERA_MS', '5000'))
+MAX_COLA_ESCRITURA = int(os.getenv('MAPA_COLA_ESCRITURA', '10000'))
+TAMANO_LOTE_ESCRITURA = 200
+# Tiempo que el escritor espera a que se junten más filas antes de confirmar
+ESPERA_LOTE_SEGUNDOS = 0.05
+# Con la cola llena, lo que espera el script antes de escribir la consulta él mismo
+ESPERA_COLA_SEGUNDOS = 1.0
+
+logger = logging.getLogger(__name__)
+
+def abrir_conexion(ruta=RUTA_DB):
+    """Conexión en modo WAL: las lecturas no esperan a las escrituras
+    
+    Con WAL, synchronous=NORMAL solo puede perder las últimas transacciones
+    ante un corte de energía, nunca corromper la base.
+    """
+    conn = sqlite3.connect(ruta, timeout=ESPERA_BLOQUEO_MS / 1000, check_same_thread=False)
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute('PRAGMA synchronous=NORMAL')
+    conn.execute(f'PRAGMA busy_timeout={ESPERA_BLOQUEO_MS}')
+    return conn
+
+def crear_esquema(conn):
+    """Crea las tablas si no existen"""
+    c = conn.cursor()
+    
+    c.execute('''CREATE TABLE IF NOT EXISTS usuarios
+                 (id INTEGER PRIMARY KEY AUTOINCREMENT,
+                  email TEXT UNIQUE NOT NULL,
+                  password_hash TEXT NOT NULL,
+                  nombre TEXT,
+                  fecha_registro TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                  version_token INTEGER NOT NULL DEFAULT 0)''')
+    # Bases creadas antes de los tokens revocables
+    columnas = {fila[1] for fila in c.execute('PRAGMA table_info(usuarios)')}
+    if 'version_token' not in columnas:
+        c.execute('ALTER TABLE usuarios ADD COLUMN version_token INTEGER NOT NULL DEFAULT 0')
+    
+    c.execute('''CREATE TABLE IF NOT EXISTS consultas
+                 (id INTEGER PRIMARY KEY AUTOINCREMENT,
+                  usuario_id INTEGER,
+                  fecha_consulta TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                  pregunta TEXT NOT NULL,
+                  fecha_nacimiento DATE,
+                  monto_donacion REAL,
+                  analisis_automatico TEXT)''')
+    
+    # Cubre el historial: filtra, ordena y devuelve el resumen sin leer la tabla
+    c.execute('''CREATE INDEX IF NOT EXISTS idx_consultas_historial
+                 ON consultas (usuario_id, fecha_consulta DESC, id DESC,
+                               pregunta, fecha_nacimiento, monto_donacion)''')
+    
+    conn.commit()
+
+# ============================================================================
+# HISTORIAL
+# ============================================================================
+
+CONSULTAS_POR_PAGINA = 10
+
+def listar_consultas(conn, usuario_id, despues_de=None, limite=CONSULTAS_POR_PAGINA):
+    """Una página del historial del usuario, de la más reciente a la más antigua
+    
+    Paginación por clave: `despues_de` es el (fecha_consulta, id) de la última
+    fila de la página anterior, así que el costo no crece con la profundidad.
+    Devuelve (filas, cursor de la página siguiente o None).
+    """
+    if despues_de is None:
+        filas = conn.execute('''SELECT id, fecha_consulta, pregunta, fecha_nacimiento, monto_donacion
+                                FROM consultas INDEXED BY idx_consultas_historial
+                                WHERE usuario_id = ?
+                                ORDER BY fecha_consulta DESC, id DESC
+                                LIMIT ?''', (usuario_id, limite + 1)).fetchall()
+    else:
+        filas = conn.execute('''SELECT id, fecha_consulta, pregunta, fecha_nacimiento, monto_donacion
+                                FROM consultas INDEXED BY idx_consultas_historial
+                                WHERE usuario_id = ? AND (fecha_consulta, id) < (?, ?)
+                                ORDER BY fecha_consulta DESC, id DESC
+                                LIMIT ?''', (usuario_id, *despues_de, limite + 1)).fetchall()
+    
+    # Una fila de más indica si hay página siguiente sin contar el total
+    hay_mas = len(filas) > limite
+    filas = [
+        {'id': f[0], 'fecha_consulta': f[1], 'pregunta': f[2], 'fecha_nacimiento': f[3], 'monto_donacion': f[4]}
+        for f in filas[:limite]
+    ]
+    cursor = (filas[-1]['fecha_consulta'], filas[-1]['id']) if hay_mas else None
+    return filas, cursor
+
+def obtener_analisis(conn, usuario_id, consulta_id):
+    """Texto del análisis de una consulta, solo si pertenece al usuario"""
+    fila = conn.execute('''SELECT analisis_automatico FROM consultas
+                           WHERE id = ? AND usuario_id = ?''', (consulta_id, usuario_id)).fetchone()
+    return fila[0] if fila else None
+
+# ============================================================================
+# ESCRITURA EN SEGUNDO PLANO
+# ============================================================================
+
+_FIN = object()
+_INSERTAR_CONSULTA = '''INSERT INTO consultas
+                        (usuario_id, fecha_consulta, pregunta, fecha_nacimiento,
+                         monto_donacion, analisis_automatico)
+                        VALUES (?, ?, ?, ?, ?, ?)'''
+
+class EscritorConsultas:
+    """Hilo que inserta las consultas encoladas, confirmando por lotes"""
+    
+    def __init__(self, ruta=RUTA_DB, max_cola=MAX_COLA_ESCRITURA):
+        self.ruta = ruta
+        self._cola = queue.Queue(maxsize=max_cola)
+        self._cerrado = False
+        self.filas_escritas = 0
+        self.lotes_escritos = 0
+        self.filas_perdidas = 0
+        self.escrituras_directas = 0
+        self._hilo = threading.Thread(target=self._bucle, name='escritor-consultas', daemon=True)
+        self._hilo.start()
+    
+    def registrar_consulta(self, pregunta, fecha_nacimiento, monto_donacion, analisis_automatico, usuario_id=None):
+        """Encola la consulta; la fecha de consulta es la de ahora, no la del commit
+        
+        Si el escritor va tan atrasado que la cola sigue llena tras
+        ESPERA_COLA_SEGUNDOS, la consulta se escribe en este hilo: nunca se
+        bloquea indefinidamente ni se pierde.
+        """
+        if self._cerrado:
+            raise RuntimeError("El escritor de consultas ya está cerrado")
+        
+        # Mismo formato UTC que CURRENT_TIMESTAMP
+        fecha_consulta = datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
+        fecha_nacimiento = str(fecha_nacimiento) if fecha_nacimiento is not None else None
+        fila = (usuario_id, fecha_consulta, pregunta or "", fecha_nacimiento, monto_donacion, analisis_automatico)
+        try:
+            self._cola.put(fila, timeout=ESPERA_COLA_SEGUNDOS)
+        except queue.Full:
+            self._escribir_directo(fila)
+    
+    def profundidad(self):
+        """Consultas encoladas que aún no se han confirmado"""
+        return self._cola.qsize()
+    
+    def vaciar(self):
+        """Espera a que todo lo encolado hasta ahora quede confirmado"""
+        self._cola.join()
+    
+    def cerrar(self):
+        """Confirma lo pendiente, hace checkpoint del WAL y detiene el hilo"""
+        if self._cerrado:
+            return
+        self._cerrado = True
+        self._cola.put(_FIN)
+        self._hilo.join()
+    
+    def _bucle(self):
+        conn = abrir_conexion(self.ruta)
+        crear_esquema(conn)
+        
+        while True:
+            lote = [self._cola.get()]
+            limite = time.monotonic() + ESPERA_LOTE_SEGUNDOS
+            while len(lote) < TAMANO_LOTE_ESCRITURA and lote[-1] is not _FIN:
+                try:
+                    lote.append(self._cola.get(timeout=max(limite - time.monotonic(), 0)))
+                except queue.Empty:
+                    break
+            
+            filas = [fila for fila in lote if fila is not _FIN]
+            if filas:
+                self._escribir(conn, filas)
+            for _ in lote:
+                self._cola.task_done()
+            
+            if lote[-1] is _FIN:
+                break
+        
+        # Cierre durable: el checkpoint pasa el WAL a la base y sincroniza el archivo
+        conn.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+        conn.close()
+    
+    def _escribir_directo(self, fila):
+        logger.warning("Cola de escritura llena (%d): la consulta se escribe sin encolar", self._cola.maxsize)
+        conn = abrir_conexion(self.ruta)
+        try:
+            with conn:
+                conn.execute(_INSERTAR_CONSULTA, fila)
+        finally:
+            conn.close()
+        self.escrituras_directas += 1
+    
+    def _escribir(self, conn, filas):
+        try:
+            with conn:
+                conn.executemany(_INSERTAR_CONSULTA, filas)
+            self.filas_escritas += len(filas)
+            self.lotes_escritos += 1
+        except sqlite3.Error:
+            # El hilo sigue vivo para los siguientes lotes
+            self.filas_perdidas += len(filas)
+            logger.exception("No se pudieron guardar %d consultas", len(filas))
+
+@recurso_compartido
+def obtener_escritor_consultas():
+    """Escritor único por proceso; al salir confirma lo que quede en la cola"""
+    escritor = EscritorConsultas()
+    atexit.register(escritor.cerrar)
+    return escritor
@@ -0,0 +1,335 @@
+"""
+Análisis quirológico: forma de mano, dedos, montes, líneas y flexibilidad
+"""
+
+import numpy as np
+
+from tumapaguia.ingesta import imagen_canonica
+from tumapaguia.lineas import analizar_lineas_palma
+from tumapaguia.telemetria import TRAZA_INACTIVA
+from tumapaguia.vision import CONFIANZA_ANALISIS, anotar_deteccion, cargar_vision, detectar_mano_con_cache
+
+def analisis_quirologico_completo(images, detecciones=None, huellas=None, traza=TRAZA_INACTIVA):
+    """Análisis completo de imágenes de manos
+    
+    `detecciones` son las detecciones devueltas por `validar_calidad_imagen`
+    para cada imagen; solo se vuelve a detectar cuando su score no alcanza
+    CONFIANZA_ANALISIS. Con `huellas` esa segunda detección pasa por la caché.
+    Las imágenes (ImagenCanonica, PIL o arreglos) se leen sin copiarlas.
+    """
+    
+    if not cargar_vision():
+        return analisis_basico_sin_mediapipe(images)
+    
+    analisis = {
+        'forma_mano': None,
+        'dedos': {},
+        'montes': {},
+        'lineas': {},
+        'textura': {},
+        'flexibilidad': None,
+        'confianza': 0
+    }
+    
+    mejor_imagen = None
+    mejor_deteccion = None
+    mejor_tamano = None
+    
+    # Buscar mejor imagen
+    for idx, img in enumerate(images):
+        if img is None:
+            continue
+        
+        try:
+            if detecciones is not None:
+                deteccion = detecciones[idx]
+                # Sin mano en la validación: el umbral más estricto tampoco la encontrará
+                if deteccion is None:
+                    continue
+            else:
+                deteccion = None
+            
+            imagen = imagen_canonica(img)
+            
+            # El score de lateralidad es la confianza que expone MediaPipe por mano
+            if deteccion is None or deteccion['score'] < CONFIANZA_ANALISIS:
+                huella = huellas[idx] if huellas is not None else None
+                with traza.etapa('deteccion_analisis', imagen=idx + 1, min_confianza=CONFIANZA_ANALISIS) as datos:
+                    deteccion = detectar_mano_con_cache(imagen.rgb, CONFIANZA_ANALISIS, huella)
+                    anotar_deteccion(datos, deteccion)
+            
+            if deteccion:
+                mejor_imagen = imagen.rgb
+                mejor_deteccion = deteccion
+                # Las fotos ingeridas llegan reducidas: las medidas usan el tamaño subido
+                mejor_tamano = imagen.tamano_original
+                break
+        except:
+            continue
+    
+    if mejor_deteccion is None:
+        return analisis_basico_sin_mediapipe(images[0] if images else None)
+    
+    traza.anotar(score_deteccion=mejor_deteccion['score'], lateralidad=mejor_deteccion['lateralidad'])
+    
+    # Extraer landmarks
+    w, h = mejor_tamano
+    puntos = puntos_en_pixeles(landmarks_a_arreglo(mejor_deteccion['landmarks']), w, h)
+    
+    # Análisis de forma
+    analisis['forma_mano'] = analizar_forma_mano_lote(puntos, w, h)
+    
+    # Análisis de dedos
+    analisis['dedos'] = analizar_dedos_lote(puntos)
+    
+    # Análisis de montes
+    analisis['montes'] = analizar_montes_lote(puntos)
+    
+    # Análisis de líneas: el recorte se toma de la imagen tal como llegó
+    alto_img, ancho_img = mejor_imagen.shape[:2]
+    puntos_imagen = puntos_en_pixeles(landmarks_a_arreglo(mejor_deteccion['landmarks']), ancho_img, alto_img)
+    with traza.etapa('lineas', ancho=ancho_img, alto=alto_img) as datos:
+        analisis['lineas'] = analizar_lineas(mejor_imagen, puntos_imagen)
+        datos['detectadas'] = sum(bool(linea.get('detectada')) for linea in analisis['lineas'].values())
+    
+    # Flexibilidad
+    analisis['flexibilidad'] = calcular_flexibilidad_lote(puntos)
+    
+    analisis['confianza'] = 0.85
+    
+    return analisis
+
+# Índices de MediaPipe Hands usados por el análisis
+DEDOS_INFO = [
+    ('Pulgar', [1, 2, 3, 4], 'Voluntad y determinación'),
+    ('Índice', [5, 6, 7, 8], 'Liderazgo y ambición'),
+    ('Medio', [9, 10, 11, 12], 'Responsabilidad y equilibrio'),
+    ('Anular', [13, 14, 15, 16], 'Creatividad y expresión'),
+    ('Meñique', [17, 18, 19, 20], 'Comunicación y negocios')
+]
+
+MONTES_INFO = [
+    ('Venus', [1, 2, 3, 4], 'Amor, pasión, vitalidad'),
+    ('Júpiter', [5, 6, 7, 8], 'Ambición, liderazgo'),
+    ('Saturno', [9, 10, 11, 12], 'Responsabilidad, sabiduría'),
+    ('Apolo', [13, 14, 15, 16], 'Creatividad, éxito'),
+    ('Mercurio', [17, 18, 19, 20], 'Comunicación, negocios')
+]
+
+_INDICES_DEDOS = np.array([indices for _, indices, _ in DEDOS_INFO])
+_INDICES_MONTES = np.array([indices for _, indices, _ in MONTES_INFO])
+# Articulaciones (base, media, punta) de índice, medio, anular y meñique
+_ARTICULACIONES_FLEX = np.array([[5, 7, 9], [9, 11, 13], [13, 15, 17], [17, 19, 20]])
+
+def landmarks_a_arreglo(landmarks):
+    """Convierte 21 landmarks normalizados (x, y, z) en un arreglo compacto (21, 3) float32
+    
+    MediaPipe entrega floats de 32 bits, así que la conversión no pierde precisión.
+    """
+    return np.asarray(landmarks, dtype=np.float32).reshape(21, 3)
+
+def puntos_en_pixeles(arreglo, w, h):
+    """Escala landmarks normalizados (..., 21, 3) a píxeles; z se conserva"""
+    puntos = np.array(arreglo, dtype=np.float64)
+    puntos[..., 0] *= w
+    puntos[..., 1] *= h
+    return puntos
+
+def _arreglo_desde_dicts(landmarks):
+    return np.array([[lm['x'], lm['y'], lm['z']] for lm in landmarks], dtype=np.float64)
+
+def _como_lote(puntos):
+    """Devuelve (lote (N, 21, 3), es_lote)"""
+    puntos = np.asarray(puntos, dtype=np.float64)
+    return puntos.reshape(-1, 21, 3), puntos.ndim == 3
+
+def _distancias(lote, desde, hasta):
+    """Distancias 2D entre landmarks para todo el lote"""
+    delta = lote[..., hasta, :2] - lote[..., desde, :2]
+    return np.sqrt(delta[..., 0]**2 + delta[..., 1]**2)
+
+def analizar_forma_mano_lote(puntos, w, h):
+    """Forma de mano para (21, 3) o (N, 21, 3) landmarks en píxeles"""
+    lote, es_lote = _como_lote(puntos)
+    
+    largo_palma = _distancias(lote, 0, 9)
+    largo_dedo = _distancias(lote, 9, 12)
+    ancho_palma = _distancias(lote, 5, 17)
+    
+    resultados = []
+    for i in range(len(lote)):
+        ratio_dedo_palma = largo_dedo[i] / largo_palma[i] if largo_palma[i] > 0 else 1
+        ratio_ancho = ancho_palma[i] / largo_palma[i] if largo_palma[i] > 0 else 1
+        
+        if ratio_dedo_palma < 0.85 and ratio_ancho > 0.80:
+            forma = 'cuadrada'
+            elemento = 'Tierra'
+            desc = 'Práctica, metódica, confiable'
+        elif ratio_dedo_palma > 1.15:
+            forma = 'filosofica'
+            elemento = 'Aire'
+            desc = 'Analítica, pensadora, reflexiva'
+        elif ratio_dedo_palma > 0.95:
+            forma = 'espatulada'
+            elemento = 'Fuego'
+            desc = 'Activa, enérgica, emprendedora'
+        else:
+            forma = 'conica'
+            elemento = 'Agua'
+            desc = 'Artística, intuitiva, creativa'
+        
+        resultados.append({
+            'tipo': forma,
+            'elemento': elemento,
+            'descripcion': desc,
+            'ratio_dedo_palma': round(ratio_dedo_palma, 2)
+        })
+    
+    return resultados if es_lote else resultados[0]
+
+def analizar_dedos_lote(puntos):
+    """Largo y clasificación de los cinco dedos para (21, 3) o (N, 21, 3) landmarks"""
+    lote, es_lote = _como_lote(puntos)
+    
+    # (N, 5, 3): tres falanges por dedo, sumadas en el mismo orden que el cálculo escalar
+    falanges = _distancias(lote, _INDICES_DEDOS[:, :-1], _INDICES_DEDOS[:, 1:])
+    largos = falanges[..., 0] + falanges[..., 1] + falanges[..., 2]
+    
+    resultados = []
+    for largos_mano in largos:
+        dedos = {}
+        for (nombre, _, significado), largo in zip(DEDOS_INFO, largos_mano):
+            clasificacion = 'largo' if largo > 100 else 'normal' if largo > 70 else 'corto'
+            
+            dedos[nombre.lower()] = {
+                'nombre': nombre,
+                'largo': round(largo, 1),
+                'clasificacion': clasificacion,
+                'significado': significado
+            }
+        resultados.append(dedos)
+    
+    return resultados if es_lote else resultados[0]
+
+def analizar_montes_lote(puntos):
+    """Prominencia de los montes para (21, 3) o (N, 21, 3) landmarks"""
+    lote, es_lote = _como_lote(puntos)
+    
+    # (N, 5): profundidad media de los cuatro landmarks de cada monte
+    z_promedio = lote[:, _INDICES_MONTES, 2].mean(axis=-1)
+    
+    resultados = []
+    for z_mano in z_promedio:
+        montes = {}
+        for (nombre, _, significado), z in zip(MONTES_INFO, z_mano):
+            if z < -0.08:
+                prominencia = 'muy_alto'
+                interp = 'MUY DESARROLLADO'
+            elif z < -0.04:
+                prominencia = 'alto'
+                interp = 'DESARROLLADO'
+            elif z < 0.02:
+                prominencia = 'medio'
+                interp = 'EQUILIBRADO'
+            else:
+                prominencia = 'bajo'
+                interp = 'POR DESARROLLAR'
+            
+            montes[nombre.lower()] = {
+                'nombre': nombre,
+                'prominencia': prominencia,
+                'significado': significado,
+                'interpretacion': interp
+            }
+        resultados.append(montes)
+    
+    return resultados if es_lote else resultados[0]
+
+def calcular_flexibilidad_lote(puntos):
+    """Flexibilidad según los ángulos de los dedos para (21, 3) o (N, 21, 3) landmarks"""
+    lote, es_lote = _como_lote(puntos)
+    
+    p1 = lote[:, _ARTICULACIONES_FLEX[:, 0], :2]
+    p2 = lote[:, _ARTICULACIONES_FLEX[:, 1], :2]
+    p3 = lote[:, _ARTICULACIONES_FLEX[:, 2], :2]
+    v1 = p2 - p1
+    v2 = p3 - p2
+    
+    producto = v1[..., 0] * v2[..., 0] + v1[..., 1] * v2[..., 1]
+    normas = np.sqrt((v1**2).sum(axis=-1)) * np.sqrt((v2**2).sum(axis=-1))
+    angulos = np.degrees(np.arccos(np.clip(producto / (normas + 1e-10), -1, 1)))
+    promedios = angulos.mean(axis=-1)
+    
+    resultados = []
+    for promedio in promedios:
+        if promedio > 175:
+            resultados.append({'tipo': 'muy_flexible', 'interpretacion': 'Mente abierta, adaptable'})
+        elif promedio > 165:
+            resultados.append({'tipo': 'flexible', 'interpretacion': 'Equilibrio entre flexibilidad y estructura'})
+        else:
+            resultados.append({'tipo': 'rigida', 'interpretacion': 'Principios firmes, estructurado'})
+    
+    return resultados if es_lote else resultados[0]
+
+def analizar_forma_mano(landmarks, w, h):
+    """Determina forma de mano"""
+    return analizar_forma_mano_lote(_arreglo_desde_dicts(landmarks), w, h)
+
+def analizar_dedos(landmarks):
+    """Análisis de dedos"""
+    return analizar_dedos_lote(_arreglo_desde_dicts(landmarks))
+
+def analizar_montes(landmarks):
+    """Análisis de montes"""
+    return analizar_montes_lote(_arreglo_desde_dicts(landmarks))
+
+def analizar_lineas(img_array, landmarks):
+    """Líneas de vida, cabeza y corazón
+    
+    Con imagen se miden sobre el recorte de la palma (ver tumapaguia.lineas),
+    con `landmarks` en píxeles de `img_array`; sin imagen o sin OpenCV se
+    devuelve la descripción general de cada línea.
+    """
+    lineas = analizar_lineas_palma(img_array, landmarks)
+    if lineas is not None:
+        return lineas
+    
+    return {
+        'vida': {
+            'nombre': 'Línea de la Vida',
+            'significado': 'Vitalidad, salud, energía vital',
+            'interpretacion': 'Indica tu fuerza vital y resistencia física'
+        },
+        'cabeza': {
+            'nombre': 'Línea de la Cabeza',
+            'significado': 'Intelecto, forma de pensar',
+            'interpretacion': 'Revela tu estilo cognitivo y capacidad mental'
+        },
+        'corazon': {
+            'nombre': 'Línea del Corazón',
+            'significado': 'Emociones, amor, relaciones',
+            'interpretacion': 'Muestra tu vida emocional y afectiva'
+        }
+    }
+
+def calcular_flexibilidad(landmarks):
+    """Calcula flexibilidad"""
+    if len(landmarks) < 21:
+        return {'tipo': 'normal', 'interpretacion': 'Flexibilidad equilibrada'}
+    return calcular_flexibilidad_lote(_arreglo_desde_dicts(landmarks))
+
+def analisis_basico_sin_mediapipe(image):
+    """Análisis cuando no hay MediaPipe"""
+    return {
+        'forma_mano': {
+            'tipo': 'mixta',
+            'elemento': 'Múltiple',
+            'descripcion': 'Análisis básico. Se requiere mejor imagen para precisión.',
+            'ratio_dedo_palma': 1.0
+        },
+        'dedos': {},
+        'montes': {},
+        'lineas': {},
+        'flexibilidad': {'tipo': 'normal', 'interpretacion': 'No determinado'},
+        'confianza': 0.3
+    }
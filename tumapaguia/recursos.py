@@ -0,0 +1,27 @@
+"""
+Recursos compartidos por proceso (detectores, cachés, executors)
+"""
+
+import functools
+import threading
+
+def recurso_compartido(creador):
+    """Memoiza `creador` por proceso y argumentos, accesible desde cualquier hilo
+    
+    A diferencia de st.cache_resource, funciona fuera del hilo del script de
+    Streamlit: los hilos de validación, los procesos de lote y los benchmarks
+    llegan a las mismas instancias.
+    """
+    instancias = {}
+    lock = threading.Lock()
+    
+    @functools.wraps(creador)
+    def obtener(*args):
+        with lock:
+            if args not in instancias:
+                instancias[args] = creador(*args)
+            return instancias[args]
+    
+    # Las instancias ya creadas, por argumentos
+    obtener.instancias = instancias
+    return obtener
@@ -0,0 +1,200 @@
+"""
+Generación del informe completo en markdown/HTML
+
+Los fragmentos que solo dependen de valores enumerables (tipo de mano,
+clasificación de dedo, prominencia de monte, ciclo 1-9...) se formatean una
+vez y se guardan en caché; el informe se arma con un único `join`.
+"""
+
+from functools import lru_cache
+
+from tumapaguia.ciclos import CICLOS_VITALES
+
+SIN_ANALISIS = "<p>No se pudo realizar el análisis. Por favor, sube imágenes de mejor calidad.</p>"
+
+APERTURA = """
+<div class="info-card">
+
+## 🔮 ANÁLISIS QUIROLÓGICO Y CICLOS VITALES
+
+"""
+
+CIERRE = """</div>
+
+<p style="text-align: center; color: #F4E4C1; font-style: italic; font-size: 0.8rem;">
+⚠️ Análisis orientativo. No sustituye consejo profesional.
+</p>
+"""
+
+SEPARADOR = """
+---
+
+"""
+
+CONCLUSION = """
+
+---
+
+### ⭐ CONCLUSIÓN
+
+Este análisis muestra tendencias y potenciales. Tu libre albedrío y acciones conscientes 
+son los verdaderos creadores de tu destino.
+
+"""
+
+# ============================================================================
+# FRAGMENTOS EN CACHÉ
+# ============================================================================
+
+@lru_cache(maxsize=256)
+def _fragmento_forma(tipo, elemento, descripcion):
+    return f"""### 📋 FORMA DE MANO
+
+**Tipo:** {tipo.upper()} - Elemento {elemento}
+
+{descripcion}
+
+Ratio Dedo/Palma: """
+
+@lru_cache(maxsize=256)
+def _fragmento_dedo(nombre, clasificacion, significado):
+    return f"""
+**{nombre}** - {clasificacion.upper()}
+- {significado}
+- Largo: """
+
+@lru_cache(maxsize=256)
+def _fragmento_monte(nombre, prominencia, significado, interpretacion):
+    return f"""
+**Monte de {nombre}** - {prominencia.upper()}
+- {significado}
+- {interpretacion}
+
+"""
+
+@lru_cache(maxsize=256)
+def _fragmento_linea(nombre, significado, interpretacion):
+    return f"""
+**{nombre}**
+- {significado}
+- {interpretacion}
+
+"""
+
+@lru_cache(maxsize=64)
+def _fragmento_flexibilidad(tipo, interpretacion):
+    return f"""### 🎨 FLEXIBILIDAD
+
+{tipo.upper()}: {interpretacion}
+
+---
+
+"""
+
+@lru_cache(maxsize=512)
+def _fragmento_periodo(emoji, año, ciclo, nombre, energia, recomendaciones):
+    return f"""
+**{emoji} AÑO {año} - Ciclo {ciclo}: {nombre}**
+
+Energía: {energia}
+
+Recomendaciones: {recomendaciones}
+
+"""
+
+@lru_cache(maxsize=256)
+def _fragmento_respuesta(tipo, descripcion, ciclo_actual):
+    return f""""
+
+Basándome en tu mano {tipo}, que revela una personalidad {descripcion.lower()}, 
+y considerando el ciclo {ciclo_actual} en el que te encuentras, te recomiendo:
+
+{CICLOS_VITALES[ciclo_actual]['recomendaciones']}
+
+Tu forma de mano indica fortalezas en {descripcion.lower()}.
+"""
+
+# ============================================================================
+# SECCIONES
+# ============================================================================
+
+def _seccion_forma(analisis_quiro, ciclos, pregunta):
+    forma = analisis_quiro.get('forma_mano', {})
+    return [
+        _fragmento_forma(forma.get('tipo', 'N/A'), forma.get('elemento', 'N/A'), forma.get('descripcion', '')),
+        f"{forma.get('ratio_dedo_palma', 0)}\n\n---\n\n"
+    ]
+
+def _seccion_dedos(analisis_quiro, ciclos, pregunta):
+    partes = ["### 🖐️ DEDOS\n\n"]
+    for info in analisis_quiro.get('dedos', {}).values():
+        partes.append(f"{_fragmento_dedo(info['nombre'], info['clasificacion'], info['significado'])}{info['largo']}px\n\n")
+    partes.append(SEPARADOR)
+    return partes
+
+def _seccion_montes(analisis_quiro, ciclos, pregunta):
+    partes = ["### 🏔️ MONTES\n\n"]
+    for info in analisis_quiro.get('montes', {}).values():
+        partes.append(_fragmento_monte(info['nombre'], info['prominencia'], info['significado'], info['interpretacion']))
+    partes.append(SEPARADOR)
+    return partes
+
+def _seccion_lineas(analisis_quiro, ciclos, pregunta):
+    partes = ["### 📏 LÍNEAS PRINCIPALES\n\n"]
+    for info in analisis_quiro.get('lineas', {}).values():
+        partes.append(_fragmento_linea(info['nombre'], info['significado'], info['interpretacion']))
+    partes.append(SEPARADOR)
+    return partes
+
+def _seccion_flexibilidad(analisis_quiro, ciclos, pregunta):
+    flex = analisis_quiro.get('flexibilidad', {})
+    return [_fragmento_flexibilidad(flex.get('tipo', 'normal'), flex.get('interpretacion', ''))]
+
+def _seccion_ciclos(analisis_quiro, ciclos, pregunta):
+    partes = ["### 🌙 CICLOS VITALES\n\n"]
+    for periodo in ciclos['periodos']:
+        partes.append(_fragmento_periodo(periodo['emoji'], periodo['año'], periodo['ciclo'],
+                                         periodo['nombre'], periodo['energia'], periodo['recomendaciones']))
+    return partes
+
+def _seccion_respuesta(analisis_quiro, ciclos, pregunta):
+    if not pregunta:
+        return []
+    forma = analisis_quiro.get('forma_mano', {})
+    return [
+        SEPARADOR,
+        "### 💭 RESPUESTA A TU CONSULTA\n\n**Tu pregunta:** \"",
+        pregunta,
+        _fragmento_respuesta(forma.get('tipo', ''), forma.get('descripcion', ''), ciclos['ciclo_actual'])
+    ]
+
+def _seccion_conclusion(analisis_quiro, ciclos, pregunta):
+    return [CONCLUSION]
+
+SECCIONES = {
+    'forma': _seccion_forma,
+    'dedos': _seccion_dedos,
+    'montes': _seccion_montes,
+    'lineas': _seccion_lineas,
+    'flexibilidad': _seccion_flexibilidad,
+    'ciclos': _seccion_ciclos,
+    'respuesta': _seccion_respuesta,
+    'conclusion': _seccion_conclusion
+}
+
+def generar_seccion(nombre, analisis_quiro, ciclos, pregunta=""):
+    """Markdown de una sección del informe (ver SECCIONES), sin el contenedor HTML"""
+    return "".join(SECCIONES[nombre](analisis_quiro, ciclos, pregunta))
+
+def generar_analisis_completo(analisis_quiro, ciclos, pregunta):
+    """Genera análisis completo HTML"""
+    
+    if not analisis_quiro or analisis_quiro['confianza'] < 0.4:
+        return SIN_ANALISIS
+    
+    partes = [APERTURA]
+    for seccion in SECCIONES.values():
+        partes.extend(seccion(analisis_quiro, ciclos, pregunta))
+    partes.append(CIERRE)
+    
+    return "".join(partes)
@@ -0,0 +1,201 @@
+"""
+Servidor de inferencia local: un MediaPipe caliente para todas las réplicas
+
+Atiende por un socket Unix las validaciones de calidad y las detecciones de
+mano que le envían las réplicas de la interfaz (ver tumapaguia.inferencia).
+Un hilo por conexión lee las peticiones y las deja en una cola; cada una la
+toma el primer trabajador libre (MediaPipe Hands no infiere por lotes). Una
+petición igual a otra en curso (la misma foto desde dos réplicas) espera su
+resultado en lugar de repetirla, y los resultados quedan en la caché por
+contenido del servidor para las siguientes.
+
+Uso:
+python -m tumapaguia servidor --socket /tmp/mapa_inferencia.sock
+MAPA_SERVIDOR_INFERENCIA=/tmp/mapa_inferencia.sock streamlit run tumapaguiaapp.py
+"""
+
+import json
+import logging
+import os
+import queue
+import signal
+import socketserver
+import sys
+import threading
+from concurrent.futures import Future
+
+from tumapaguia import inferencia
+from tumapaguia.cache import SIN_ENTRADA, obtener_cache_resultados
+from tumapaguia.inferencia import TramaInvalida, enviar_trama, recibir_trama
+from tumapaguia.telemetria import TRAZA_INACTIVA, Traza
+from tumapaguia.vision import (MODO_DETECCION, TAMANO_POOL_DETECTORES, detectar_mano_segun_modo,
+                               obtener_estadisticas_deteccion, precalentar_detectores, resumen_pools_detectores,
+                               validar_arreglo)
+
+RUTA_SOCKET = inferencia.RUTA_SERVIDOR_INFERENCIA or 'mapa_inferencia.sock'
+HILOS_INFERENCIA = TAMANO_POOL_DETECTORES
+
+logger = logging.getLogger(__name__)
+
+class Peticion:
+    """Imagen y parámetros en espera de un trabajador"""
+    
+    def __init__(self, cabecera, pixeles):
+        self.cabecera = cabecera
+        self.pixeles = pixeles
+        self.futuro = Future()
+    
+    def clave(self):
+        """Peticiones con la misma clave tienen el mismo resultado; None si no hay huella"""
+        if not self.cabecera.get('huella'):
+            return None
+        return self.cabecera['huella'], self._tipo()
+    
+    def _tipo(self):
+        c = self.cabecera
+        if c['op'] == 'validar':
+            return f"servidor_validacion_{c['modo']}_{c['modo_deteccion']}"
+        return f"servidor_deteccion_{c['min_confianza']}_{c['modo']}"
+    
+    def responder(self, respuesta):
+        self.pixeles = None
+        self.futuro.set_result(respuesta)
+
+class ServidorInferencia:
+    """Cola de peticiones atendida por un número fijo de hilos"""
+    
+    def __init__(self, hilos=HILOS_INFERENCIA):
+        self.hilos = hilos
+        self._cola = queue.Queue()
+        self._lock = threading.Lock()
+        # Clave -> Future de la petición que la está resolviendo
+        self._en_curso = {}
+        self.atendidas = 0
+        self.compartidas = 0
+        for i in range(hilos):
+            threading.Thread(target=self._bucle, name=f'inferencia-{i}', daemon=True).start()
+    
+    def atender(self, cabecera, pixeles):
+        """Respuesta para una petición; bloquea el hilo de la conexión, no a los trabajadores"""
+        if cabecera.get('op') == 'estado':
+            return {'ok': True, 'resultado': self.estado()}
+        peticion = Peticion(cabecera, pixeles)
+        clave = peticion.clave()
+        with self._lock:
+            en_curso = self._en_curso.get(clave) if clave else None
+            if en_curso is not None:
+                self.compartidas += 1
+            elif clave:
+                self._en_curso[clave] = peticion.futuro
+        if en_curso is not None:
+            # Las etapas ya se cuentan en la traza de la primera
+            return dict(en_curso.result(), etapas=[], compartida=True)
+        self._cola.put(peticion)
+        return peticion.futuro.result()
+    
+    def estado(self):
+        with self._lock:
+            return {
+                'hilos': self.hilos,
+                'en_cola': self._cola.qsize(),
+                'en_curso': len(self._en_curso),
+                'atendidas': self.atendidas,
+                'compartidas': self.compartidas,
+                'detectores': resumen_pools_detectores(),
+                'deteccion': obtener_estadisticas_deteccion().resumen(),
+                'cache': obtener_cache_resultados().estadisticas()
+            }
+    
+    def _bucle(self):
+        while True:
+            peticion = self._cola.get()
+            respuesta = self._ejecutar(peticion)
+            clave = peticion.clave()
+            with self._lock:
+                self.atendidas += 1
+                # Las que lleguen desde ahora encuentran el resultado en la caché
+                if clave:
+                    del self._en_curso[clave]
+            peticion.responder(respuesta)
+    
+    def _ejecutar(self, peticion):
+        cabecera = peticion.cabecera
+        traza = Traza('servidor') if cabecera.get('traza') else TRAZA_INACTIVA
+        cache = obtener_cache_resultados()
+        clave = peticion.clave()
+        try:
+            resultado = cache.obtener(*clave, SIN_ENTRADA) if clave else SIN_ENTRADA
+            if resultado is SIN_ENTRADA:
+                resultado = self._inferir(cabecera, peticion.pixeles, traza)
+                if clave:
+                    cache.guardar(*clave, resultado)
+        except Exception as e:
+            logger.exception("Falló la petición %s", cabecera.get('op'))
+            return {'ok': False, 'error': str(e) or type(e).__name__}
+        etapas = traza.resumen()['etapas'] if traza is not TRAZA_INACTIVA else []
+        return {'ok': True, 'resultado': resultado, 'etapas': etapas}
+    
+    @staticmethod
+    def _inferir(cabecera, pixeles, traza):
+        if cabecera['op'] == 'validar':
+            ancho, alto = cabecera['tamano']
+            # El cliente mide la nitidez a resolución nativa cuando los píxeles llegan reducidos
+            nitidez = cabecera.get('nitidez')
+            return validar_arreglo(pixeles, ancho, alto, traza, cabecera.get('foto'), cabecera['modo'],
+                                   cabecera['modo_deteccion'], (lambda: nitidez) if nitidez is not None else None)
+        if cabecera['op'] == 'detectar':
+            return detectar_mano_segun_modo(pixeles, cabecera['min_confianza'], cabecera['modo'])
+        raise ValueError(f"Operación desconocida: {cabecera['op']}")
+
+class _Manejador(socketserver.BaseRequestHandler):
+    def handle(self):
+        while True:
+            try:
+                trama = recibir_trama(self.request)
+            except TramaInvalida as e:
+                # Los píxeles no se leyeron: la conexión no sirve para otra trama
+                logger.warning("Trama rechazada: %s", e)
+                enviar_trama(self.request, {'ok': False, 'error': str(e)})
+                return
+            if trama is None:
+                return
+            enviar_trama(self.request, self.server.inferencia.atender(*trama))
+
+class _ServidorSocket(socketserver.ThreadingUnixStreamServer):
+    daemon_threads = True
+    # Con el valor por defecto (5) las réplicas que conectan a la vez reciben EAGAIN
+    request_queue_size = 128
+
+def servir(ruta=RUTA_SOCKET, hilos=HILOS_INFERENCIA, modo=None):
+    """Calienta los detectores y atiende el socket hasta Ctrl+C"""
+    # El servidor infiere localmente aunque comparta appmapa.env con las réplicas
+    inferencia.RUTA_SERVIDOR_INFERENCIA = ''
+    # Un detector por hilo en cada pool: con menos, los hilos de más esperarían un detector
+    precalentar_detectores(modo or MODO_DETECCION, tamano=hilos)
+    
+    if os.path.exists(ruta):
+        os.remove(ruta)
+    # SIGTERM (systemd, docker stop) cierra igual que Ctrl+C y borra el socket
+    signal.signal(signal.SIGTERM, signal.default_int_handler)
+    with _ServidorSocket(ruta, _Manejador) as servidor:
+        servidor.inferencia = ServidorInferencia(hilos)
+        print(json.dumps({'socket': ruta, 'hilos': hilos}), file=sys.stderr, flush=True)
+        try:
+            servidor.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            os.remove(ruta)
+    return 0
+
+def _comando_servidor(args):
+    return servir(args.socket, args.hilos, args.modo_deteccion)
+
+def registrar_comando(comandos):
+    parser = comandos.add_parser('servidor', help="Servidor de inferencia local compartido por las réplicas")
+    parser.add_argument('--socket', default=RUTA_SOCKET, help="Ruta del socket Unix (por defecto: MAPA_SERVIDOR_INFERENCIA)")
+    parser.add_argument('--hilos', type=int, default=HILOS_INFERENCIA,
+                        help="Hilos de inferencia (por defecto: MAPA_POOL_DETECTORES)")
+    parser.add_argument('--modo-deteccion', choices=('completo', 'adaptativo'), default=None,
+                        help="Detectores a precalentar (por defecto: MAPA_MODO_DETECCION)")
+    parser.set_defaults(funcion=_comando_servidor)
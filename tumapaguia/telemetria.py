@@ -0,0 +1,168 @@
+"""
+Telemetría por consulta: duración de cada etapa y atributos, en una línea JSON
+
+Con MAPA_TELEMETRIA=0 las trazas son un objeto inerte y cada etapa cuesta una
+llamada a un método vacío.
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager, nullcontext
+from logging.handlers import RotatingFileHandler
+
+from tumapaguia.recursos import recurso_compartido
+
+TELEMETRIA_ACTIVA = os.getenv('MAPA_TELEMETRIA', '1') == '1'
+RUTA_LOG_TELEMETRIA = os.getenv('MAPA_LOG_TELEMETRIA', 'mapa_guia_telemetria.log')
+MAX_BYTES_LOG = int(os.getenv('MAPA_LOG_TELEMETRIA_MB', '5')) * 1024 * 1024
+ARCHIVOS_LOG = 3
+
+@recurso_compartido
+def obtener_logger():
+    """Logger con rotación; sin ruta configurada no escribe a disco"""
+    logger = logging.getLogger('tumapaguia.telemetria')
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+    if RUTA_LOG_TELEMETRIA and not logger.handlers:
+        manejador = RotatingFileHandler(RUTA_LOG_TELEMETRIA, maxBytes=MAX_BYTES_LOG,
+                                        backupCount=ARCHIVOS_LOG, encoding='utf-8')
+        manejador.setFormatter(logging.Formatter('%(message)s'))
+        logger.addHandler(manejador)
+    return logger
+
+class Traza:
+    """Etapas cronometradas y atributos de una consulta
+    
+    Las etapas pueden registrarse desde los hilos de validación.
+    """
+    
+    def __init__(self, tipo):
+        self.id = uuid.uuid4().hex[:12]
+        self.tipo = tipo
+        self.fecha = time.strftime('%Y-%m-%dT%H:%M:%S')
+        self.atributos = {}
+        self.etapas = []
+        self._inicio = time.perf_counter()
+        self._lock = threading.Lock()
+        self._finalizada = False
+    
+    @contextmanager
+    def etapa(self, nombre, **atributos):
+        """Cronometra el bloque; los atributos se pueden completar dentro con `dict.update`"""
+        inicio = time.perf_counter()
+        try:
+            yield atributos
+        finally:
+            registro = {'etapa': nombre, 'ms': round((time.perf_counter() - inicio) * 1e3, 2), **atributos}
+            with self._lock:
+                self.etapas.append(registro)
+    
+    def anotar(self, **atributos):
+        with self._lock:
+            self.atributos.update(atributos)
+    
+    def incorporar(self, etapas):
+        """Agrega etapas medidas en otro proceso (el servidor de inferencia)"""
+        with self._lock:
+            self.etapas.extend(etapas)
+    
+    def resumen(self):
+        with self._lock:
+            return {
+                'id': self.id,
+                'tipo': self.tipo,
+                'fecha': self.fecha,
+                'total_ms': round((time.perf_counter() - self._inicio) * 1e3, 2),
+                'atributos': dict(self.atributos),
+                'etapas': list(self.etapas)
+            }
+    
+    def finalizar(self):
+        """Escribe la traza en el log (una sola vez) y devuelve su resumen"""
+        resumen = self.resumen()
+        if not self._finalizada:
+            self._finalizada = True
+            obtener_logger().info(json.dumps(resumen, ensure_ascii=False, default=str))
+        return resumen
+
+class _TrazaInactiva:
+    """Traza sin efecto para cuando la telemetría está desactivada"""
+    
+    def etapa(self, nombre, **atributos):
+        return nullcontext(atributos)
+    
+    def anotar(self, **atributos):
+        pass
+    
+    def incorporar(self, etapas):
+        pass
+    
+    def resumen(self):
+        return None
+    
+    def finalizar(self):
+        return None
+
+TRAZA_INACTIVA = _TrazaInactiva()
+
+def nueva_traza(tipo):
+    """Traza para una consulta, o la traza inerte si la telemetría está apagada"""
+    return Traza(tipo) if TELEMETRIA_ACTIVA else TRAZA_INACTIVA
+
+# ============================================================================
+# MEMORIA
+# ============================================================================
+
+INTERVALO_MUESTREO_RSS = 0.01
+_BYTES_PAGINA = os.sysconf('SC_PAGE_SIZE') if hasattr(os, 'sysconf') else 4096
+
+def rss_actual():
+    """RSS del proceso en bytes, o None donde no hay /proc (fuera de Linux)"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * _BYTES_PAGINA
+    except OSError:
+        return None
+
+class MuestreadorRSS:
+    """Pico de RSS mientras está activo, muestreado cada INTERVALO_MUESTREO_RSS en un hilo"""
+    
+    def __init__(self, intervalo=INTERVALO_MUESTREO_RSS):
+        self.intervalo = intervalo
+        self.inicio = self.pico = rss_actual()
+        self._detenido = threading.Event()
+        self._hilo = threading.Thread(target=self._bucle, name='muestreo-rss', daemon=True)
+        self._hilo.start()
+    
+    def _bucle(self):
+        while not self._detenido.wait(self.intervalo):
+            self.pico = max(self.pico, rss_actual())
+    
+    def detener(self):
+        self._detenido.set()
+        self._hilo.join()
+        self.pico = max(self.pico, rss_actual())
+        return self.pico
+
+@contextmanager
+def medir_rss(traza):
+    """Anota en la traza el RSS al empezar y al terminar el bloque, y el pico entre medio
+    
+    El RSS es del proceso: con consultas simultáneas, el pico incluye lo que
+    ocupan las demás.
+    """
+    if traza is TRAZA_INACTIVA or rss_actual() is None:
+        yield
+        return
+    
+    muestreador = MuestreadorRSS()
+    try:
+        yield
+    finally:
+        pico = muestreador.detener()
+        traza.anotar(rss_inicio_mb=round(muestreador.inicio / 2**20, 1), rss_pico_mb=round(pico / 2**20, 1),
+                     rss_fin_mb=round(rss_actual() / 2**20, 1))
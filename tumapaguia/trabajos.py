@@ -0,0 +1,240 @@
+"""
+Cola de trabajos de consulta: la página encola y un pool de hilos analiza
+
+Enviar una consulta solo copia los bytes de las fotos y la deja en cola, así
+que el script de Streamlit vuelve en milisegundos aunque el pool esté ocupado.
+Los hilos atienden las sesiones por turnos (una sesión con varias consultas no
+acapara el pool) y la página consulta el estado por ID en cada refresco. El
+trabajo vive en el proceso y no en el rerun: sobrevive a los reruns de la página.
+"""
+
+import io
+import logging
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+
+from tumapaguia.ciclos import analizar_ciclos_temporales
+from tumapaguia.ingesta import obtener_presupuesto_memoria
+from tumapaguia.persistencia import obtener_escritor_consultas
+from tumapaguia.quirologia import analisis_quirologico_completo
+from tumapaguia.recursos import recurso_compartido
+from tumapaguia.reporte import generar_analisis_completo
+from tumapaguia.telemetria import TRAZA_INACTIVA, medir_rss
+from tumapaguia.vision import validar_fotos
+
+MAX_HILOS_TRABAJOS = int(os.getenv('MAPA_HILOS_TRABAJOS', '2'))
+MAX_COLA_TRABAJOS = int(os.getenv('MAPA_COLA_TRABAJOS', '32'))
+MAX_TRABAJOS_POR_SESION = int(os.getenv('MAPA_TRABAJOS_POR_SESION', '2'))
+# Los trabajos terminados que ninguna página recoge se descartan pasado este tiempo
+RETENCION_TRABAJOS_SEGUNDOS = 30 * 60
+
+EN_COLA = 'en_cola'
+VALIDANDO = 'validando'
+ANALIZANDO = 'analizando'
+LISTO = 'listo'
+FALLIDO = 'fallido'
+ESTADOS_ACTIVOS = (EN_COLA, VALIDANDO, ANALIZANDO)
+
+logger = logging.getLogger(__name__)
+
+class ColaLlena(RuntimeError):
+    """No se admiten más trabajos: la cola o el cupo de la sesión están completos"""
+
+class Trabajo:
+    """Una consulta encolada; el hilo que la ejecuta actualiza su estado"""
+    
+    def __init__(self, funcion, args, kwargs, sesion):
+        self.id = uuid.uuid4().hex[:12]
+        self.sesion = sesion
+        self.estado = EN_COLA
+        self.resultado = None
+        self.error = None
+        self.creado = time.monotonic()
+        self.iniciado = None
+        self.terminado = None
+        self._funcion = funcion
+        self._args = args
+        self._kwargs = kwargs
+        self._lock = threading.Lock()
+    
+    def marcar(self, estado):
+        with self._lock:
+            self.estado = estado
+    
+    def ejecutar(self):
+        self.iniciado = time.monotonic()
+        try:
+            resultado = self._funcion(self, *self._args, **self._kwargs)
+        except Exception as e:
+            logger.exception("Falló el trabajo %s", self.id)
+            self._terminar(FALLIDO, error=str(e) or type(e).__name__)
+        else:
+            self._terminar(LISTO, resultado=resultado)
+        finally:
+            # Las fotos ya no hacen falta: no se retienen hasta que la página recoja el trabajo
+            self._args = self._kwargs = None
+    
+    def _terminar(self, estado, resultado=None, error=None):
+        with self._lock:
+            self.resultado = resultado
+            self.error = error
+            self.terminado = time.monotonic()
+            self.estado = estado
+    
+    def instantanea(self):
+        """Copia consistente del estado para la página"""
+        with self._lock:
+            return {
+                'id': self.id,
+                'estado': self.estado,
+                'resultado': self.resultado,
+                'error': self.error,
+                'espera_ms': round(((self.iniciado or time.monotonic()) - self.creado) * 1e3, 2)
+            }
+
+class ColaTrabajos:
+    """Pool de hilos con cola acotada que atiende las sesiones por turnos"""
+    
+    def __init__(self, max_hilos=MAX_HILOS_TRABAJOS, max_cola=MAX_COLA_TRABAJOS,
+                 max_por_sesion=MAX_TRABAJOS_POR_SESION):
+        self.max_cola = max_cola
+        self.max_por_sesion = max_por_sesion
+        self._trabajos = {}
+        # Una fila por sesión; al servir una, pasa al final
+        self._filas = OrderedDict()
+        self._en_cola = 0
+        self._condicion = threading.Condition()
+        for i in range(max_hilos):
+            threading.Thread(target=self._bucle, name=f'trabajos-{i}', daemon=True).start()
+    
+    def enviar(self, funcion, *args, sesion=None, **kwargs):
+        """Encola `funcion(trabajo, *args, **kwargs)` y devuelve el ID sin esperar
+        
+        Lanza ColaLlena si la cola está completa o la sesión ya tiene
+        `max_por_sesion` trabajos sin terminar.
+        """
+        with self._condicion:
+            self._purgar()
+            if self._en_cola >= self.max_cola:
+                raise ColaLlena(f"Hay {self._en_cola} consultas en espera")
+            if sesion is not None:
+                activos = sum(t.sesion == sesion and t.estado in ESTADOS_ACTIVOS for t in self._trabajos.values())
+                if activos >= self.max_por_sesion:
+                    raise ColaLlena(f"Ya tienes {activos} consultas en curso")
+            
+            trabajo = Trabajo(funcion, args, kwargs, sesion)
+            self._trabajos[trabajo.id] = trabajo
+            self._filas.setdefault(sesion, deque()).append(trabajo)
+            self._en_cola += 1
+            self._condicion.notify()
+        return trabajo.id
+    
+    def estado(self, id_trabajo):
+        """Instantánea del trabajo, o None si no existe (descartado o de otro proceso)"""
+        with self._condicion:
+            trabajo = self._trabajos.get(id_trabajo)
+        return trabajo.instantanea() if trabajo else None
+    
+    def retirar(self, id_trabajo):
+        """Olvida un trabajo terminado cuyo resultado ya recogió la página"""
+        with self._condicion:
+            trabajo = self._trabajos.get(id_trabajo)
+            if trabajo is not None and trabajo.estado not in ESTADOS_ACTIVOS:
+                del self._trabajos[id_trabajo]
+    
+    def en_espera(self):
+        return self._en_cola
+    
+    def _purgar(self):
+        limite = time.monotonic() - RETENCION_TRABAJOS_SEGUNDOS
+        vencidos = [i for i, t in self._trabajos.items() if t.terminado is not None and t.terminado < limite]
+        for id_trabajo in vencidos:
+            del self._trabajos[id_trabajo]
+    
+    def _siguiente(self):
+        sesion, fila = self._filas.popitem(last=False)
+        trabajo = fila.popleft()
+        if fila:
+            self._filas[sesion] = fila
+        self._en_cola -= 1
+        return trabajo
+    
+    def _bucle(self):
+        while True:
+            with self._condicion:
+                while not self._filas:
+                    self._condicion.wait()
+                trabajo = self._siguiente()
+            trabajo.ejecutar()
+
+@recurso_compartido
+def obtener_cola_trabajos():
+    """Cola única por proceso, compartida por todas las sesiones"""
+    return ColaTrabajos()
+
+# ============================================================================
+# CONSULTAS
+# ============================================================================
+
+def copiar_fotos(fotos):
+    """Bytes de las fotos subidas: el trabajo no depende de los widgets de la página"""
+    return [io.BytesIO(foto.getvalue()) for foto in fotos]
+
+def procesar_consulta(trabajo, fotos, fecha_nacimiento, pregunta="", monto=0, usuario_id=None,
+                      exigir_todas_validas=False, traza=TRAZA_INACTIVA):
+    """Valida, analiza, genera el informe y lo encola para la base
+    
+    Con `exigir_todas_validas` (consulta gratis) una sola foto rechazada deja
+    la consulta sin análisis; la premium analiza las fotos que pasen. Cada
+    etapa suelta lo que ya no necesita: `fotos` se vacía tras validar y las
+    imágenes se liberan al terminar el análisis. La traza anota el RSS del
+    proceso al empezar, al terminar y su pico.
+    """
+    traza.anotar(trabajo=trabajo.id, espera_cola_ms=round((trabajo.iniciado - trabajo.creado) * 1e3, 2))
+    with medir_rss(traza):
+        return _procesar_consulta(trabajo, fotos, fecha_nacimiento, pregunta, monto, usuario_id,
+                                  exigir_todas_validas, traza)
+
+def _procesar_consulta(trabajo, fotos, fecha_nacimiento, pregunta, monto, usuario_id, exigir_todas_validas, traza):
+    trabajo.marcar(VALIDANDO)
+    with traza.etapa('validacion'):
+        resultados = validar_fotos(fotos, traza, sesion=trabajo.sesion)
+    # Es la misma lista que retiene el trabajo: vaciarla suelta los bytes subidos
+    fotos.clear()
+    traza.anotar(imagenes_vivas_mb=round(obtener_presupuesto_memoria().usados / 2**20, 1))
+    
+    validas = [(img, validacion['deteccion'], huella) for img, validacion, huella in resultados
+               if validacion['valida'] and img is not None]
+    consulta = {
+        'validaciones': [validacion for _, validacion, _ in resultados],
+        'imagenes_validas': len(validas),
+        'resultado': None
+    }
+    total = len(resultados)
+    del resultados
+    if not validas or (exigir_todas_validas and len(validas) < total):
+        return consulta
+    
+    trabajo.marcar(ANALIZANDO)
+    imagenes, detecciones, huellas = (list(columna) for columna in zip(*validas))
+    del validas
+    with traza.etapa('analisis_quirologico'):
+        analisis_quiro = analisis_quirologico_completo(imagenes, detecciones, huellas, traza)
+    # Desde aquí solo quedan resultados compactos
+    del imagenes
+    
+    with traza.etapa('ciclos'):
+        ciclos = analizar_ciclos_temporales(fecha_nacimiento, pregunta)
+    consulta['analisis_quiro'] = analisis_quiro
+    consulta['ciclos'] = ciclos
+    with traza.etapa('reporte'):
+        consulta['resultado'] = generar_analisis_completo(analisis_quiro, ciclos, pregunta)
+    
+    escritor = obtener_escritor_consultas()
+    with traza.etapa('persistencia'):
+        escritor.registrar_consulta(pregunta, fecha_nacimiento, monto, consulta['resultado'], usuario_id=usuario_id)
+    traza.anotar(cola_escritura=escritor.profundidad())
+    return consulta
@@ -0,0 +1,618 @@
+"""
+Visión: detectores MediaPipe compartidos y validación de calidad de imágenes
+"""
+
+import importlib
+import math
+import os
+import queue
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import contextmanager
+
+import numpy as np
+
+from tumapaguia.cache import SIN_ENTRADA, huella_contenido, obtener_cache_resultados
+from tumapaguia.inferencia import inferencia_remota, pedir_inferencia
+from tumapaguia.ingesta import FotoRechazada, PresupuestoConsulta, cargar_foto, imagen_canonica, leer_dimensiones
+from tumapaguia.recursos import recurso_compartido
+from tumapaguia.telemetria import TRAZA_INACTIVA
+
+# Importaciones opcionales: OpenCV y MediaPipe se cargan al primer uso.
+# Solo importar MediaPipe toma segundos y las páginas sin fotos no lo necesitan.
+cv2 = None
+mp_hands = None
+mp_drawing = None
+_vision_disponible = None
+_lock_carga = threading.Lock()
+
+def cargar_vision():
+    """Importa OpenCV y MediaPipe una sola vez; devuelve si están disponibles
+    
+    Con servidor de inferencia MediaPipe no se importa aquí: solo lo carga el
+    primer detector local, si el servidor deja de responder.
+    """
+    global cv2, _vision_disponible
+    if _vision_disponible is None:
+        with _lock_carga:
+            if _vision_disponible is None:
+                try:
+                    import cv2 as _cv2
+                    cv2 = _cv2
+                    if not inferencia_remota():
+                        _cargar_mediapipe()
+                    _vision_disponible = True
+                except:
+                    _vision_disponible = False
+    return _vision_disponible
+
+def _cargar_mediapipe():
+    global mp_hands, mp_drawing
+    if mp_hands is None:
+        # En un hilo propio: MediaPipe guarda a nivel de módulo la excepción de
+        # sounddevice sin PortAudio, y su traceback retendría para siempre los
+        # frames de quien lo importó, con la imagen que estuviera validando
+        hilo = threading.Thread(target=importlib.import_module, args=('mediapipe',), name='importar-mediapipe')
+        hilo.start()
+        hilo.join()
+        import mediapipe as mp
+        mp_hands = mp.solutions.hands
+        mp_drawing = mp.solutions.drawing_utils
+
+def __getattr__(nombre):
+    # VISION_AVAILABLE conserva su significado, pero se resuelve al consultarlo
+    if nombre == 'VISION_AVAILABLE':
+        return cargar_vision()
+    raise AttributeError(f"module {__name__!r} has no attribute {nombre!r}")
+
+# ============================================================================
+# DETECTORES MEDIAPIPE
+# ============================================================================
+
+CONFIANZA_VALIDACION = 0.5
+CONFIANZA_ANALISIS = 0.7
+TAMANO_POOL_DETECTORES = int(os.getenv('MAPA_POOL_DETECTORES', '2'))
+
+# model_complexity de MediaPipe Hands: 0 es el modelo de landmarks ligero
+COMPLEJIDAD_LIGERA = 0
+COMPLEJIDAD_COMPLETA = 1
+NOMBRES_MODELO = {COMPLEJIDAD_LIGERA: 'ligero', COMPLEJIDAD_COMPLETA: 'completo'}
+
+class PoolDetectores:
+    """Pool acotado de detectores MediaPipe Hands de larga duración"""
+    
+    def __init__(self, min_confianza, complejidad=COMPLEJIDAD_COMPLETA, tamano=TAMANO_POOL_DETECTORES):
+        cargar_vision()
+        _cargar_mediapipe()
+        self.min_confianza = min_confianza
+        self.complejidad = complejidad
+        self.tamano = max(1, tamano)
+        self._disponibles = queue.LifoQueue(maxsize=self.tamano)
+        # Detectores prestados a la vez: ahora y el máximo visto
+        self.prestados = 0
+        self.max_prestados = 0
+        self._lock = threading.Lock()
+        for _ in range(self.tamano):
+            self._disponibles.put(self._crear_detector())
+    
+    def _crear_detector(self):
+        detector = mp_hands.Hands(
+            static_image_mode=True,
+            max_num_hands=1,
+            model_complexity=self.complejidad,
+            min_detection_confidence=self.min_confianza
+        )
+        # Inferencia de calentamiento: carga el grafo TFLite antes de la primera foto
+        detector.process(np.zeros((64, 64, 3), dtype=np.uint8))
+        return detector
+    
+    @contextmanager
+    def detector(self, timeout=None):
+        """Presta un detector del pool y lo devuelve al terminar"""
+        detector = self._disponibles.get(timeout=timeout)
+        with self._lock:
+            self.prestados += 1
+            self.max_prestados = max(self.max_prestados, self.prestados)
+        try:
+            yield detector
+        finally:
+            with self._lock:
+                self.prestados -= 1
+            self._disponibles.put(detector)
+    
+    def resumen(self):
+        return {
+            'min_confianza': self.min_confianza,
+            'modelo': NOMBRES_MODELO[self.complejidad],
+            'tamano': self.tamano,
+            'max_prestados': self.max_prestados
+        }
+
+# Detectores por pool en este proceso; ver precalentar_detectores
+_tamano_pool = TAMANO_POOL_DETECTORES
+
+@recurso_compartido
+def obtener_pool_detectores(min_confianza, complejidad=COMPLEJIDAD_COMPLETA):
+    """Pool compartido por todas las sesiones del proceso"""
+    return PoolDetectores(min_confianza, complejidad, _tamano_pool)
+
+def resumen_pools_detectores():
+    """Tamaño y máximo de detectores usados a la vez de cada pool creado en el proceso"""
+    return [pool.resumen() for pool in list(obtener_pool_detectores.instancias.values())]
+
+def precalentar_detectores(modo=None, tamano=None):
+    """Crea y calienta los pools de validación y análisis que usa el modo de detección
+    
+    `tamano` fija los detectores de cada pool del proceso (por defecto
+    MAPA_POOL_DETECTORES); no cambia los pools ya creados. Con servidor de
+    inferencia los detectores calientes son los del servidor.
+    """
+    global _tamano_pool
+    if tamano is not None:
+        _tamano_pool = tamano
+    modo = modo or MODO_DETECCION
+    complejidades = [COMPLEJIDAD_COMPLETA]
+    if modo == 'adaptativo':
+        complejidades.insert(0, COMPLEJIDAD_LIGERA)
+    if cargar_vision() and not inferencia_remota():
+        for confianza in (CONFIANZA_VALIDACION, CONFIANZA_ANALISIS):
+            for complejidad in complejidades:
+                obtener_pool_detectores(confianza, complejidad)
+
+@recurso_compartido
+def precalentar_en_segundo_plano():
+    """Carga la visión y calienta los detectores en un hilo, una vez por proceso"""
+    hilo = threading.Thread(target=precalentar_detectores, name='precarga-vision', daemon=True)
+    hilo.start()
+    return hilo
+
+def detectar_mano(img_array, min_confianza, complejidad=COMPLEJIDAD_COMPLETA):
+    """Detecta una mano en `img_array` (RGB) y devuelve landmarks normalizados, lateralidad y score"""
+    # MediaPipe espera RGB: recibe el búfer de la foto sin conversión
+    with obtener_pool_detectores(min_confianza, complejidad).detector() as hands:
+        results = hands.process(img_array)
+    
+    if not results.multi_hand_landmarks:
+        return None
+    
+    clasificacion = results.multi_handedness[0].classification[0]
+    return {
+        'landmarks': [(lm.x, lm.y, lm.z) for lm in results.multi_hand_landmarks[0].landmark],
+        'lateralidad': clasificacion.label,
+        'score': clasificacion.score,
+        'modelo': NOMBRES_MODELO[complejidad]
+    }
+
+# ============================================================================
+# DETECCIÓN ADAPTATIVA
+# ============================================================================
+
+# completo: siempre el modelo completo; adaptativo: el ligero y, si no convence, el completo
+MODO_DETECCION = os.getenv('MAPA_MODO_DETECCION', 'completo')
+SCORE_ESCALADO = float(os.getenv('MAPA_SCORE_ESCALADO', '0.85'))
+# Largo del dedo medio / largo de la palma fuera de este rango: landmarks dudosos
+RATIO_DEDO_PALMA_PLAUSIBLE = (0.6, 1.5)
+
+def motivo_escalado(deteccion, alto, ancho):
+    """Por qué la detección del modelo ligero no basta, o None si basta"""
+    if deteccion is None:
+        return 'sin_mano'
+    if deteccion['score'] < SCORE_ESCALADO:
+        return 'score'
+    
+    # Mismas medidas que analizar_forma_mano: muñeca (0) a base (9) y punta (12) del medio
+    puntos = np.asarray(deteccion['landmarks'], dtype=np.float64)[:, :2] * [ancho, alto]
+    largo_palma = np.hypot(*(puntos[9] - puntos[0]))
+    largo_dedo = np.hypot(*(puntos[12] - puntos[9]))
+    minimo, maximo = RATIO_DEDO_PALMA_PLAUSIBLE
+    if largo_palma == 0 or not minimo <= largo_dedo / largo_palma <= maximo:
+        return 'geometria'
+    return None
+
+class EstadisticasDeteccion:
+    """Detecciones adaptativas del proceso y cuántas escalaron al modelo completo, por motivo"""
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.detecciones = 0
+        self.motivos = {}
+    
+    def registrar(self, motivo):
+        with self._lock:
+            self.detecciones += 1
+            if motivo is not None:
+                self.motivos[motivo] = self.motivos.get(motivo, 0) + 1
+    
+    def resumen(self):
+        with self._lock:
+            escaladas = sum(self.motivos.values())
+            return {
+                'detecciones': self.detecciones,
+                'escaladas': escaladas,
+                'tasa_escalado': round(escaladas / self.detecciones, 3) if self.detecciones else None,
+                'motivos': dict(self.motivos)
+            }
+
+@recurso_compartido
+def obtener_estadisticas_deteccion():
+    return EstadisticasDeteccion()
+
+def detectar_mano_adaptativa(img_array, min_confianza):
+    """Modelo ligero primero; el completo solo si el score o la geometría no convencen
+    
+    La detección devuelta lleva `motivo_escalado` (None si bastó el ligero).
+    """
+    deteccion = detectar_mano(img_array, min_confianza, COMPLEJIDAD_LIGERA)
+    motivo = motivo_escalado(deteccion, *img_array.shape[:2])
+    if motivo is not None:
+        deteccion = detectar_mano(img_array, min_confianza, COMPLEJIDAD_COMPLETA)
+    
+    obtener_estadisticas_deteccion().registrar(motivo)
+    if deteccion is not None:
+        deteccion['motivo_escalado'] = motivo
+    return deteccion
+
+def anotar_deteccion(datos, deteccion):
+    """Score, modelo y motivo de escalado en los datos de una etapa de la traza"""
+    datos['score'] = deteccion['score'] if deteccion else None
+    if deteccion:
+        datos['modelo'] = deteccion.get('modelo')
+        if 'motivo_escalado' in deteccion:
+            datos['motivo_escalado'] = deteccion['motivo_escalado']
+
+def detectar_mano_segun_modo(img_array, min_confianza, modo=None, huella=None):
+    """detectar_mano con el modo de detección configurado (MAPA_MODO_DETECCION)
+    
+    Con servidor de inferencia la detección corre allí; `huella` le permite
+    reutilizar lo que ya detectó para otra réplica.
+    """
+    modo = modo or MODO_DETECCION
+    respuesta = pedir_inferencia({'op': 'detectar', 'min_confianza': min_confianza, 'modo': modo,
+                                  'huella': huella}, img_array)
+    if respuesta is not None:
+        return respuesta['resultado']
+    
+    if modo == 'adaptativo':
+        return detectar_mano_adaptativa(img_array, min_confianza)
+    return detectar_mano(img_array, min_confianza)
+
+def detectar_mano_con_cache(img_array, min_confianza, huella=None):
+    """detectar_mano_segun_modo reutilizando el resultado guardado para el mismo contenido"""
+    if huella is None:
+        return detectar_mano_segun_modo(img_array, min_confianza)
+    
+    cache = obtener_cache_resultados()
+    tipo = _tipo_cache(f"deteccion_{min_confianza}")
+    deteccion = cache.obtener(huella, tipo, SIN_ENTRADA)
+    if deteccion is SIN_ENTRADA:
+        deteccion = detectar_mano_segun_modo(img_array, min_confianza, huella=huella)
+        cache.guardar(huella, tipo, deteccion)
+    return deteccion
+
+def _tipo_cache(tipo, *modos):
+    """Tipo de caché que distingue los resultados de modos distintos del completo"""
+    return '_'.join([tipo] + [m for m in (*modos, MODO_DETECCION) if m != 'completo'])
+
+# ============================================================================
+# VALIDACIÓN DE IMÁGENES
+# ============================================================================
+
+LADO_MAXIMO_PROXY = int(os.getenv('MAPA_LADO_PROXY_CALIDAD', '1600'))
+REJILLA_NITIDEZ = 4
+
+def _nitidez_por_muestras(img_array, pixeles_muestra, rejilla=REJILLA_NITIDEZ):
+    """Varianza del Laplaciano estimada con baldosas a resolución nativa
+    
+    Reducir la imagen borra justo las frecuencias altas que delatan el desenfoque,
+    así que la nitidez se mide sobre una rejilla de baldosas sin reescalar. El
+    resultado queda en las mismas unidades que el cálculo a tamaño completo.
+    """
+    h, w = img_array.shape[:2]
+    lado = int(np.sqrt(pixeles_muestra / rejilla ** 2))
+    lado_y = min(lado, h // rejilla)
+    lado_x = min(lado, w // rejilla)
+    
+    total = 0
+    suma = 0.0
+    suma_cuadrados = 0.0
+    for i in range(rejilla):
+        y0 = int((i + 0.5) * h / rejilla) - lado_y // 2
+        for j in range(rejilla):
+            x0 = int((j + 0.5) * w / rejilla) - lado_x // 2
+            
+            # Un píxel de margen para que el Laplaciano coincida con el de la imagen completa
+            y_ini, x_ini = max(0, y0 - 1), max(0, x0 - 1)
+            y_fin, x_fin = min(h, y0 + lado_y + 1), min(w, x0 + lado_x + 1)
+            baldosa = img_array[y_ini:y_fin, x_ini:x_fin]
+            if len(baldosa.shape) == 3:
+                baldosa = cv2.cvtColor(baldosa, cv2.COLOR_RGB2GRAY)
+            
+            laplaciano = cv2.Laplacian(baldosa, cv2.CV_16S)
+            laplaciano = laplaciano[y0 - y_ini:y0 - y_ini + lado_y, x0 - x_ini:x0 - x_ini + lado_x]
+            
+            media, desviacion = cv2.meanStdDev(laplaciano)
+            media, desviacion = media[0, 0], desviacion[0, 0]
+            total += laplaciano.size
+            suma += media * laplaciano.size
+            suma_cuadrados += (desviacion ** 2 + media ** 2) * laplaciano.size
+    
+    media = suma / total
+    return suma_cuadrados / total - media ** 2
+
+def _gris_reducido(img_array, lado_maximo=LADO_MAXIMO_PROXY):
+    """Escala de grises de la copia reducida y su factor de escala"""
+    cargar_vision()
+    h, w = img_array.shape[:2]
+    escala = min(1.0, lado_maximo / max(w, h))
+    
+    proxy = img_array
+    if escala < 1.0:
+        tamano = (max(1, round(w * escala)), max(1, round(h * escala)))
+        proxy = cv2.resize(img_array, tamano, interpolation=cv2.INTER_AREA)
+    
+    if len(proxy.shape) == 3:
+        return cv2.cvtColor(proxy, cv2.COLOR_RGB2GRAY), escala
+    return proxy, escala
+
+def _brillo_contraste(gray):
+    # Media y desviación en una sola pasada
+    media, desviacion = cv2.meanStdDev(gray)
+    return float(media[0, 0]), float(desviacion[0, 0])
+
+def _nitidez(img_array, gray, escala):
+    if escala < 1.0:
+        return float(_nitidez_por_muestras(img_array, gray.size))
+    # La imagen ya cabe en el proxy: cálculo exacto; CV_16S basta para uint8
+    _, desviacion_lap = cv2.meanStdDev(cv2.Laplacian(gray, cv2.CV_16S))
+    return float(desviacion_lap[0, 0] ** 2)
+
+def _pixeles_proxy(ancho, alto, lado_maximo=LADO_MAXIMO_PROXY):
+    escala = min(1.0, lado_maximo / max(ancho, alto))
+    return max(1, round(ancho * escala)) * max(1, round(alto * escala))
+
+def medidor_nitidez_nativa(imagen):
+    """Función que mide la nitidez de una ImagenCanonica reducida a su resolución subida
+    
+    Las baldosas de `_nitidez_por_muestras` solo conservan las unidades del
+    cálculo a tamaño completo si leen píxeles nativos: sobre la decodificación
+    reducida una foto de 48 MP desenfocada pasa de 10-35 a miles y supera el
+    umbral de 100. None si la imagen no se redujo.
+    """
+    if imagen.gris_nativo is None:
+        return None
+    
+    def medir():
+        cargar_vision()
+        gris = imagen.gris_nativo()
+        return float(_nitidez_por_muestras(gris, _pixeles_proxy(*imagen.tamano_original)))
+    return medir
+
+def calcular_metricas_calidad(img_array, lado_maximo=LADO_MAXIMO_PROXY):
+    """Calcula brillo, contraste y nitidez con memoria acotada
+    
+    Brillo y contraste se miden sobre una copia reducida (lado máximo
+    `lado_maximo`); la nitidez, sobre baldosas nativas que suman el área del
+    proxy, de modo que los umbrales 60-200 / 30 / 100 siguen valiendo.
+    """
+    gray, escala = _gris_reducido(img_array, lado_maximo)
+    brillo, contraste = _brillo_contraste(gray)
+    return brillo, contraste, _nitidez(img_array, gray, escala)
+
+# Verificaciones en el orden del informe y puntuación mínima para aprobar
+VERIFICACIONES = ('resolucion', 'iluminacion', 'nitidez', 'contraste', 'mano_detectada')
+PUNTUACION_MINIMA = 60
+MODO_VALIDACION = os.getenv('MAPA_MODO_VALIDACION', 'completo')
+
+def validar_calidad_imagen(image, traza=TRAZA_INACTIVA, foto=None, modo='completo', huella=None):
+    """Valida la calidad de la imagen para análisis
+    
+    `image` es una ImagenCanonica, una imagen PIL o un arreglo RGB. Con
+    servidor de inferencia (MAPA_SERVIDOR_INFERENCIA) la validación corre
+    allí y sus etapas se agregan a la traza; si no responde, corre aquí.
+    """
+    try:
+        imagen = imagen_canonica(image)
+        img_array = imagen.rgb
+        # Las fotos ingeridas llegan reducidas: la regla de resolución usa el tamaño subido
+        w, h = imagen.tamano_original
+        medir_nitidez = medidor_nitidez_nativa(imagen)
+        
+        if inferencia_remota():
+            # El servidor solo recibe los píxeles reducidos: la nitidez nativa se mide aquí
+            nitidez = medir_nitidez() if medir_nitidez else None
+            with traza.etapa('inferencia_remota', foto=foto, op='validar') as datos:
+                respuesta = pedir_inferencia({'op': 'validar', 'modo': modo, 'modo_deteccion': MODO_DETECCION,
+                                              'tamano': [w, h], 'nitidez': nitidez, 'foto': foto, 'huella': huella,
+                                              'traza': traza is not TRAZA_INACTIVA}, img_array)
+                datos['remota'] = respuesta is not None
+                datos['compartida'] = bool(respuesta and respuesta.get('compartida'))
+            if respuesta is not None:
+                traza.incorporar(respuesta['etapas'])
+                return respuesta['resultado']
+        
+        return validar_arreglo(img_array, w, h, traza, foto, modo, medir_nitidez=medir_nitidez)
+        
+    except Exception as e:
+        return {
+            'valida': False,
+            'puntuacion': 0,
+            'errores': [f"Error: {str(e)}"],
+            'advertencias': [],
+            'deteccion': None
+        }
+
+def validar_arreglo(img_array, w, h, traza=TRAZA_INACTIVA, foto=None, modo='completo', modo_deteccion=None,
+                    medir_nitidez=None):
+    """Verificaciones de `validar_calidad_imagen` sobre los píxeles; (w, h) es el tamaño subido
+    
+    Las verificaciones corren de la más barata a la más cara: resolución
+    (cabecera), brillo y contraste (copia reducida), nitidez (baldosas) y
+    detección de mano. Con modo='rapido' se detienen en cuanto la puntuación
+    mínima ya es inalcanzable; las que no corrieron quedan en `omitidas`.
+    Si `img_array` llegó reducido, `medir_nitidez` da la nitidez nativa.
+    """
+    validaciones = {}
+    errores = []
+    advertencias = []
+    metricas = {}
+    deteccion = None
+    fallos_tolerados = len(VERIFICACIONES) - math.ceil(PUNTUACION_MINIMA * len(VERIFICACIONES) / 100)
+    
+    def continuar():
+        fallos = sum(not v for v in validaciones.values())
+        return modo != 'rapido' or fallos <= fallos_tolerados
+    
+    # Resolución
+    if w >= 800 and h >= 600:
+        validaciones['resolucion'] = True
+    else:
+        validaciones['resolucion'] = False
+        errores.append(f"Resolución {w}x{h}. Mínimo: 800x600")
+    
+    if continuar():
+        with traza.etapa('metricas_calidad', foto=foto, ancho=w, alto=h):
+            gray, escala = _gris_reducido(img_array)
+            brillo, contraste = _brillo_contraste(gray)
+        metricas['brillo'] = brillo
+        metricas['contraste'] = contraste
+        
+        # Iluminación
+        validaciones['iluminacion'] = 60 < brillo < 200
+        if brillo <= 60:
+            errores.append("Imagen muy oscura")
+        elif brillo >= 200:
+            advertencias.append("Imagen muy clara")
+        
+        # Contraste
+        validaciones['contraste'] = contraste > 30
+        if not validaciones['contraste']:
+            advertencias.append("Bajo contraste")
+    
+    if continuar():
+        with traza.etapa('nitidez', foto=foto, nativa=medir_nitidez is not None):
+            if medir_nitidez is not None:
+                laplacian_var = medir_nitidez()
+            else:
+                laplacian_var = _nitidez(img_array, gray, escala)
+        metricas['nitidez'] = laplacian_var
+        
+        validaciones['nitidez'] = laplacian_var > 100
+        if not validaciones['nitidez']:
+            errores.append(f"Imagen borrosa (nitidez: {laplacian_var:.0f})")
+    
+    # Detectar mano
+    if continuar():
+        if cargar_vision():
+            with traza.etapa('deteccion', foto=foto, min_confianza=CONFIANZA_VALIDACION) as datos:
+                deteccion = detectar_mano_segun_modo(img_array, CONFIANZA_VALIDACION, modo_deteccion)
+                anotar_deteccion(datos, deteccion)
+            validaciones['mano_detectada'] = deteccion is not None
+            if deteccion is None:
+                errores.append("No se detectó mano clara")
+        else:
+            validaciones['mano_detectada'] = True
+    
+    puntuacion = sum(validaciones.values()) / len(VERIFICACIONES) * 100
+    
+    return {
+        'valida': puntuacion >= PUNTUACION_MINIMA,
+        'puntuacion': puntuacion,
+        'validaciones': {v: validaciones[v] for v in VERIFICACIONES if v in validaciones},
+        'omitidas': [v for v in VERIFICACIONES if v not in validaciones],
+        'errores': errores,
+        'advertencias': advertencias,
+        **metricas,
+        'deteccion': deteccion
+    }
+
+MAX_HILOS_VALIDACION = int(os.getenv('MAPA_MAX_HILOS_VALIDACION', str(min(4, os.cpu_count() or 1))))
+
+@recurso_compartido
+def obtener_executor_validacion():
+    """Hilos de validación compartidos: el tope vale para todo el proceso"""
+    return ThreadPoolExecutor(max_workers=MAX_HILOS_VALIDACION, thread_name_prefix='validacion')
+
+def validacion_rechazada(error):
+    """Resultado de una foto que no llegó a decodificarse"""
+    return {
+        'valida': False,
+        'puntuacion': 0,
+        'errores': [error],
+        'advertencias': [],
+        'deteccion': None
+    }
+
+def _abrir_y_validar(foto, huella, dimensiones, traza=TRAZA_INACTIVA, numero=None, modo='completo', sesion=None):
+    # Una validación rápida no sirve como diagnóstico completo: se guardan aparte
+    tipo = _tipo_cache('validacion', modo)
+    cache = obtener_cache_resultados()
+    with traza.etapa('cache_validacion', foto=numero) as datos:
+        validacion = cache.obtener(huella, tipo)
+        datos['acierto'] = validacion is not None
+    # Solo el análisis necesita los píxeles: una foto ya rechazada no se decodifica
+    if validacion is not None and not validacion['valida']:
+        return None, dict(validacion, en_cache=True)
+    
+    with traza.etapa('decodificacion', foto=numero, ancho=dimensiones[0], alto=dimensiones[1]) as datos:
+        img = cargar_foto(foto, dimensiones=dimensiones, sesion=sesion)
+        datos['ancho_analisis'], datos['alto_analisis'] = img.size
+    if validacion is not None:
+        validacion = dict(validacion, en_cache=True)
+    else:
+        validacion = validar_calidad_imagen(img, traza, numero, modo, huella)
+        # Los errores inesperados no se guardan: pueden ser transitorios
+        if 'validaciones' in validacion:
+            cache.guardar(huella, tipo, validacion)
+    # El análisis no mide nitidez: suelta la foto subida que retiene la lectura nativa
+    img.gris_nativo = None
+    # La imagen rechazada se suelta aquí y devuelve su parte del presupuesto de memoria
+    return (img if validacion['valida'] else None), validacion
+
+def _rechazo_inmediato(error):
+    futuro = Future()
+    futuro.set_result((None, validacion_rechazada(error)))
+    return futuro
+
+def validar_fotos(fotos, traza=TRAZA_INACTIVA, modo=MODO_VALIDACION, sesion=None):
+    """Decodifica y valida las fotos en paralelo
+    
+    Devuelve (imagen, validación, huella) en orden de ranura; la imagen es None
+    si la foto no se pudo leer, excede el presupuesto de píxeles o de memoria
+    de `sesion`, o no pasó la validación. Las fotos con el mismo contenido se
+    validan una sola vez y se marcan con `duplicada_de`. `modo` se pasa a
+    `validar_calidad_imagen`.
+    """
+    executor = obtener_executor_validacion()
+    with traza.etapa('huellas', fotos=len(fotos)):
+        huellas = [huella_contenido(foto) for foto in fotos]
+    
+    # El presupuesto se reparte en orden de ranura, antes de decodificar nada
+    presupuesto = PresupuestoConsulta()
+    futuros = {}
+    for numero, (foto, huella) in enumerate(zip(fotos, huellas), 1):
+        if huella in futuros:
+            continue
+        try:
+            dimensiones = leer_dimensiones(foto)
+            presupuesto.reservar(*dimensiones)
+        except FotoRechazada as e:
+            futuros[huella] = _rechazo_inmediato(str(e))
+        except Exception as e:
+            futuros[huella] = _rechazo_inmediato(f"Error: {str(e)}")
+        else:
+            futuros[huella] = executor.submit(_abrir_y_validar, foto, huella, dimensiones, traza, numero, modo, sesion)
+    
+    resultados = []
+    primera_ranura = {}
+    for numero, huella in enumerate(huellas, 1):
+        try:
+            img, validacion = futuros[huella].result()
+        except Exception as e:
+            img, validacion = None, validacion_rechazada(f"Error: {str(e)}")
+        if huella in primera_ranura:
+            validacion = dict(validacion, duplicada_de=primera_ranura[huella])
+        else:
+            primera_ranura[huella] = numero
+        resultados.append((img, validacion, huella))
+    
+    return resultados
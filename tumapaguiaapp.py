@@ -12,27 +12,27 @@ streamlit run app.py
 
 import streamlit as st
 import pandas as pd
-import numpy as np
-from PIL import Image
-import sqlite3
-import bcrypt
 from datetime import datetime, timedelta
 import json
 import os
+import time
+import uuid
+from collections import OrderedDict
 from dotenv import load_dotenv
 
-# Importaciones opcionales
-try:
-    import cv2
-    import mediapipe as mp
-    VISION_AVAILABLE = True
-    mp_hands = mp.solutions.hands
-    mp_drawing = mp.solutions.drawing_utils
-except:
-    VISION_AVAILABLE = False
-
+# El motor lee su configuración del entorno al importarse
 load_dotenv()
 
+from tumapaguia.autenticacion import (EMAILS_ADMIN, IntentosExcedidos, autenticar, emitir_token, registrar_usuario,
+                                      revocar_tokens, verificar_token)
+from tumapaguia.inferencia import inferencia_remota, obtener_cliente_inferencia
+from tumapaguia.persistencia import RUTA_DB, abrir_conexion, crear_esquema, listar_consultas, obtener_analisis
+from tumapaguia.telemetria import TRAZA_INACTIVA, nueva_traza
+from tumapaguia.trabajos import (ANALIZANDO, EN_COLA, ESTADOS_ACTIVOS, FALLIDO, VALIDANDO, ColaLlena,
+                                 copiar_fotos, obtener_cola_trabajos, procesar_consulta)
+from tumapaguia.vision import (MODO_DETECCION, obtener_estadisticas_deteccion, precalentar_detectores,
+                               precalentar_en_segundo_plano)
+
 # ============================================================================
 # CONFIGURACIÓN
 # ============================================================================
@@ -175,130 +175,12 @@ PRECIOS = {
     'consulta_premium_max': 60000,
 }
 
-CICLOS_VITALES = {
-    1: {'nombre': 'Nuevos Inicios', 'emoji': '🌟', 
-        'energia': 'Liderazgo, independencia, iniciativa',
-        'recomendaciones': 'Inicia proyectos nuevos, toma la iniciativa, sé valiente'},
-    2: {'nombre': 'Cooperación', 'emoji': '🤝',
-        'energia': 'Asociaciones, diplomacia, paciencia',
-        'recomendaciones': 'Trabaja en equipo, cultiva relaciones, sé paciente'},
-    3: {'nombre': 'Expresión Creativa', 'emoji': '🎨',
-        'energia': 'Creatividad, comunicación, alegría',
-        'recomendaciones': 'Exprésate libremente, socializa, crea sin límites'},
-    4: {'nombre': 'Construcción', 'emoji': '🏗️',
-        'energia': 'Disciplina, trabajo duro, estructura',
-        'recomendaciones': 'Construye bases sólidas, sé disciplinado'},
-    5: {'nombre': 'Cambio y Libertad', 'emoji': '🦋',
-        'energia': 'Aventura, cambio, expansión',
-        'recomendaciones': 'Acepta cambios, experimenta cosas nuevas'},
-    6: {'nombre': 'Responsabilidad', 'emoji': '🏡',
-        'energia': 'Hogar, familia, servicio',
-        'recomendaciones': 'Cuida a tu familia, mejora tu hogar'},
-    7: {'nombre': 'Introspección', 'emoji': '🧘',
-        'energia': 'Espiritualidad, análisis profundo',
-        'recomendaciones': 'Medita, estudia, conócete profundamente'},
-    8: {'nombre': 'Poder y Logros', 'emoji': '👑',
-        'energia': 'Éxito material, reconocimiento',
-        'recomendaciones': 'Busca el éxito, gestiona finanzas, lidera'},
-    9: {'nombre': 'Culminación', 'emoji': '🌅',
-        'energia': 'Cierre de ciclos, sabiduría',
-        'recomendaciones': 'Cierra ciclos, perdona, comparte sabiduría'}
-}
-
 # ============================================================================
 # VALIDACIÓN DE IMÁGENES
 # ============================================================================
 
-def validar_calidad_imagen(image):
-    """Valida la calidad de la imagen para análisis"""
-    try:
-        img_array = np.array(image)
-        
-        if len(img_array.shape) == 3:
-            gray = cv2.cvtColor(img_array, cv2.COLOR_RGB2GRAY)
-        else:
-            gray = img_array
-        
-        h, w = gray.shape
-        
-        validaciones = {
-            'resolucion': False,
-            'iluminacion': False,
-            'nitidez': False,
-            'contraste': False,
-            'mano_detectada': False
-        }
-        
-        errores = []
-        advertencias = []
-        
-        # Resolución
-        if w >= 800 and h >= 600:
-            validaciones['resolucion'] = True
-        else:
-            errores.append(f"Resolución {w}x{h}. Mínimo: 800x600")
-        
-        # Iluminación
-        brillo = np.mean(gray)
-        if 60 < brillo < 200:
-            validaciones['iluminacion'] = True
-        elif brillo <= 60:
-            errores.append("Imagen muy oscura")
-        else:
-            advertencias.append("Imagen muy clara")
-        
-        # Nitidez
-        laplacian_var = cv2.Laplacian(gray, cv2.CV_64F).var()
-        if laplacian_var > 100:
-            validaciones['nitidez'] = True
-        else:
-            errores.append(f"Imagen borrosa (nitidez: {laplacian_var:.0f})")
-        
-        # Contraste
-        contraste = gray.std()
-        if contraste > 30:
-            validaciones['contraste'] = True
-        else:
-            advertencias.append("Bajo contraste")
-        
-        # Detectar mano
-        if VISION_AVAILABLE:
-            with mp_hands.Hands(
-                static_image_mode=True,
-                max_num_hands=1,
-                min_detection_confidence=0.5
-            ) as hands:
-                results = hands.process(cv2.cvtColor(img_array, cv2.COLOR_RGB2BGR))
-                if results.multi_hand_landmarks:
-                    validaciones['mano_detectada'] = True
-                else:
-                    errores.append("No se detectó mano clara")
-        else:
-            validaciones['mano_detectada'] = True
-        
-        puntuacion = sum(validaciones.values()) / len(validaciones) * 100
-        
-        return {
-            'valida': puntuacion >= 60,
-            'puntuacion': puntuacion,
-            'validaciones': validaciones,
-            'errores': errores,
-            'advertencias': advertencias,
-            'brillo': brillo,
-            'nitidez': laplacian_var if 'laplacian_var' in locals() else 0,
-            'contraste': contraste
-        }
-        
-    except Exception as e:
-        return {
-            'valida': False,
-            'puntuacion': 0,
-            'errores': [f"Error: {str(e)}"],
-            'advertencias': []
-        }
-
-def mostrar_resultado_validacion(validacion, numero_foto):
-    """Muestra resultado de validación"""
+def mostrar_resultado_validacion(validacion, numero_foto, etapas=None):
+    """Muestra resultado de validación; `etapas` son los tiempos de la foto (solo admins)"""
     puntuacion = validacion['puntuacion']
     
     if puntuacion >= 80:
@@ -329,486 +211,218 @@ def mostrar_resultado_validacion(validacion, numero_foto):
         for adv in validacion['advertencias']:
             st.warning(f"⚠️ {adv}", icon="⚡")
     
+    if validacion.get('duplicada_de'):
+        st.info(f"♻️ Idéntica a la foto {validacion['duplicada_de']}: se reutiliza su validación")
+    
     with st.expander("📊 Detalles técnicos"):
         col1, col2, col3 = st.columns(3)
-        with col1:
-            st.metric("Brillo", f"{validacion.get('brillo', 0):.0f}")
-        with col2:
-            st.metric("Nitidez", f"{validacion.get('nitidez', 0):.0f}")
-        with col3:
-            st.metric("Contraste", f"{validacion.get('contraste', 0):.0f}")
-
-# ============================================================================
-# ANÁLISIS QUIROLÓGICO
-# ============================================================================
-
-def analisis_quirologico_completo(images):
-    """Análisis completo de imágenes de manos"""
-    
-    if not VISION_AVAILABLE:
-        return analisis_basico_sin_mediapipe(images)
-    
-    analisis = {
-        'forma_mano': None,
-        'dedos': {},
-        'montes': {},
-        'lineas': {},
-        'textura': {},
-        'flexibilidad': None,
-        'confianza': 0
-    }
-    
-    mejor_imagen = None
-    mejor_landmarks = None
-    
-    # Buscar mejor imagen
-    for img in images:
-        if img is None:
-            continue
-        
-        try:
-            img_array = np.array(img)
-            
-            with mp_hands.Hands(
-                static_image_mode=True,
-                max_num_hands=1,
-                min_detection_confidence=0.7
-            ) as hands:
-                results = hands.process(cv2.cvtColor(img_array, cv2.COLOR_RGB2BGR))
-                
-                if results.multi_hand_landmarks:
-                    mejor_imagen = img_array
-                    mejor_landmarks = results.multi_hand_landmarks[0]
-                    break
-        except:
-            continue
-    
-    if mejor_landmarks is None:
-        return analisis_basico_sin_mediapipe(images[0] if images else None)
-    
-    # Extraer landmarks
-    h, w = mejor_imagen.shape[:2]
-    landmarks = []
-    for lm in mejor_landmarks.landmark:
-        landmarks.append({
-            'x': lm.x * w,
-            'y': lm.y * h,
-            'z': lm.z
-        })
-    
-    # Análisis de forma
-    analisis['forma_mano'] = analizar_forma_mano(landmarks, w, h)
-    
-    # Análisis de dedos
-    analisis['dedos'] = analizar_dedos(landmarks)
-    
-    # Análisis de montes
-    analisis['montes'] = analizar_montes(landmarks)
-    
-    # Análisis de líneas
-    analisis['lineas'] = analizar_lineas(mejor_imagen, landmarks)
-    
-    # Flexibilidad
-    analisis['flexibilidad'] = calcular_flexibilidad(landmarks)
-    
-    analisis['confianza'] = 0.85
-    
-    return analisis
-
-def analizar_forma_mano(landmarks, w, h):
-    """Determina forma de mano"""
-    muneca = landmarks[0]
-    base_medio = landmarks[9]
-    punta_medio = landmarks[12]
-    base_indice = landmarks[5]
-    base_menique = landmarks[17]
-    
-    largo_palma = np.sqrt((base_medio['x'] - muneca['x'])**2 + 
-                          (base_medio['y'] - muneca['y'])**2)
-    largo_dedo = np.sqrt((punta_medio['x'] - base_medio['x'])**2 + 
-                         (punta_medio['y'] - base_medio['y'])**2)
-    ancho_palma = np.sqrt((base_menique['x'] - base_indice['x'])**2 + 
-                          (base_menique['y'] - base_indice['y'])**2)
-    
-    ratio_dedo_palma = largo_dedo / largo_palma if largo_palma > 0 else 1
-    ratio_ancho = ancho_palma / largo_palma if largo_palma > 0 else 1
-    
-    if ratio_dedo_palma < 0.85 and ratio_ancho > 0.80:
-        forma = 'cuadrada'
-        elemento = 'Tierra'
-        desc = 'Práctica, metódica, confiable'
-    elif ratio_dedo_palma > 1.15:
-        forma = 'filosofica'
-        elemento = 'Aire'
-        desc = 'Analítica, pensadora, reflexiva'
-    elif ratio_dedo_palma > 0.95:
-        forma = 'espatulada'
-        elemento = 'Fuego'
-        desc = 'Activa, enérgica, emprendedora'
-    else:
-        forma = 'conica'
-        elemento = 'Agua'
-        desc = 'Artística, intuitiva, creativa'
-    
-    return {
-        'tipo': forma,
-        'elemento': elemento,
-        'descripcion': desc,
-        'ratio_dedo_palma': round(ratio_dedo_palma, 2)
-    }
-
-def analizar_dedos(landmarks):
-    """Análisis de dedos"""
-    dedos = {}
-    
-    dedos_info = [
-        ('Pulgar', [1, 2, 3, 4], 'Voluntad y determinación'),
-        ('Índice', [5, 6, 7, 8], 'Liderazgo y ambición'),
-        ('Medio', [9, 10, 11, 12], 'Responsabilidad y equilibrio'),
-        ('Anular', [13, 14, 15, 16], 'Creatividad y expresión'),
-        ('Meñique', [17, 18, 19, 20], 'Comunicación y negocios')
-    ]
-    
-    for nombre, indices, significado in dedos_info:
-        largo = 0
-        for i in range(len(indices)-1):
-            p1 = landmarks[indices[i]]
-            p2 = landmarks[indices[i+1]]
-            largo += np.sqrt((p2['x'] - p1['x'])**2 + (p2['y'] - p1['y'])**2)
-        
-        clasificacion = 'largo' if largo > 100 else 'normal' if largo > 70 else 'corto'
-        
-        dedos[nombre.lower()] = {
-            'nombre': nombre,
-            'largo': round(largo, 1),
-            'clasificacion': clasificacion,
-            'significado': significado
-        }
-    
-    return dedos
-
-def analizar_montes(landmarks):
-    """Análisis de montes"""
-    montes = {}
-    
-    montes_info = [
-        ('Venus', range(1, 5), 'Amor, pasión, vitalidad'),
-        ('Júpiter', range(5, 9), 'Ambición, liderazgo'),
-        ('Saturno', range(9, 13), 'Responsabilidad, sabiduría'),
-        ('Apolo', range(13, 17), 'Creatividad, éxito'),
-        ('Mercurio', range(17, 21), 'Comunicación, negocios')
-    ]
-    
-    for nombre, indices, significado in montes_info:
-        z_promedio = np.mean([landmarks[i]['z'] for i in indices])
+        for col, etiqueta, clave in ((col1, "Brillo", 'brillo'), (col2, "Nitidez", 'nitidez'), (col3, "Contraste", 'contraste')):
+            with col:
+                valor = validacion.get(clave)
+                st.metric(etiqueta, f"{valor:.0f}" if valor is not None else "—")
         
-        if z_promedio < -0.08:
-            prominencia = 'muy_alto'
-            interp = 'MUY DESARROLLADO'
-        elif z_promedio < -0.04:
-            prominencia = 'alto'
-            interp = 'DESARROLLADO'
-        elif z_promedio < 0.02:
-            prominencia = 'medio'
-            interp = 'EQUILIBRADO'
-        else:
-            prominencia = 'bajo'
-            interp = 'POR DESARROLLAR'
+        if validacion.get('omitidas'):
+            st.caption(f"⏭️ No evaluado (la foto ya no podía aprobar): {', '.join(validacion['omitidas'])}")
         
-        montes[nombre.lower()] = {
-            'nombre': nombre,
-            'prominencia': prominencia,
-            'significado': significado,
-            'interpretacion': interp
-        }
-    
-    return montes
-
-def analizar_lineas(img_array, landmarks):
-    """Análisis básico de líneas"""
-    return {
-        'vida': {
-            'nombre': 'Línea de la Vida',
-            'significado': 'Vitalidad, salud, energía vital',
-            'interpretacion': 'Indica tu fuerza vital y resistencia física'
-        },
-        'cabeza': {
-            'nombre': 'Línea de la Cabeza',
-            'significado': 'Intelecto, forma de pensar',
-            'interpretacion': 'Revela tu estilo cognitivo y capacidad mental'
-        },
-        'corazon': {
-            'nombre': 'Línea del Corazón',
-            'significado': 'Emociones, amor, relaciones',
-            'interpretacion': 'Muestra tu vida emocional y afectiva'
-        }
-    }
-
-def calcular_flexibilidad(landmarks):
-    """Calcula flexibilidad"""
-    angulos = []
-    
-    for base in [5, 9, 13, 17]:
-        try:
-            p1 = landmarks[base]
-            p2 = landmarks[base + 2]
-            p3 = landmarks[base + 4] if base + 4 < len(landmarks) else landmarks[base + 3]
-            
-            v1 = np.array([p2['x'] - p1['x'], p2['y'] - p1['y']])
-            v2 = np.array([p3['x'] - p2['x'], p3['y'] - p2['y']])
-            
-            cos_angle = np.dot(v1, v2) / (np.linalg.norm(v1) * np.linalg.norm(v2) + 1e-10)
-            angle = np.arccos(np.clip(cos_angle, -1, 1))
-            angulos.append(np.degrees(angle))
-        except:
-            continue
-    
-    if angulos:
-        promedio = np.mean(angulos)
+        if validacion.get('en_cache'):
+            st.caption("♻️ Resultado recuperado de la caché")
         
-        if promedio > 175:
-            return {'tipo': 'muy_flexible', 'interpretacion': 'Mente abierta, adaptable'}
-        elif promedio > 165:
-            return {'tipo': 'flexible', 'interpretacion': 'Equilibrio entre flexibilidad y estructura'}
-        else:
-            return {'tipo': 'rigida', 'interpretacion': 'Principios firmes, estructurado'}
-    
-    return {'tipo': 'normal', 'interpretacion': 'Flexibilidad equilibrada'}
-
-def analisis_basico_sin_mediapipe(image):
-    """Análisis cuando no hay MediaPipe"""
-    return {
-        'forma_mano': {
-            'tipo': 'mixta',
-            'elemento': 'Múltiple',
-            'descripcion': 'Análisis básico. Se requiere mejor imagen para precisión.',
-            'ratio_dedo_palma': 1.0
-        },
-        'dedos': {},
-        'montes': {},
-        'lineas': {},
-        'flexibilidad': {'tipo': 'normal', 'interpretacion': 'No determinado'},
-        'confianza': 0.3
-    }
+        if etapas:
+            st.caption(" · ".join(f"⏱️ {e['etapa']}: {e['ms']:.0f} ms" for e in etapas))
 
 # ============================================================================
-# CICLOS TEMPORALES
+# TELEMETRÍA
 # ============================================================================
 
-def calcular_ciclo_vital(fecha_nacimiento):
-    """Calcula ciclo vital"""
-    hoy = datetime.now()
-    suma = fecha_nacimiento.day + fecha_nacimiento.month + hoy.year
-    while suma > 9:
-        suma = sum(int(d) for d in str(suma))
-    return suma
-
-def analizar_ciclos_temporales(fecha_nacimiento, pregunta=""):
-    """Analiza ciclos para períodos específicos"""
-    hoy = datetime.now()
-    ciclo_actual = calcular_ciclo_vital(fecha_nacimiento)
-    
-    pregunta_lower = pregunta.lower()
-    periodos = []
-    
-    # Detectar períodos mencionados
-    if any(p in pregunta_lower for p in ['próximo', 'siguiente', '2025', '2026']):
-        periodos.append({'año': hoy.year + 1, 'tipo': 'próximo'})
-    
-    if any(p in pregunta_lower for p in ['este año', str(hoy.year)]):
-        periodos.append({'año': hoy.year, 'tipo': 'actual'})
-    
-    if 'próximos años' in pregunta_lower:
-        for i in range(1, 4):
-            periodos.append({'año': hoy.year + i, 'tipo': f'año_{i}'})
-    
-    # Default: año actual y próximo
-    if not periodos:
-        periodos = [
-            {'año': hoy.year, 'tipo': 'actual'},
-            {'año': hoy.year + 1, 'tipo': 'próximo'}
-        ]
-    
-    analisis_periodos = []
-    
-    for periodo in periodos:
-        suma = fecha_nacimiento.day + fecha_nacimiento.month + periodo['año']
-        while suma > 9:
-            suma = sum(int(d) for d in str(suma))
-        
-        ciclo_info = CICLOS_VITALES.get(suma, CICLOS_VITALES[1])
-        
-        analisis_periodos.append({
-            'año': periodo['año'],
-            'ciclo': suma,
-            'nombre': ciclo_info['nombre'],
-            'emoji': ciclo_info['emoji'],
-            'energia': ciclo_info['energia'],
-            'recomendaciones': ciclo_info['recomendaciones']
-        })
-    
-    return {
-        'ciclo_actual': ciclo_actual,
-        'periodos': analisis_periodos
-    }
+def es_admin():
+    return st.session_state.get('email', '').lower() in EMAILS_ADMIN
+
+def etapas_de_foto(telemetria, numero_foto):
+    """Etapas de la traza registradas para una foto"""
+    if not telemetria or not es_admin():
+        return None
+    return [e for e in telemetria['etapas'] if e.get('foto') == numero_foto]
+
+def mostrar_telemetria(telemetria):
+    """Tiempos por etapa de la consulta, solo para administradores"""
+    if not telemetria or not es_admin():
+        return
+    
+    with st.expander("📊 Detalles técnicos de la consulta"):
+        st.caption(f"Traza {telemetria['id']} · total {telemetria['total_ms']:.0f} ms")
+        st.dataframe(pd.DataFrame(telemetria['etapas']), use_container_width=True, hide_index=True)
+        if telemetria['atributos']:
+            st.json(telemetria['atributos'])
+        if MODO_DETECCION == 'adaptativo':
+            estadisticas = obtener_estadisticas_deteccion().resumen()
+            if estadisticas['detecciones']:
+                st.caption(f"Detección adaptativa del proceso: {estadisticas['tasa_escalado']:.0%} escaladas al "
+                           f"modelo completo ({estadisticas['escaladas']} de {estadisticas['detecciones']}) · "
+                           f"motivos {estadisticas['motivos']}")
+        if inferencia_remota():
+            st.caption(f"Servidor de inferencia: {obtener_cliente_inferencia().respaldos_locales} peticiones "
+                       "resueltas localmente por este proceso")
 
 # ============================================================================
-# GENERACIÓN DE ANÁLISIS COMPLETO
+# BASE DE DATOS
 # ============================================================================
 
-def generar_analisis_completo(analisis_quiro, ciclos, pregunta):
-    """Genera análisis completo HTML"""
-    
-    if not analisis_quiro or analisis_quiro['confianza'] < 0.4:
-        return "<p>No se pudo realizar el análisis. Por favor, sube imágenes de mejor calidad.</p>"
-    
-    forma = analisis_quiro.get('forma_mano', {})
-    dedos = analisis_quiro.get('dedos', {})
-    montes = analisis_quiro.get('montes', {})
-    lineas = analisis_quiro.get('lineas', {})
-    flex = analisis_quiro.get('flexibilidad', {})
-    
-    html = f"""
-<div class="info-card">
-
-## 🔮 ANÁLISIS QUIROLÓGICO Y CICLOS VITALES
-
-### 📋 FORMA DE MANO
-
-**Tipo:** {forma.get('tipo', 'N/A').upper()} - Elemento {forma.get('elemento', 'N/A')}
-
-{forma.get('descripcion', '')}
-
-Ratio Dedo/Palma: {forma.get('ratio_dedo_palma', 0)}
-
----
-
-### 🖐️ DEDOS
-
-"""
-    
-    for nombre, info in dedos.items():
-        html += f"""
-**{info['nombre']}** - {info['clasificacion'].upper()}
-- {info['significado']}
-- Largo: {info['largo']}px
-
-"""
-    
-    html += """
----
-
-### 🏔️ MONTES
-
-"""
-    
-    for nombre, info in montes.items():
-        html += f"""
-**Monte de {info['nombre']}** - {info['prominencia'].upper()}
-- {info['significado']}
-- {info['interpretacion']}
-
-"""
-    
-    html += """
----
-
-### 📏 LÍNEAS PRINCIPALES
-
-"""
-    
-    for nombre, info in lineas.items():
-        html += f"""
-**{info['nombre']}**
-- {info['significado']}
-- {info['interpretacion']}
-
-"""
-    
-    html += f"""
----
-
-### 🎨 FLEXIBILIDAD
-
-{flex.get('tipo', 'normal').upper()}: {flex.get('interpretacion', '')}
-
----
-
-### 🌙 CICLOS VITALES
-
-"""
-    
-    for periodo in ciclos['periodos']:
-        html += f"""
-**{periodo['emoji']} AÑO {periodo['año']} - Ciclo {periodo['ciclo']}: {periodo['nombre']}**
-
-Energía: {periodo['energia']}
+@st.cache_resource
+def init_db():
+    conn = abrir_conexion(RUTA_DB)
+    crear_esquema(conn)
+    return conn
 
-Recomendaciones: {periodo['recomendaciones']}
+# ============================================================================
+# SESIÓN
+# ============================================================================
 
-"""
-    
-    if pregunta:
-        html += f"""
----
+CLAVES_SESION = ('usuario_id', 'email', 'nombre', 'token_sesion', 'historial_cursores', 'analisis_cargados')
+
+def abrir_sesion(usuario):
+    """Marca la sesión como iniciada y guarda el token firmado en el estado de la sesión
+    
+    Los reruns de la página comprueban el token en lugar de volver a pasar por
+    bcrypt. No va en la URL: quedaría en el historial y en los enlaces.
+    """
+    st.session_state.logged_in = True
+    st.session_state.usuario_id = usuario['id']
+    st.session_state.email = usuario['email']
+    st.session_state.nombre = usuario.get('nombre')
+    st.session_state.token_sesion = emitir_token(usuario)
+
+def cerrar_sesion(revocar=True):
+    """Olvida la sesión; con `revocar`, anula también los tokens ya emitidos del usuario"""
+    if revocar and st.session_state.get('usuario_id') is not None:
+        revocar_tokens(st.session_state.db_conn, st.session_state.usuario_id)
+    st.session_state.logged_in = False
+    for clave in CLAVES_SESION:
+        st.session_state.pop(clave, None)
+
+def comprobar_sesion():
+    """Cierra la sesión si su token venció o fue revocado desde otra pestaña"""
+    if not st.session_state.logged_in:
+        return
+    if verificar_token(st.session_state.db_conn, st.session_state.get('token_sesion')) is None:
+        cerrar_sesion(revocar=False)
+
+def cambiar_pagina_historial(cursor=None):
+    """Avanza al cursor dado o, sin cursor, vuelve a la página anterior"""
+    if cursor is None:
+        st.session_state.historial_cursores.pop()
+    else:
+        st.session_state.historial_cursores.append(cursor)
+    st.session_state.analisis_cargados = {}
 
-### 💭 RESPUESTA A TU CONSULTA
+# ============================================================================
+# MEMORIA DE SESIÓN
+# ============================================================================
 
-**Tu pregunta:** "{pregunta}"
+MAX_BYTES_MEMORIA_SESION = int(os.getenv('MAPA_MEMORIA_SESION_KB', '2048')) * 1024
 
-Basándome en tu mano {forma.get('tipo', '')}, que revela una personalidad {forma.get('descripcion', '').lower()}, 
-y considerando el ciclo {ciclos['ciclo_actual']} en el que te encuentras, te recomiendo:
+def clave_consulta(fotos, fecha_nacimiento, pregunta=""):
+    """Identifica una consulta por las fotos subidas, la fecha de nacimiento y la pregunta"""
+    ids = tuple(getattr(foto, 'file_id', None) for foto in fotos)
+    return (ids, str(fecha_nacimiento), pregunta)
 
-{CICLOS_VITALES[ciclos['ciclo_actual']]['recomendaciones']}
+def recuperar_consulta(clave):
+    """Devuelve la consulta ya calculada en esta sesión para esas entradas, si existe"""
+    memoria = st.session_state.get('consultas_memo')
+    if not memoria or clave not in memoria:
+        return None
+    memoria.move_to_end(clave)
+    return memoria[clave][0]
 
-Tu forma de mano indica fortalezas en {forma.get('descripcion', '').lower()}.
-"""
+def guardar_consulta(clave, consulta):
+    """Guarda la consulta respetando el tope de memoria por sesión (se descartan las más antiguas)"""
+    memoria = st.session_state.setdefault('consultas_memo', OrderedDict())
+    memoria[clave] = (consulta, len(json.dumps(consulta, default=str)))
+    memoria.move_to_end(clave)
     
-    html += """
+    total = sum(tamano for _, tamano in memoria.values())
+    while total > MAX_BYTES_MEMORIA_SESION and len(memoria) > 1:
+        _, (_, tamano) = memoria.popitem(last=False)
+        total -= tamano
 
----
-
-### ⭐ CONCLUSIÓN
-
-Este análisis muestra tendencias y potenciales. Tu libre albedrío y acciones conscientes 
-son los verdaderos creadores de tu destino.
+# ============================================================================
+# CONSULTAS EN SEGUNDO PLANO
+# ============================================================================
 
-</div>
+INTERVALO_SONDEO_SEGUNDOS = 1.0
 
-<p style="text-align: center; color: #F4E4C1; font-style: italic; font-size: 0.8rem;">
-⚠️ Análisis orientativo. No sustituye consejo profesional.
-</p>
-"""
-    
-    return html
+AVANCE_TRABAJO = {
+    EN_COLA: ("⏳ En cola", 0.1),
+    VALIDANDO: ("✨ Validando calidad de imágenes...", 0.35),
+    ANALIZANDO: ("🔮 Analizando quirología...", 0.7),
+}
 
-# ============================================================================
-# BASE DE DATOS
-# ============================================================================
+def id_sesion():
+    """Identificador de la sesión para que la cola reparta los hilos por turnos"""
+    if 'id_sesion' not in st.session_state:
+        st.session_state.id_sesion = uuid.uuid4().hex
+    return st.session_state.id_sesion
 
-@st.cache_resource
-def init_db():
-    conn = sqlite3.connect('mapa_guia_destino.db', check_same_thread=False)
-    c = conn.cursor()
-    
-    c.execute('''CREATE TABLE IF NOT EXISTS usuarios
-                 (id INTEGER PRIMARY KEY AUTOINCREMENT,
-                  email TEXT UNIQUE NOT NULL,
-                  password_hash TEXT NOT NULL,
-                  nombre TEXT,
-                  fecha_registro TIMESTAMP DEFAULT CURRENT_TIMESTAMP)''')
-    
-    c.execute('''CREATE TABLE IF NOT EXISTS consultas
-                 (id INTEGER PRIMARY KEY AUTOINCREMENT,
-                  usuario_id INTEGER,
-                  fecha_consulta TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                  pregunta TEXT NOT NULL,
-                  fecha_nacimiento DATE,
-                  monto_donacion REAL,
-                  analisis_automatico TEXT)''')
-    
-    conn.commit()
-    return conn
+def enviar_consulta(tipo, clave, fotos, fecha_nacimiento, pregunta="", monto=0):
+    """Encola la consulta y guarda su trabajo en la sesión; no espera al análisis"""
+    traza = nueva_traza(tipo)
+    traza.anotar(fotos=len(fotos))
+    try:
+        id_trabajo = obtener_cola_trabajos().enviar(
+            procesar_consulta, copiar_fotos(fotos), fecha_nacimiento, pregunta, monto,
+            st.session_state.get('usuario_id'), exigir_todas_validas=(tipo == 'gratis'), traza=traza,
+            sesion=id_sesion()
+        )
+    except ColaLlena as e:
+        st.warning(f"⏳ {e}. Intenta de nuevo en unos segundos.")
+        return False
+    
+    st.session_state.setdefault('trabajos', {})[tipo] = {'id': id_trabajo, 'clave': clave, 'traza': traza}
+    return True
+
+def seguir_trabajo(tipo, clave):
+    """Muestra el avance del trabajo de la página y recoge su consulta al terminar
+    
+    Devuelve (en_curso, trabajo recién terminado para estas entradas o None).
+    La consulta terminada queda en la memoria de sesión bajo su propia clave.
+    """
+    pendiente = st.session_state.get('trabajos', {}).get(tipo)
+    if pendiente is None:
+        return False, None
+    
+    cola = obtener_cola_trabajos()
+    trabajo = cola.estado(pendiente['id'])
+    if trabajo is not None and trabajo['estado'] in ESTADOS_ACTIVOS:
+        texto, avance = AVANCE_TRABAJO[trabajo['estado']]
+        if trabajo['estado'] == EN_COLA:
+            texto += f" ({cola.en_espera()} consulta(s) en espera)"
+        st.progress(avance, text=texto)
+        return True, None
+    
+    del st.session_state.trabajos[tipo]
+    if trabajo is None:
+        st.error("❌ La consulta en curso se perdió (el servidor se reinició). Envíala de nuevo.")
+        return False, None
+    
+    cola.retirar(pendiente['id'])
+    if trabajo['estado'] == FALLIDO:
+        st.error(f"❌ No se pudo completar la consulta: {trabajo['error']}")
+        pendiente['traza'].finalizar()
+        return False, None
+    
+    consulta = trabajo['resultado']
+    consulta['telemetria'] = pendiente['traza'].resumen()
+    guardar_consulta(pendiente['clave'], consulta)
+    if pendiente['clave'] != clave:
+        # Las entradas cambiaron mientras se analizaba: se muestra cuando vuelvan
+        consulta['telemetria'] = pendiente['traza'].finalizar()
+        return False, None
+    return False, pendiente
+
+def refrescar_mientras(en_curso):
+    """Vuelve a ejecutar la página tras un momento mientras haya un trabajo en curso"""
+    if en_curso:
+        time.sleep(INTERVALO_SONDEO_SEGUNDOS)
+        st.rerun()
 
 # ============================================================================
 # INTERFAZ PRINCIPAL
@@ -818,8 +432,14 @@ def main():
     if 'db_conn' not in st.session_state:
         st.session_state.db_conn = init_db()
     
+    # La visión se carga en segundo plano: Inicio e Ingresar no la esperan
+    precalentar_en_segundo_plano()
+    
     if 'logged_in' not in st.session_state:
         st.session_state.logged_in = False
+        # Enlaces de versiones que ponían el token en la URL
+        st.query_params.pop('sesion', None)
+    comprobar_sesion()
     
     # SIDEBAR
     with st.sidebar:
@@ -829,16 +449,18 @@ def main():
         if not st.session_state.logged_in:
             pagina = st.radio("Ir a:", ["Inicio", "Ingresar"], label_visibility="collapsed")
         else:
-            st.markdown('<div class="badge">👤 Usuario</div>', unsafe_allow_html=True)
+            usuario = st.session_state.get('nombre') or st.session_state.get('email') or "Usuario"
+            st.markdown(f'<div class="badge">👤 {usuario}</div>', unsafe_allow_html=True)
             pagina = st.radio("Ir a:", [
                 "Inicio",
                 "Consulta Gratis",
                 "Consulta Premium",
+                "Mis Consultas",
                 "Cerrar Sesión"
             ], label_visibility="collapsed")
             
             if pagina == "Cerrar Sesión":
-                st.session_state.logged_in = False
+                cerrar_sesion()
                 st.rerun()
         
         st.markdown('<div class="gold-divider"></div>', unsafe_allow_html=True)
@@ -898,19 +520,58 @@ def main():
         col1, col2, col3 = st.columns([1, 2, 1])
         with col2:
             st.markdown('<div class="info-card">', unsafe_allow_html=True)
-            email = st.text_input("📧 Email")
-            password = st.text_input("🔒 Contraseña", type="password")
+            tab_ingreso, tab_registro = st.tabs(["Iniciar Sesión", "Crear Cuenta"])
             
-            if st.button("Iniciar Sesión", use_container_width=True):
-                st.session_state.logged_in = True
-                st.success("✅ Sesión iniciada")
-                st.rerun()
+            with tab_ingreso:
+                with st.form("ingreso"):
+                    email = st.text_input("📧 Email")
+                    password = st.text_input("🔒 Contraseña", type="password")
+                    enviar = st.form_submit_button("Iniciar Sesión", use_container_width=True)
+                
+                if enviar:
+                    try:
+                        with st.spinner("🔐 Verificando..."):
+                            usuario = autenticar(st.session_state.db_conn, email, password)
+                    except IntentosExcedidos as e:
+                        st.error(f"🚫 Demasiados intentos fallidos. Intenta de nuevo en {(e.espera + 59) // 60} minuto(s)")
+                    else:
+                        if usuario is None:
+                            st.error("❌ Email o contraseña incorrectos")
+                        else:
+                            abrir_sesion(usuario)
+                            st.success("✅ Sesión iniciada")
+                            st.rerun()
+            
+            with tab_registro:
+                with st.form("registro"):
+                    nombre = st.text_input("👤 Nombre")
+                    email_nuevo = st.text_input("📧 Email")
+                    password_nuevo = st.text_input("🔒 Contraseña (mínimo 8 caracteres)", type="password")
+                    confirmacion = st.text_input("🔒 Repite la contraseña", type="password")
+                    crear = st.form_submit_button("Crear Cuenta", use_container_width=True)
+                
+                if crear:
+                    if password_nuevo != confirmacion:
+                        st.error("❌ Las contraseñas no coinciden")
+                    else:
+                        try:
+                            with st.spinner("🔐 Creando cuenta..."):
+                                usuario = registrar_usuario(st.session_state.db_conn, email_nuevo, password_nuevo, nombre.strip())
+                        except ValueError as e:
+                            st.error(f"❌ {e}")
+                        else:
+                            abrir_sesion(usuario)
+                            st.success("✅ Cuenta creada")
+                            st.rerun()
             st.markdown('</div>', unsafe_allow_html=True)
     
     elif pagina == "Consulta Gratis":
         st.markdown('<h1>🆓 Consulta Gratis con Análisis de Fotos</h1>', unsafe_allow_html=True)
         st.markdown('<div class="gold-divider"></div>', unsafe_allow_html=True)
         
+        with st.spinner("🔮 Preparando detectores de manos..."):
+            precalentar_detectores()
+        
         st.markdown('<div class="info-card">', unsafe_allow_html=True)
         
         fecha_nac = st.date_input(
@@ -934,46 +595,46 @@ def main():
         with col4:
             foto4 = st.file_uploader("📷 Lateral (opcional)", type=['jpg', 'png'], key="f4")
         
+        fotos = [foto1, foto2, foto3, foto4]
+        fotos_validas = [f for f in fotos if f is not None]
+        clave = clave_consulta(fotos, fecha_nac)
+        
         if st.button("🔮 Analizar Manos", use_container_width=True):
-            fotos = [foto1, foto2, foto3, foto4]
-            fotos_validas = [f for f in fotos if f is not None]
-            
             if not fotos_validas:
                 st.error("⚠️ Debes subir al menos una foto")
-            else:
-                with st.spinner("✨ Validando calidad de imágenes..."):
-                    imagenes_procesadas = []
-                    todas_validas = True
-                    
-                    for idx, foto in enumerate(fotos_validas, 1):
-                        img = Image.open(foto)
-                        validacion = validar_calidad_imagen(img)
-                        
-                        mostrar_resultado_validacion(validacion, idx)
-                        
-                        if validacion['valida']:
-                            imagenes_procesadas.append(img)
-                        else:
-                            todas_validas = False
-                    
-                    if todas_validas and imagenes_procesadas:
-                        st.success(f"✅ {len(imagenes_procesadas)} imagen(es) válida(s)")
-                        
-                        with st.spinner("🔮 Analizando quirología..."):
-                            analisis_quiro = analisis_quirologico_completo(imagenes_procesadas)
-                            ciclos = analizar_ciclos_temporales(fecha_nac)
-                            resultado = generar_analisis_completo(analisis_quiro, ciclos, "")
-                            
-                            st.markdown(resultado, unsafe_allow_html=True)
-                    else:
-                        st.warning("⚠️ Por favor mejora la calidad de las imágenes según las recomendaciones")
+            elif recuperar_consulta(clave) is None and 'gratis' not in st.session_state.get('trabajos', {}):
+                enviar_consulta('gratis', clave, fotos_validas, fecha_nac)
+        
+        en_curso, terminado = seguir_trabajo('gratis', clave)
+        traza = terminado['traza'] if terminado else TRAZA_INACTIVA
+        consulta = recuperar_consulta(clave)
+        
+        # Se muestra también en cada rerun mientras las entradas no cambien
+        if consulta is not None:
+            with traza.etapa('render'):
+                for idx, validacion in enumerate(consulta['validaciones'], 1):
+                    mostrar_resultado_validacion(validacion, idx, etapas_de_foto(consulta.get('telemetria'), idx))
+                
+                if consulta['resultado'] is not None:
+                    st.success(f"✅ {consulta['imagenes_validas']} imagen(es) válida(s)")
+                    st.markdown(consulta['resultado'], unsafe_allow_html=True)
+                else:
+                    st.warning("⚠️ Por favor mejora la calidad de las imágenes según las recomendaciones")
+            
+            if traza is not TRAZA_INACTIVA:
+                consulta['telemetria'] = traza.finalizar()
+            mostrar_telemetria(consulta.get('telemetria'))
         
         st.markdown('</div>', unsafe_allow_html=True)
+        refrescar_mientras(en_curso)
     
     elif pagina == "Consulta Premium":
         st.markdown('<h1>⭐ Consulta Premium Personalizada</h1>', unsafe_allow_html=True)
         st.markdown('<div class="gold-divider"></div>', unsafe_allow_html=True)
         
+        with st.spinner("🔮 Preparando detectores de manos..."):
+            precalentar_detectores()
+        
         st.markdown('<div class="info-card">', unsafe_allow_html=True)
         
         with st.form("consulta_premium"):
@@ -1015,33 +676,82 @@ def main():
             
             submitted = st.form_submit_button("✨ Enviar Consulta", use_container_width=True)
             
-            if submitted and pregunta and foto1:
-                fotos = [foto1, foto2, foto3, foto4]
-                fotos_validas = [f for f in fotos if f is not None]
-                
-                with st.spinner("🔮 Procesando análisis profundo..."):
-                    imagenes_procesadas = []
-                    
-                    for foto in fotos_validas:
-                        img = Image.open(foto)
-                        validacion = validar_calidad_imagen(img)
-                        if validacion['valida']:
-                            imagenes_procesadas.append(img)
-                    
-                    if imagenes_procesadas:
-                        analisis_quiro = analisis_quirologico_completo(imagenes_procesadas)
-                        ciclos = analizar_ciclos_temporales(fecha_nac, pregunta)
-                        resultado = generar_analisis_completo(analisis_quiro, ciclos, pregunta)
-                        
+            fotos = [foto1, foto2, foto3, foto4]
+            clave = clave_consulta(fotos, fecha_nac, pregunta)
+            
+            if submitted and pregunta and foto1 and recuperar_consulta(clave) is None \
+                    and 'premium' not in st.session_state.get('trabajos', {}):
+                enviar_consulta('premium', clave, [f for f in fotos if f is not None], fecha_nac, pregunta, monto)
+            
+            en_curso, terminado = seguir_trabajo('premium', clave)
+            traza = terminado['traza'] if terminado else TRAZA_INACTIVA
+            consulta = recuperar_consulta(clave)
+            
+            if consulta is not None and pregunta and foto1:
+                with traza.etapa('render'):
+                    if consulta['resultado'] is not None:
                         st.success("✅ ¡Análisis Premium completado!")
-                        st.markdown(resultado, unsafe_allow_html=True)
+                        st.markdown(consulta['resultado'], unsafe_allow_html=True)
                         
                         st.info(f"💰 Donación: ${monto:,} COP - Gracias por tu apoyo a esta labor social")
-                        st.balloons()
+                        if terminado:
+                            st.balloons()
                     else:
                         st.error("❌ No se pudieron procesar las imágenes. Por favor, sube fotos de mejor calidad.")
+                
+                if traza is not TRAZA_INACTIVA:
+                    consulta['telemetria'] = traza.finalizar()
+                mostrar_telemetria(consulta.get('telemetria'))
         
         st.markdown('</div>', unsafe_allow_html=True)
+        refrescar_mientras(en_curso)
+    
+    elif pagina == "Mis Consultas":
+        st.markdown('<h1>📜 Mis Consultas</h1>', unsafe_allow_html=True)
+        st.markdown('<div class="gold-divider"></div>', unsafe_allow_html=True)
+        
+        usuario_id = st.session_state.get('usuario_id')
+        if usuario_id is None:
+            st.info("💡 Tu historial aparecerá aquí cuando ingreses con tu cuenta")
+        else:
+            # Cursor de cada página visitada: volver atrás no repite consultas
+            if 'historial_cursores' not in st.session_state:
+                st.session_state.historial_cursores = [None]
+                st.session_state.analisis_cargados = {}
+            cursores = st.session_state.historial_cursores
+            
+            consultas, siguiente = listar_consultas(st.session_state.db_conn, usuario_id, cursores[-1])
+            
+            if not consultas:
+                st.info("Aún no tienes consultas guardadas")
+            
+            for fila in consultas:
+                titulo = fila['pregunta'] or "Consulta gratis"
+                with st.expander(f"🗓️ {fila['fecha_consulta']} · {titulo[:60]}"):
+                    col1, col2 = st.columns(2)
+                    with col1:
+                        st.markdown(f"**Fecha de nacimiento:** {fila['fecha_nacimiento'] or 'N/A'}")
+                    with col2:
+                        st.markdown(f"**Donación:** ${fila['monto_donacion'] or 0:,.0f} COP")
+                    
+                    # El análisis completo solo se lee de la base cuando se pide
+                    cargados = st.session_state.analisis_cargados
+                    if fila['id'] not in cargados:
+                        if st.button("🔮 Ver análisis", key=f"ver_{fila['id']}"):
+                            cargados[fila['id']] = obtener_analisis(st.session_state.db_conn, usuario_id, fila['id'])
+                    if fila['id'] in cargados:
+                        st.markdown(cargados[fila['id']] or "Sin análisis guardado", unsafe_allow_html=True)
+            
+            col1, col2, col3 = st.columns([1, 2, 1])
+            with col1:
+                if len(cursores) > 1:
+                    st.button("⬅️ Más recientes", use_container_width=True, on_click=cambiar_pagina_historial)
+            with col2:
+                st.markdown(f'<p style="text-align: center;">Página {len(cursores)}</p>', unsafe_allow_html=True)
+            with col3:
+                if siguiente is not None:
+                    st.button("Más antiguas ➡️", use_container_width=True,
+                              on_click=cambiar_pagina_historial, args=(siguiente,))
 
 if __name__ == "__main__":
     main()